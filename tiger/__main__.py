@@ -0,0 +1,4 @@
+import tiger.cli as cli
+
+
+cli.main()
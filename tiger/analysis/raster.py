@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from scipy import sparse
+
+import tiger.sim.record as rec
+
+
+# Spike counts of the recorded neurons of a layer as a sparse (neuron, time bin) matrix.
+# Rows follow the sample's GIDs, bin k holds the spikes in (start + k * bin_ms, start + (k + 1) * bin_ms],
+# the same bins as tiger.sim.stats. Built in one pass over the events; events that are
+# already sorted by sender and time are not sorted again.
+def bin_spikes(senders: np.ndarray, times: np.ndarray, gids: np.ndarray, bin_ms: float, duration_ms: float,
+               start_ms: float = 0.0) -> sparse.csr_matrix:
+    bin_cnt = max(1, int(np.ceil(duration_ms / bin_ms - 1e-9)))
+    rows = np.searchsorted(gids, senders)
+    cols = np.clip(np.ceil((np.asarray(times) - start_ms) / bin_ms).astype(np.int64) - 1, 0, bin_cnt - 1)
+
+    keys = rows * bin_cnt + cols
+
+    if np.any(keys[1:] < keys[:-1]):
+        keys = np.sort(keys)
+
+    # Run lengths of equal keys are the counts of the non-zero entries.
+    starts = np.flatnonzero(np.concatenate([[len(keys) > 0], keys[1:] != keys[:-1]]))
+    counts = np.diff(np.append(starts, len(keys)))
+    unique = keys[starts]
+
+    indptr = np.searchsorted(unique // bin_cnt, np.arange(len(gids) + 1))
+
+    return sparse.csr_matrix((counts.astype(np.int32), unique % bin_cnt, indptr), shape=(len(gids), bin_cnt))
+
+
+# Rasters of every layer from its spike detector events.
+def layer_rasters(events: Dict[str, Dict[str, np.ndarray]], samples: Dict[str, rec.Sample], bin_ms: float,
+                  duration_ms: float, start_ms: float = 0.0) -> Dict[str, sparse.csr_matrix]:
+    rasters = {}
+
+    for layer, layer_events in events.items():
+        senders = layer_events.get('senders', np.empty(0, dtype=np.int64))
+        times = layer_events.get('times', np.empty(0))
+        rasters[layer] = bin_spikes(senders, times, samples[layer].gids, bin_ms, duration_ms, start_ms)
+
+    return rasters
+
+
+def save_rasters(rasters: Dict[str, sparse.csr_matrix], directory: Path, trial: int) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for layer, raster in rasters.items():
+        sparse.save_npz(Path(directory, _raster_file(layer, trial)), raster)
+
+
+def load_raster(directory: Path, layer: str, trial: int) -> sparse.csr_matrix:
+    return sparse.load_npz(Path(directory, _raster_file(layer, trial))).tocsr()
+
+
+# Mean rate in Hz of every neuron of a layer over the trials of every stimulus, as a
+# (neuron, stimulus) matrix, from rasters saved with trial number stimulus * trial_cnt + trial.
+# Bins before start_bin are left out, e.g. the onset transient.
+def stored_rates(directory: Path, layer: str, stimulus_cnt: int, trial_cnt: int, bin_ms: float,
+                 start_bin: int = 0) -> np.ndarray:
+    rates = None
+
+    for stimulus in range(stimulus_cnt):
+        rasters = [load_raster(directory, layer, stimulus * trial_cnt + trial)[:, start_bin:] for trial in range(trial_cnt)]
+        counts = sum(np.asarray(r.sum(axis=1)).ravel() for r in rasters)
+        window_s = rasters[0].shape[1] * bin_ms / 1000.0
+
+        if rates is None:
+            rates = np.zeros((len(counts), stimulus_cnt))
+
+        rates[:, stimulus] = counts / (trial_cnt * window_s)
+
+    return rates
+
+
+# Pearson correlations of the binned counts of all pairs of neurons, from one sparse product.
+# Silent neurons correlate with nobody.
+def correlations(raster: sparse.csr_matrix) -> np.ndarray:
+    bin_cnt = raster.shape[1]
+    x = raster.astype(np.float64)
+
+    means = np.asarray(x.sum(axis=1)).ravel() / bin_cnt
+    cov = (x @ x.T).toarray() / bin_cnt - np.outer(means, means)
+    std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+    norm = np.outer(std, std)
+
+    return np.divide(cov, norm, out=np.zeros_like(cov), where=norm > 0.0)
+
+
+# Mean rate of every neuron in every condition, e.g. the orientations or colors of a stimulus,
+# from one raster per condition. Returns (neuron, condition) in Hz.
+def tuning_curves(rasters: List[sparse.csr_matrix], bin_ms: float) -> np.ndarray:
+    rates = [np.asarray(raster.sum(axis=1)).ravel() / (raster.shape[1] * bin_ms / 1000.0) for raster in rasters]
+    return np.stack(rates, axis=1)
+
+
+# Spike counts per bin summed over the neurons, scaled to a rate per neuron in Hz.
+def population_rate(raster: sparse.csr_matrix, bin_ms: float) -> np.ndarray:
+    return np.asarray(raster.sum(axis=0)).ravel() / raster.shape[0] / (bin_ms / 1000.0)
+
+
+def _raster_file(layer: str, trial: int) -> str:
+    return f"raster-{layer}-trial{trial}.npz"
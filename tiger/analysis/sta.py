@@ -0,0 +1,68 @@
+from typing import Dict
+
+import numpy as np
+from scipy import sparse
+
+
+# Spike-triggered averages of all recorded neurons, accumulated chunk by chunk of a noise
+# sequence. Every chunk brings a raster of spike counts per frame (neuron, frame) and the
+# frames themselves (frame, cone, row, col); the sums for every lag are one sparse-dense
+# product per lag, and the last lag_cnt - 1 frames are kept for the next chunk, so neither
+# the sequence nor the spikes have to be held as a whole.
+class StaAccumulator:
+    lag_cnt: int
+    frame_shape: tuple
+    # Sum of the frames lag frames before every spike, of shape (lag, neuron, pixel).
+    sums: np.ndarray
+    # Number of spikes summed for every lag and neuron.
+    spike_cnts: np.ndarray
+    _history: np.ndarray
+
+    def __init__(self, neuron_cnt: int, frame_shape: tuple, lag_cnt: int) -> None:
+        self.lag_cnt = lag_cnt
+        self.frame_shape = frame_shape
+        pixel_cnt = int(np.prod(frame_shape))
+        self.sums = np.zeros((lag_cnt, neuron_cnt, pixel_cnt))
+        self.spike_cnts = np.zeros((lag_cnt, neuron_cnt), dtype=np.int64)
+        self._history = np.empty((0, pixel_cnt))
+
+    def add(self, raster: sparse.csr_matrix, frames: np.ndarray) -> None:
+        frames = frames.reshape(len(frames), -1)
+        frame_cnt = len(frames)
+        extended = np.concatenate([self._history, frames])
+        history_cnt = len(self._history)
+
+        for lag in range(self.lag_cnt):
+            # Spikes of the first frames of the sequence have no frame lag frames before them.
+            start = max(0, lag - history_cnt)
+
+            if start >= frame_cnt:
+                continue
+
+            spikes = raster[:, start:]
+            lagged = extended[history_cnt + start - lag:history_cnt + frame_cnt - lag]
+            self.sums[lag] += spikes @ lagged
+            self.spike_cnts[lag] += np.asarray(spikes.sum(axis=1)).ravel().astype(np.int64)
+
+        self._history = extended[max(0, len(extended) - (self.lag_cnt - 1)):]
+
+    # Averages of shape (neuron, lag) + frame_shape, zero for neurons without spikes.
+    def sta(self) -> np.ndarray:
+        cnts = self.spike_cnts[:, :, None]
+        averages = np.divide(self.sums, cnts, out=np.zeros_like(self.sums), where=cnts > 0)
+        return averages.transpose(1, 0, 2).reshape((averages.shape[1], self.lag_cnt) + tuple(self.frame_shape))
+
+
+# ON and OFF subfields of every neuron at the lag of its strongest average, from the luminance
+# (mean of the L and M) averages of shape (neuron, lag, cone, row, col).
+def subfields(sta: np.ndarray) -> Dict[str, np.ndarray]:
+    luminance = sta.mean(axis=2)
+    strength = np.abs(luminance).reshape(luminance.shape[0], luminance.shape[1], -1).max(axis=2)
+    peak_lags = strength.argmax(axis=1)
+    peak = luminance[np.arange(len(luminance)), peak_lags]
+
+    return {
+        'peak_lag': peak_lags,
+        'on': np.maximum(peak, 0.0),
+        'off': np.maximum(-peak, 0.0),
+    }
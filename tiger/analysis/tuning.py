@@ -0,0 +1,106 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import tiger.net.grid as grid
+import tiger.sim.stimulus as stim
+
+
+# Stimuli of a tuning experiment with the value of every label for every stimulus, e.g. the
+# orientation of every grating. The analysis functions take responses as (neuron, stimulus)
+# rate matrices in the order of the stimuli and reduce over the stimulus axis only.
+class StimulusSet:
+    stimuli: List[stim.Stimulus]
+    labels: Dict[str, np.ndarray]
+
+    def __init__(self, stimuli: List[stim.Stimulus], labels: Dict[str, List]) -> None:
+        self.stimuli = stimuli
+        self.labels = {name: np.asarray(values) for name, values in labels.items()}
+
+    def __len__(self) -> int:
+        return len(self.stimuli)
+
+
+# Luminance gratings drifting in every direction of orientations_deg.
+def orientation_set(orientations_deg: List[float], spatial_freq_cpd: float = 2.0,
+                    temporal_freq_hz: float = 4.0) -> StimulusSet:
+    stimuli = [stim.DriftingGrating(o, spatial_freq_cpd, temporal_freq_hz) for o in orientations_deg]
+    return StimulusSet(stimuli, {'orientation_deg': orientations_deg})
+
+
+# Gratings of a fixed orientation over L and M cone contrast combinations: luminance,
+# cone isolating and isoluminant opponent ones in both signs.
+def color_set(orientation_deg: float = 0.0, spatial_freq_cpd: float = 2.0, temporal_freq_hz: float = 4.0) -> StimulusSet:
+    contrasts = [(1.0, 1.0), (1.0, 0.0), (0.0, 1.0), (1.0, -1.0), (-1.0, 1.0), (-1.0, 0.0), (0.0, -1.0)]
+    stimuli = [stim.DriftingGrating(orientation_deg, spatial_freq_cpd, temporal_freq_hz, contrast_l=l, contrast_m=m)
+               for l, m in contrasts]
+    return StimulusSet(stimuli, {'contrast_l': [l for l, _ in contrasts], 'contrast_m': [m for _, m in contrasts]})
+
+
+# Light and dark squares flashed on every stride-th position of the grid, for ON and OFF
+# receptive-field maps.
+def rf_set(g: grid.Grid, size_deg: float, onset_ms: float, duration_ms: float, stride: int = 1) -> StimulusSet:
+    rows = np.arange(0, g.rows, stride)
+    cols = np.arange(0, g.cols, stride)
+    xs, ys = g.xs()[cols], g.ys()[rows]
+
+    stimuli, labels = [], {'x_deg': [], 'y_deg': [], 'row': [], 'col': [], 'sign': []}
+
+    for sign in (1.0, -1.0):
+        for r, y in enumerate(ys):
+            for c, x in enumerate(xs):
+                stimuli.append(stim.FlashingSquare(size_deg, onset_ms, duration_ms, contrast_l=sign, contrast_m=sign,
+                                                   center_deg=(float(x), float(y))))
+                for name, value in (('x_deg', x), ('y_deg', y), ('row', r), ('col', c), ('sign', sign)):
+                    labels[name].append(value)
+
+    return StimulusSet(stimuli, labels)
+
+
+# Vector-sum orientation selectivity index in [0, 1] and preferred orientation in degrees.
+def orientation_selectivity(responses: np.ndarray, orientations_deg: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    phases = np.exp(2j * np.deg2rad(orientations_deg))
+    vector = responses @ phases
+    total = responses.sum(axis=1)
+
+    osi = np.divide(np.abs(vector), total, out=np.zeros(len(total)), where=total > 0.0)
+    preferred_deg = np.rad2deg(np.angle(vector) / 2.0) % 180.0
+
+    return osi, preferred_deg
+
+
+# L and M cone weights of every neuron from a least squares fit of rate = b + w_l * c_l + w_m * c_m
+# over all stimuli at once, and the opponency index (|w_l - w_m| - |w_l + w_m|) / (|w_l - w_m| + |w_l + w_m|),
+# 1 for purely color opponent and -1 for purely luminance driven neurons.
+def color_opponency(responses: np.ndarray, contrast_l: np.ndarray,
+                    contrast_m: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    design = np.stack([np.ones(len(contrast_l)), contrast_l, contrast_m], axis=1)
+    weights, _, _, _ = np.linalg.lstsq(design, responses.T, rcond=None)
+    w_l, w_m = weights[1], weights[2]
+
+    opponent = np.abs(w_l - w_m)
+    luminance = np.abs(w_l + w_m)
+    total = opponent + luminance
+    index = np.divide(opponent - luminance, total, out=np.zeros(len(total)), where=total > 0.0)
+
+    return index, w_l, w_m
+
+
+# ON and OFF maps of shape (neuron, row, col) above the weakest response of every neuron,
+# and the response-weighted receptive-field centers in degrees.
+def rf_maps(responses: np.ndarray, labels: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    rows, cols = int(labels['row'].max()) + 1, int(labels['col'].max()) + 1
+    baseline = responses.min(axis=1, keepdims=True)
+    maps = {}
+
+    for name, sign in (('on', 1.0), ('off', -1.0)):
+        selected = labels['sign'] == sign
+        order = np.lexsort((labels['col'][selected], labels['row'][selected]))
+        maps[name] = (responses[:, selected][:, order] - baseline).reshape(-1, rows, cols)
+
+    drive = responses - baseline
+    total = drive.sum(axis=1)
+    centers = np.stack([drive @ labels['x_deg'], drive @ labels['y_deg']], axis=1)
+    maps['center_deg'] = np.divide(centers, total[:, None], out=np.zeros_like(centers), where=total[:, None] > 0.0)
+
+    return maps
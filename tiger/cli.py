@@ -0,0 +1,335 @@
+import argparse
+import copy
+import itertools
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+import tiger.net.cfg as netcfg
+import tiger.net.conn as netconn
+import tiger.net.estimate as est
+import tiger.net.validate as val
+import tiger.sim.experiment as exp
+import tiger.sim.store as store
+
+
+# Stages of a run, each repeatable on its own from what the stages before stored.
+BUILD = "build"
+RUN = "run"
+ANALYZE = "analyze"
+
+_CACHE_SUBDIR = "cache"
+_WORKER_POLL_S = 1.0
+
+
+# Settings of a config file, a JSON object with the optional sections network (tiger.net.cfg.Config
+# settings), experiment (tiger.sim.experiment.ExperimentSpec settings) and record (record policy
+# specs by layer selector, e.g. {"cortex": "fraction:0.25"}).
+class RunConfig:
+    cfg: netcfg.Config
+    spec: exp.ExperimentSpec
+    record: Dict[str, str]
+
+    def __init__(self, cfg: netcfg.Config, spec: exp.ExperimentSpec, record: Dict[str, str]) -> None:
+        self.cfg = cfg
+        self.spec = spec
+        self.record = record
+
+    @staticmethod
+    def from_dict(values: Dict) -> "RunConfig":
+        unknown = sorted(set(values) - {'network', 'experiment', 'record'})
+
+        if len(unknown) > 0:
+            raise ValueError(f"unknown config sections: {', '.join(unknown)}")
+
+        return RunConfig(netcfg.Config.from_dict(values.get('network', {})),
+                         exp.ExperimentSpec.from_dict(values.get('experiment', {})),
+                         dict(values.get('record', {})))
+
+    @staticmethod
+    def load(path: Path) -> "RunConfig":
+        with open(path, "r") as f:
+            return RunConfig.from_dict(json.load(f))
+
+    def to_dict(self) -> Dict:
+        return {'network': self.cfg.to_dict(), 'experiment': self.spec.to_dict(), 'record': dict(self.record)}
+
+
+# Validates and estimates the network of a config without NEST, and with --nest also builds it
+# to measure the build phases.
+def build(args: argparse.Namespace) -> None:
+    run_cfg = _load_config(args)
+    run = _open_run(args, run_cfg)
+
+    conns = netconn.get_connections(run_cfg.cfg)
+    report = val.validate(run_cfg.cfg, conns)
+    estimate = est.estimate(run_cfg.cfg, run_cfg.spec.warm_up_ms + run_cfg.spec.trial_ms, conns)
+    print(report.format() if args.verbose else f"{len(report.errors())} errors, {len(report.warnings())} warnings")
+    print(estimate.format())
+
+    info = {
+        'errors': [str(issue) for issue in report.errors()],
+        'warning_cnt': len(report.warnings()),
+        'estimated_mb': estimate.total_bytes() / 1024**2,
+        'estimated_synapse_cnt': estimate.synapse_cnt(),
+    }
+
+    if args.nest:
+        import tiger.sim.sim as sim
+
+        runner = sim.NetRunner(run_cfg.spec.trial_ms, run_cfg.cfg)
+        runner.build_network()
+        info['timings'] = runner.timings
+
+    run.mark_done(BUILD, info)
+
+
+# Simulates the trials of a config and stores their rasters, spread over --workers processes
+# that each build the network and start from one shared warm-up. Fewer workers are started when their networks would not fit
+# into the memory budget together.
+def run(args: argparse.Namespace) -> None:
+    run_cfg = _load_config(args)
+    run = _open_run(args, run_cfg)
+    stimulus_cnt = len(exp.stimulus_set(run_cfg.spec, run_cfg.cfg))
+
+    fitting_cnt = max(1, est.budget_bytes(run_cfg.cfg) // exp.estimated_bytes(run_cfg.cfg, run_cfg.spec))
+    worker_cnt = max(1, min(args.workers, stimulus_cnt, fitting_cnt))
+
+    if worker_cnt < args.workers:
+        print(f"Running {worker_cnt} workers instead of {args.workers}")
+
+    start = time.perf_counter()
+
+    if worker_cnt == 1:
+        timings = exp.run_trials(run_cfg.cfg, run_cfg.spec, run_cfg.record, run, _cache_dir(args))
+    else:
+        procs = [_start_worker(run, worker, worker_cnt, _cache_dir(args)) for worker in range(worker_cnt)]
+
+        if not _wait_for_workers(procs):
+            raise RuntimeError(f"a worker of run {run.name} failed")
+
+        timings = {}
+
+    run.mark_done(RUN, {'worker_cnt': worker_cnt, 'wall_time_s': time.perf_counter() - start, 'timings': timings})
+    print(f"Stored {stimulus_cnt * run_cfg.spec.trial_cnt} trials in {run.directory}")
+
+
+# One worker of a run, started by run with the settings stored in the run.
+def worker(args: argparse.Namespace) -> None:
+    run = store.Run(Path(args.run_dir))
+    run_cfg = RunConfig.from_dict(run.load_meta()['config'])
+    exp.run_trials(run_cfg.cfg, run_cfg.spec, run_cfg.record, run, Path(args.cache_dir), args.index, args.count)
+
+
+# Rates and tuning of a stored run, without simulating.
+def analyze(args: argparse.Namespace) -> None:
+    for name in args.runs:
+        run = _store(args).run(name)
+
+        if not run.is_done(RUN):
+            raise ValueError(f"run {name} has no stored trials")
+
+        run_cfg = RunConfig.from_dict(run.load_meta()['config'])
+        summary = exp.analyze(run_cfg.cfg, run_cfg.spec, run)
+
+        for layer, values in summary.items():
+            print(f"{name} {layer}: " + ", ".join(f"{key} {value:.2f}" for key, value in values.items()))
+
+        if args.plot:
+            exp.plot(run, Path(run.directory, "responses.png"))
+
+        run.mark_done(ANALYZE, summary)
+
+
+# Runs a config for every combination of the --set values, one run per point. Points whose
+# estimated networks fit into the memory budget together run at the same time.
+def sweep(args: argparse.Namespace) -> None:
+    base_cfg = _load_config(args)
+
+    # Every point builds its network from the same root seed.
+    if base_cfg.cfg.root_seed is None:
+        base_cfg.cfg.root_seed = _new_root_seed()
+
+    base = base_cfg.to_dict()
+    name = args.name if args.name is not None else Path(args.config).stem
+    axes = [_parse_axis(s) for s in args.set]
+
+    points = []
+
+    for values in itertools.product(*[axis_values for _, _, axis_values in axes]):
+        config = copy.deepcopy(base)
+        label = []
+
+        for (section, key, _), value in zip(axes, values):
+            config[section][key] = value
+            label.append(f"{key}={value}")
+
+        points.append((f"{name}-" + "-".join(label), RunConfig.from_dict(config)))
+
+    sizes = [exp.estimated_bytes(p.cfg, p.spec) for _, p in points]
+    groups = est.pack(sizes, est.budget_bytes(base_cfg.cfg))
+
+    for group in groups:
+        procs = []
+
+        for i in group:
+            point_name, point_cfg = points[i]
+            config_path = Path(_store(args).root, f"{point_name}.json")
+            config_path.parent.mkdir(parents=True, exist_ok=True)
+
+            with open(config_path, "w") as f:
+                json.dump(point_cfg.to_dict(), f, indent=2)
+
+            cmd = [sys.executable, "-m", "tiger", "--store", str(_store(args).root), "run", str(config_path),
+                   "--name", point_name, "--cache-dir", str(_cache_dir(args))]
+            procs.append((point_name, subprocess.Popen(cmd)))
+
+        for point_name, proc in procs:
+            print(f"{point_name}: " + ("done" if proc.wait() == 0 else "failed"))
+
+
+def bench(args: argparse.Namespace) -> None:
+    import tiger.sim.bench as bench
+
+    bench.main(args.bench_args)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="tiger", description="Builds, simulates and analyzes the network.")
+    parser.add_argument("--store", help=f"results directory, ${store.STORE_DIR} or ./results by default")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command, handler, description in [(BUILD, build, "validate and estimate a network"),
+                                          (RUN, run, "simulate the trials of a config"),
+                                          ("sweep", sweep, "run a config over a grid of settings")]:
+        sub = commands.add_parser(command, help=description)
+        sub.set_defaults(handler=handler)
+        sub.add_argument("config", help="JSON config file")
+        sub.add_argument("--name", help="name of the run, the config file name by default")
+        sub.add_argument("--threads", type=int, help="NEST threads per process")
+        sub.add_argument("--record", action="append", default=[], metavar="SELECTOR=POLICY",
+                         help="record policy of layers, e.g. cortex=fraction:0.25, see tiger.sim.record")
+        sub.add_argument("--cache-dir", help="spike cache, in the store by default")
+
+    commands.choices[BUILD].add_argument("--nest", action="store_true", help="also build the network in NEST")
+    commands.choices[BUILD].add_argument("--verbose", action="store_true", help="print every projection")
+    commands.choices[RUN].add_argument("--workers", type=int, default=1, help="processes sharing the trials")
+    commands.choices["sweep"].add_argument("--set", action="append", default=[], metavar="SECTION.KEY=V1,V2",
+                                           help="values of one setting, e.g. network.lgn_cnt=10,20,40")
+
+    analyze_parser = commands.add_parser(ANALYZE, help="analyze stored runs")
+    analyze_parser.set_defaults(handler=analyze)
+    analyze_parser.add_argument("runs", nargs="+", help="names of runs in the store")
+    analyze_parser.add_argument("--plot", action="store_true", help="plot the mean rate of every layer per stimulus")
+
+    bench_parser = commands.add_parser("bench", help="benchmark build, simulation and startup, see tiger/sim/bench.py")
+    bench_parser.set_defaults(handler=bench)
+    bench_parser.add_argument("bench_args", nargs=argparse.REMAINDER)
+
+    worker_parser = commands.add_parser("worker")
+    worker_parser.set_defaults(handler=worker)
+    worker_parser.add_argument("run_dir")
+    worker_parser.add_argument("index", type=int)
+    worker_parser.add_argument("count", type=int)
+    worker_parser.add_argument("cache_dir")
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+def _store(args: argparse.Namespace) -> store.ResultStore:
+    return store.ResultStore(Path(args.store)) if args.store is not None else store.ResultStore.default()
+
+
+def _cache_dir(args: argparse.Namespace) -> Path:
+    if getattr(args, 'cache_dir', None) is not None:
+        return Path(args.cache_dir)
+
+    return Path(_store(args).root, _CACHE_SUBDIR)
+
+
+# The config file with the command line settings on top.
+def _load_config(args: argparse.Namespace) -> RunConfig:
+    run_cfg = RunConfig.load(Path(args.config))
+
+    if args.threads is not None:
+        run_cfg.cfg = run_cfg.cfg.with_nest_threads(args.threads).with_tuned_topology(False)
+
+    for record in args.record:
+        selector, _, spec = record.partition("=")
+        run_cfg.record[selector] = spec
+
+    return run_cfg
+
+
+# The run of a config in the store. Starting a run again with other settings would mix the
+# trials of both, so it is refused. Configs without a root seed get the one of the existing run,
+# or a new one stored with the run, so that all workers of a run and every later stage build
+# the same network.
+def _open_run(args: argparse.Namespace, run_cfg: RunConfig) -> store.Run:
+    name = args.name if args.name is not None else Path(args.config).stem
+    run = _store(args).run(name)
+
+    if run.exists():
+        stored = run.load_meta()['config']
+
+        if run_cfg.cfg.root_seed is None:
+            run_cfg.cfg.root_seed = stored['network']['root_seed']
+
+        if stored != run_cfg.to_dict():
+            raise ValueError(f"run {name} exists with other settings, remove it or choose another --name")
+    else:
+        if run_cfg.cfg.root_seed is None:
+            run_cfg.cfg.root_seed = _new_root_seed()
+
+        run.save_meta({'config': run_cfg.to_dict(), 'stages': {}})
+
+    return run
+
+
+# Waits for all workers. Once one fails the others are stopped, they may be waiting for the
+# warm-up of the first one.
+def _wait_for_workers(procs: List[subprocess.Popen]) -> bool:
+    while any(proc.poll() is None for proc in procs):
+        if any(proc.poll() not in (None, 0) for proc in procs):
+            for proc in procs:
+                if proc.poll() is None:
+                    proc.terminate()
+
+            break
+
+        time.sleep(_WORKER_POLL_S)
+
+    return all(proc.wait() == 0 for proc in procs)
+
+
+def _new_root_seed() -> int:
+    return int(np.random.SeedSequence().entropy)
+
+
+def _start_worker(run: store.Run, index: int, count: int, cache_dir: Path) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "tiger", "worker", str(run.directory), str(index), str(count), str(cache_dir)]
+    return subprocess.Popen(cmd)
+
+
+def _parse_axis(s: str):
+    key, _, values = s.partition("=")
+    section, _, setting = key.partition(".")
+
+    if section not in ('network', 'experiment') or setting == "":
+        raise ValueError(f"expected network.KEY=V1,V2 or experiment.KEY=V1,V2, got {s}")
+
+    return section, setting, [_parse_value(v) for v in values.split(",")]
+
+
+# Numbers and booleans as JSON, anything else as a string, e.g. a stimulus set name.
+def _parse_value(s: str):
+    try:
+        return json.loads(s)
+    except ValueError:
+        return s
@@ -1,9 +1,18 @@
+from typing import Optional
+
+
 class Config:
     lgn_cnt: int
     cortex_cnt: int
     vis_angle_deg: float
     nest_thread_cnt: int
     sim_step_ms: float
+    use_tuned_topology: bool
+    root_seed: Optional[int]
+    memory_budget_mb: Optional[float]
+    strict_validation: bool
+    randomize_initial_state: bool
+    heterogeneous_neurons: bool
     
     def __init__(self) -> None:
         # Reduced because of high complexity during connection of neurons.
@@ -12,6 +21,19 @@ class Config:
         self.vis_angle_deg = 2.0
         self.nest_thread_cnt = 8
         self.sim_step_ms = 1.0
+        # Thread count measured by tiger/sim/tune.py for this host, if any.
+        self.use_tuned_topology = True
+        # A random root seed is drawn when none is given.
+        self.root_seed = None
+        # Builds estimated to need more fail before anything is created, 80 % of the
+        # physical memory when None.
+        self.memory_budget_mb = None
+        # Builds of networks with empty projections fail instead of only reporting them.
+        self.strict_validation = False
+        # Membrane potentials of neurons start uniformly between reset and threshold instead of at rest.
+        self.randomize_initial_state = True
+        # C_m, g_L and V_th are drawn per neuron around the values of its model.
+        self.heterogeneous_neurons = False
 
     def with_lgn_cnt(self, lgn_cnt: int) -> "Config":
         self.lgn_cnt = lgn_cnt
@@ -32,3 +54,45 @@ class Config:
     def with_sim_step_ms(self, sim_step_ms: float) -> "Config":
         self.sim_step_ms = sim_step_ms
         return self
+
+    def with_tuned_topology(self, use_tuned_topology: bool) -> "Config":
+        self.use_tuned_topology = use_tuned_topology
+        return self
+
+    def with_root_seed(self, root_seed: int) -> "Config":
+        self.root_seed = root_seed
+        return self
+
+    def with_memory_budget_mb(self, memory_budget_mb: float) -> "Config":
+        self.memory_budget_mb = memory_budget_mb
+        return self
+
+    def with_strict_validation(self, strict_validation: bool) -> "Config":
+        self.strict_validation = strict_validation
+        return self
+
+    def with_randomized_initial_state(self, randomize_initial_state: bool) -> "Config":
+        self.randomize_initial_state = randomize_initial_state
+        return self
+
+    def with_heterogeneous_neurons(self, heterogeneous_neurons: bool) -> "Config":
+        self.heterogeneous_neurons = heterogeneous_neurons
+        return self
+
+    # Values of every setting, e.g. as read from a config file. Unknown keys are refused, a
+    # misspelled setting would silently keep its default otherwise.
+    @staticmethod
+    def from_dict(values: dict) -> "Config":
+        cfg = Config()
+        unknown = sorted(set(values) - set(vars(cfg)))
+
+        if len(unknown) > 0:
+            raise ValueError(f"unknown network settings: {', '.join(unknown)}")
+
+        for key, value in values.items():
+            setattr(cfg, key, value)
+
+        return cfg
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
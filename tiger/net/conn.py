@@ -1,16 +1,19 @@
 from typing import Any, Dict, List, Tuple
 
-import nest
-import nest.topology as tp
 import numpy as np
 
 from tiger.net.cfg import Config
+import tiger.net.grid as grid
 import tiger.net.layer as lyr
 import tiger.net.model as mdl
+import tiger.net.registry as reg
 
 
 D = 0.1
 
+# Connection type of projections that connect every source to every target.
+ALL_TO_ALL = "all_to_all"
+
 
 class FigConnConfig:
     cfg: Config
@@ -33,7 +36,6 @@ class FigConnConfig:
 # Returns connections between layers.
 def get_connections(cfg: Config) -> List:
     pop_size = lyr.pop_size_from_cfg(cfg)
-    _copy_synapse_model()
 
     # LGN connections    
     conns = _retinal_ganglion_cells_to_relay_cells(cfg)
@@ -64,10 +66,6 @@ def get_connections(cfg: Config) -> List:
     return conns
 
 
-def _copy_synapse_model() -> Any:
-    nest.CopyModel(mdl.STATIC_SYNAPSE, mdl.SYN)
-
-
 def _retinal_ganglion_cells_to_relay_cells(cfg: Config) -> List:
     fig_cfg = FigConnConfig(cfg)
     fig_cfg.center_weight_ns = 4.0
@@ -392,16 +390,21 @@ def _relay_cells_to_color_preferring_inh_cells(cfg: Config, pop_size: lyr.PopSiz
     ]
 
 
+# Every excitatory and inhibitory cortex layer to every other, layers looked up in one registry.
 def _horizontal_cortex_connections_in_l4c_beta(cfg: Config) -> List:
-    connections = _make_exc_to_exc_horizontal_cortex_conns(cfg)
-    connections += _make_exc_to_inh_horizontal_cortex_conns(cfg)
-    connections += _make_inh_to_exc_horizontal_cortex_conns(cfg)
-    connections += _make_inh_to_inh_horizontal_cortex_conns(cfg)
+    registry = reg.Registry.from_layers(lyr.layers(cfg))
+    exc_layers = registry.names(reg.of_kind(reg.CORTEX_EXC))
+    inh_layers = registry.names(reg.of_kind(reg.CORTEX_INH))
+
+    connections = _make_exc_to_exc_horizontal_cortex_conns(cfg, exc_layers)
+    connections += _make_exc_to_inh_horizontal_cortex_conns(cfg, exc_layers, inh_layers)
+    connections += _make_inh_to_exc_horizontal_cortex_conns(cfg, inh_layers, exc_layers)
+    connections += _make_inh_to_inh_horizontal_cortex_conns(cfg, inh_layers)
     
     return connections
 
 
-def _make_exc_to_exc_horizontal_cortex_conns(cfg: Config) -> List:
+def _make_exc_to_exc_horizontal_cortex_conns(cfg: Config, exc_layers: List[str]) -> List:
     fig_cfg = FigConnConfig(cfg)
     fig_cfg.sigma_deg = 0.05
     fig_cfg.mask_radius_deg = fig_cfg.sigma_deg * 3.0
@@ -414,12 +417,11 @@ def _make_exc_to_exc_horizontal_cortex_conns(cfg: Config) -> List:
     fig_cfg.target_row_cnt = cfg.cortex_cnt
     
     params = _make_circular_conn_dict(fig_cfg)
-    exc_layers = _get_exc_layer_ids()
     
     return _make_horizontal_cortex_connections(exc_layers, exc_layers, params)
 
 
-def _make_exc_to_inh_horizontal_cortex_conns(cfg: Config) -> List:
+def _make_exc_to_inh_horizontal_cortex_conns(cfg: Config, exc_layers: List[str], inh_layers: List[str]) -> List:
     fig_cfg = FigConnConfig(cfg)
     fig_cfg.sigma_deg = 0.05
     fig_cfg.mask_radius_deg = fig_cfg.sigma_deg * 3.0
@@ -432,13 +434,11 @@ def _make_exc_to_inh_horizontal_cortex_conns(cfg: Config) -> List:
     fig_cfg.target_row_cnt = cfg.cortex_cnt
     
     params = _make_circular_conn_dict(fig_cfg)
-    exc_layers = _get_exc_layer_ids()
-    inh_layers = _get_inh_layer_ids()
     
     return _make_horizontal_cortex_connections(exc_layers, inh_layers, params)
 
 
-def _make_inh_to_exc_horizontal_cortex_conns(cfg: Config) -> List:
+def _make_inh_to_exc_horizontal_cortex_conns(cfg: Config, inh_layers: List[str], exc_layers: List[str]) -> List:
     fig_cfg = FigConnConfig(cfg)
     fig_cfg.sigma_deg = 0.025
     fig_cfg.mask_radius_deg = fig_cfg.sigma_deg * 3.0
@@ -451,13 +451,11 @@ def _make_inh_to_exc_horizontal_cortex_conns(cfg: Config) -> List:
     fig_cfg.target_row_cnt = cfg.cortex_cnt
     
     params = _make_circular_conn_dict(fig_cfg)
-    inh_layers = _get_inh_layer_ids()
-    exc_layers = _get_exc_layer_ids()
     
     return _make_horizontal_cortex_connections(inh_layers, exc_layers, params)
 
 
-def _make_inh_to_inh_horizontal_cortex_conns(cfg: Config) -> List:
+def _make_inh_to_inh_horizontal_cortex_conns(cfg: Config, inh_layers: List[str]) -> List:
     fig_cfg = FigConnConfig(cfg)
     fig_cfg.sigma_deg = 0.025
     fig_cfg.mask_radius_deg = fig_cfg.sigma_deg * 3.0
@@ -470,49 +468,10 @@ def _make_inh_to_inh_horizontal_cortex_conns(cfg: Config) -> List:
     fig_cfg.target_row_cnt = cfg.cortex_cnt
     
     params = _make_circular_conn_dict(fig_cfg)
-    inh_layers = _get_inh_layer_ids()
     
     return _make_horizontal_cortex_connections(inh_layers, inh_layers, params)
 
 
-def _get_exc_layer_ids() -> List[str]:
-    return [
-        lyr.COLOR_LUMINANCE_L_ON_L_OFF_VERTICAL,
-        lyr.COLOR_LUMINANCE_L_ON_L_OFF_HORIZONTAL,
-        lyr.COLOR_LUMINANCE_L_OFF_L_ON_VERTICAL,
-        lyr.COLOR_LUMINANCE_L_OFF_L_ON_HORIZONTAL,
-        lyr.COLOR_LUMINANCE_M_ON_M_OFF_VERTICAL,
-        lyr.COLOR_LUMINANCE_M_ON_M_OFF_HORIZONTAL,
-        lyr.COLOR_LUMINANCE_M_OFF_M_ON_VERTICAL,
-        lyr.COLOR_LUMINANCE_M_OFF_M_ON_HORIZONTAL,
-        lyr.LUMINANCE_PREFERRING_ON_OFF_VERTICAL,
-        lyr.LUMINANCE_PREFERRING_ON_OFF_HORIZONTAL,
-        lyr.LUMINANCE_PREFERRING_OFF_ON_VERTICAL,
-        lyr.LUMINANCE_PREFERRING_OFF_ON_HORIZONTAL,
-        lyr.COLOR_PREFERRING_L_ON_M_OFF,
-        lyr.COLOR_PREFERRING_M_ON_L_OFF,
-    ]
-
-
-def _get_inh_layer_ids() -> List[str]:
-    return [
-        lyr.COLOR_LUMINANCE_INH_L_ON_L_OFF_VERTICAL,
-        lyr.COLOR_LUMINANCE_INH_L_ON_L_OFF_HORIZONTAL,
-        lyr.COLOR_LUMINANCE_INH_L_OFF_L_ON_VERTICAL,
-        lyr.COLOR_LUMINANCE_INH_L_OFF_L_ON_HORIZONTAL,
-        lyr.COLOR_LUMINANCE_INH_M_ON_M_OFF_VERTICAL,
-        lyr.COLOR_LUMINANCE_INH_M_ON_M_OFF_HORIZONTAL,
-        lyr.COLOR_LUMINANCE_INH_M_OFF_M_ON_VERTICAL,
-        lyr.COLOR_LUMINANCE_INH_M_OFF_M_ON_HORIZONTAL,
-        lyr.LUMINANCE_PREFERRING_INH_ON_OFF_VERTICAL,
-        lyr.LUMINANCE_PREFERRING_INH_ON_OFF_HORIZONTAL,
-        lyr.LUMINANCE_PREFERRING_INH_OFF_ON_VERTICAL,
-        lyr.LUMINANCE_PREFERRING_INH_OFF_ON_HORIZONTAL,
-        lyr.COLOR_PREFERRING_INH_L_ON_M_OFF,
-        lyr.COLOR_PREFERRING_INH_M_ON_L_OFF,
-    ]
-
-
 def _make_horizontal_cortex_connections(src_layers: List[str], target_layers: List[str], conn_params: Dict) -> List:
     connections = []
 
@@ -523,6 +482,22 @@ def _make_horizontal_cortex_connections(src_layers: List[str], target_layers: Li
     return connections
 
 
+# Projections connected by tp.ConnectLayers from their masks, the others by nest.Connect.
+def is_spatial(params: Dict) -> bool:
+    return params['connection_type'] != ALL_TO_ALL
+
+
+# Stencils of the mask of a projection spec between grids of the given row counts.
+def projection_stencils(params: Dict, src_row_cnt: int, target_row_cnt: int, vis_angle_deg: float) -> grid.Stencils:
+    index = grid.get_index(src_row_cnt, target_row_cnt, vis_angle_deg)
+    mask = params['mask']
+    
+    if 'circular' in mask:
+        return index.circular(mask['circular']['radius'])
+    
+    return index.rectangular(mask['rectangular']['lower_left'], mask['rectangular']['upper_right'])
+
+
 def _make_circular_conn_dict(cfg: FigConnConfig, kernel=1.0) -> Dict:
     total_weight, _ = _get_relative_weight_for_circular_mask(cfg)
     
@@ -541,19 +516,15 @@ def _make_circular_conn_dict(cfg: FigConnConfig, kernel=1.0) -> Dict:
 
 
 def _get_relative_weight_for_circular_mask(cfg: FigConnConfig) -> Tuple[float, int]:
-    # Create a fictional network and count the number of target connections
-    src_layer = _create_src_layer(cfg)
-    target_layer = _create_target_layer(cfg)
+    index = grid.get_index(cfg.src_row_cnt, cfg.target_row_cnt, cfg.cfg.vis_angle_deg)
+    stencils = index.circular(cfg.mask_radius_deg)
 
-    # Circular mask
-    mask_params = {
-        "connection_type":"divergent",
-        "mask": {"circular": {"radius": cfg.mask_radius_deg}},
-        "kernel": 1.0,
-        "weights": {"gaussian": {"p_center": 1.0, "sigma_deg": cfg.mask_radius_deg/3.0}}
-    }
+    # Gaussian weights with p_center 1.0 and sigma of a third of the mask radius
+    displacements = stencils.displacements(index.target.center_cell())
+    sigma_deg = cfg.mask_radius_deg / 3.0
+    weights = np.exp(-(displacements ** 2).sum(axis=1) / (2.0 * sigma_deg * sigma_deg))
     
-    return _get_relative_weight(src_layer, target_layer, mask_params)
+    return _get_relative_weight(weights)
 
 
 def _make_rect_conn_dict(cfg: FigConnConfig) -> Dict:
@@ -575,64 +546,27 @@ def _make_rect_conn_dict(cfg: FigConnConfig) -> Dict:
 
 
 def _get_relative_weight_for_rect_mask(cfg: FigConnConfig) -> Tuple[float, int]:
-    # Create a fictional network and count the number of target connections
-    src_layer = _create_src_layer(cfg)
-    target_layer = _create_target_layer(cfg)
+    index = grid.get_index(cfg.src_row_cnt, cfg.target_row_cnt, cfg.cfg.vis_angle_deg)
+    stencils = index.rectangular(cfg.mask_points[0:2], cfg.mask_points[2:4])
 
-    # Rectangular mask
-    mask_params = {
-        "connection_type":"convergent",
-        "mask": {'rectangular': {'lower_left':[cfg.mask_points[0], cfg.mask_points[1]],
-                                'upper_right':[cfg.mask_points[2], cfg.mask_points[3]]}},
-        "kernel": 1.0,
-        "weights": 1.0
-    }
+    # Unit weights
+    displacements = stencils.displacements(index.target.center_cell())
     
-    return _get_relative_weight(src_layer, target_layer, mask_params)
+    return _get_relative_weight(np.ones(len(displacements)))
 
 
 # Weights are normalized with the size of the network so that the sum of the weights
 # of all incoming synapses is always equal to a constant value.
-def _get_relative_weight(src_layer: Any, target_layer: Any, mask_params: Dict) -> Tuple[float, int]:
-    tp.ConnectLayers(src_layer,target_layer, mask_params)
-    ctr = tp.FindCenterElement(target_layer)
-    conn = nest.GetConnections(target=[ctr[0]])
-
-    st = nest.GetStatus(conn)
-
-    w = 0.0
-    for n in np.arange(len(st)):
-        w += st[n]['weight']
+# The incoming synapses are those of the center target cell, looked up in the spatial
+# index of the two grids instead of connecting a fictional network in NEST.
+def _get_relative_weight(weights: np.ndarray) -> Tuple[float, int]:
+    w = float(weights.sum())
 
     if w == 0.0:
         print ("Warning: found w = 0.0. Changed to 1.0.")
         w = 1.0
 
-    return w, len(conn)
-
-
-def _create_src_layer(cfg: FigConnConfig) -> Any:
-    layer_props = {
-    'rows'     : cfg.src_row_cnt,
-    'columns'  : cfg.src_row_cnt,
-    'extent'   : [cfg.cfg.vis_angle_deg, cfg.cfg.vis_angle_deg],
-    'edge_wrap': True,
-    'elements': 'iaf_cond_exp'
-    }
-
-    return tp.CreateLayer(layer_props)
-
-
-def _create_target_layer(cfg: FigConnConfig) -> Any:
-    layerProps = {
-        'rows'     : cfg.target_row_cnt,
-        'columns'  : cfg.target_row_cnt,
-        'extent'   : [cfg.cfg.vis_angle_deg, cfg.cfg.vis_angle_deg],
-        'edge_wrap': True,
-        'elements': 'iaf_cond_exp'
-    }
-
-    return tp.CreateLayer(layerProps)
+    return w, len(weights)
 
 
 def _noise_to_relay_cells(cfg: FigConnConfig) -> Any:
@@ -719,16 +653,12 @@ def _noise_to_inhibitory_cortex_cells(cfg: FigConnConfig) -> Any:
     ]
 
 
+# The single generator of a noise layer reaches every neuron of the target layer without a
+# spatial query, see is_spatial.
 def _make_noise_conn_dict(cfg: FigConnConfig) -> Any:
     return {
-        "connection_type":"convergent",
-        "mask": {"circular": {"radius": 0.001}}, # one-to-one connection
-        "kernel": 1.0,
+        "connection_type": ALL_TO_ALL,
         "delays" : cfg.cfg.sim_step_ms,
         "synapse_model": mdl.SYN,
         "weights": 1.0,
-        "sources": {"model": cfg.sources},
-        "targets": {"model": cfg.targets},
-        "allow_autapses":False,
-        "allow_multapses":False
     }
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from tiger.net.cfg import Config
+import tiger.net.conn as conn
+import tiger.net.layer as lyr
+import tiger.net.registry as reg
+
+
+# Rough per-object sizes of a 64-bit NEST 2.x build, including the kernel's bookkeeping.
+NEURON_BYTES = 1500
+GENERATOR_BYTES = 1000
+SYNAPSE_BYTES = 48
+SPIKE_TIME_BYTES = 8
+# Sender, time and V_m of one multimeter sample, sender and time of one detected spike.
+MULTIMETER_SAMPLE_BYTES = 24
+SPIKE_EVENT_BYTES = 16
+# Rate assumed for the spike detector buffers and the retina spike trains.
+EXPECTED_RATE_HZ = 20.0
+# Python interpreter and NEST kernel before the network is created.
+BASE_BYTES = 300 * 1024**2
+
+_MB = 1024**2
+
+
+# Raised before anything is created in NEST when a run would not fit into the memory budget.
+class MemoryBudgetExceeded(MemoryError):
+    def __init__(self, estimate: "Estimate", budget_bytes: int) -> None:
+        super().__init__(f"estimated {estimate.total_bytes() / _MB:.0f} MB exceeds the budget of "
+                         f"{budget_bytes / _MB:.0f} MB\n{estimate.format()}")
+        self.estimate = estimate
+        self.budget_bytes = budget_bytes
+
+
+# Predicted size of a network built from a Config, from the same layer specs and mask
+# geometry as tiger.net.conn, so without building anything.
+class Estimate:
+    neuron_cnt: int
+    node_cnt: int
+    # Source layer, target layer and synapse count of every projection.
+    synapse_cnts: List[Tuple[str, str, int]]
+    node_bytes: int
+    recorder_bytes: int
+
+    def __init__(self, neuron_cnt: int, node_cnt: int, synapse_cnts: List[Tuple[str, str, int]],
+                 node_bytes: int) -> None:
+        self.neuron_cnt = neuron_cnt
+        self.node_cnt = node_cnt
+        self.synapse_cnts = synapse_cnts
+        self.node_bytes = node_bytes
+        self.recorder_bytes = 0
+
+    def synapse_cnt(self) -> int:
+        return sum(cnt for _, _, cnt in self.synapse_cnts)
+
+    def breakdown(self) -> Dict[str, int]:
+        return {
+            'base': BASE_BYTES,
+            'nodes': self.node_bytes,
+            'synapses': self.synapse_cnt() * SYNAPSE_BYTES,
+            'recorders': self.recorder_bytes,
+        }
+
+    def total_bytes(self) -> int:
+        return sum(self.breakdown().values())
+
+    def format(self) -> str:
+        lines = [f"  {self.neuron_cnt} neurons, {self.node_cnt} nodes, {self.synapse_cnt()} synapses"]
+        lines += [f"  {part}: {size / _MB:.1f} MB" for part, size in self.breakdown().items()]
+        largest = sorted(self.synapse_cnts, key=lambda p: -p[2])[0:5]
+        lines += [f"    {src} -> {target}: {cnt} synapses" for src, target, cnt in largest]
+        return "\n".join(lines)
+
+
+# Nodes and synapses of every projection of the network, plus the retina spike trains over
+# sim_time_ms. conns are the projections of tiger.net.conn.get_connections, computed here when
+# not given.
+def estimate(cfg: Config, sim_time_ms: float, conns: List = None) -> Estimate:
+    layers = lyr.layers(cfg)
+    registry = reg.Registry.from_layers(layers)
+
+    if conns is None:
+        conns = conn.get_connections(cfg)
+
+    synapse_cnts = [(c[0], c[1], _synapse_cnt(registry[c[0]], registry[c[1]], c[2], cfg.vis_angle_deg))
+                    for c in conns]
+
+    node_bytes = 0
+
+    for pop in registry:
+        if reg.is_neuron(pop):
+            node_bytes += pop.size * NEURON_BYTES
+        else:
+            node_bytes += pop.size * GENERATOR_BYTES
+
+        if pop.kind == reg.RETINA:
+            node_bytes += int(pop.size * EXPECTED_RATE_HZ * sim_time_ms / 1000.0) * SPIKE_TIME_BYTES
+
+    neuron_cnt = sum(pop.size for pop in registry.select(reg.is_neuron))
+    node_cnt = sum(pop.size for pop in registry)
+
+    return Estimate(neuron_cnt, node_cnt, synapse_cnts, node_bytes)
+
+
+# Adds the buffers of multimeters and spike detectors holding horizon_ms of events of the
+# given numbers of recorded neurons.
+def add_recorders(est: Estimate, multimeter_cnt: int, detector_cnt: int, horizon_ms: float,
+                  interval_ms: float) -> Estimate:
+    samples = multimeter_cnt * int(horizon_ms / interval_ms)
+    spikes = int(detector_cnt * EXPECTED_RATE_HZ * horizon_ms / 1000.0)
+    est.recorder_bytes += samples * MULTIMETER_SAMPLE_BYTES + spikes * SPIKE_EVENT_BYTES
+    return est
+
+
+# Budget of the Config, 80 % of the physical memory when none is set.
+def budget_bytes(cfg: Config) -> int:
+    if cfg.memory_budget_mb is not None:
+        return int(cfg.memory_budget_mb * _MB)
+
+    return int(0.8 * os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE'))
+
+
+def check(cfg: Config, est: Estimate) -> None:
+    budget = budget_bytes(cfg)
+
+    if est.total_bytes() > budget:
+        raise MemoryBudgetExceeded(est, budget)
+
+
+# Groups jobs of the given estimated sizes so that the jobs of every group fit into the
+# budget together, largest first. A job over the budget on its own gets a group of its own.
+def pack(sizes: List[int], budget: int) -> List[List[int]]:
+    groups = []
+    free = []
+
+    for job in sorted(range(len(sizes)), key=lambda j: -sizes[j]):
+        for i in range(len(groups)):
+            if sizes[job] <= free[i]:
+                groups[i].append(job)
+                free[i] -= sizes[job]
+                break
+        else:
+            groups.append([job])
+            free.append(budget - sizes[job])
+
+    return groups
+
+
+def _synapse_cnt(src: reg.Population, target: reg.Population, params: Dict, extent_deg: float) -> int:
+    if not conn.is_spatial(params):
+        return src.size * target.size
+
+    stencils = conn.projection_stencils(params, src.grid.rows, target.grid.rows, extent_deg)
+    cnt = int(stencils.fan_in().sum())
+
+    # Every target of a projection within a layer would reach itself.
+    if src.name == target.name and not params.get('allow_autapses', True):
+        if np.any(np.all(stencils.displacements(0) == 0.0, axis=1)):
+            cnt -= target.size
+
+    return int(round(cnt * params.get('kernel', 1.0)))
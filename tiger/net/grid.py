@@ -0,0 +1,223 @@
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+# NEST topology stores the nodes of a grid layer column by column, so cell k of a
+# layer sits in column k // rows and row k % rows. Every cell index in this module
+# follows the same ordering.
+
+_EPS = 1e-9
+
+
+class Grid:
+    rows: int
+    cols: int
+    extent_deg: float
+
+    def __init__(self, rows: int, cols: int, extent_deg: float) -> None:
+        self.rows = rows
+        self.cols = cols
+        self.extent_deg = extent_deg
+
+    @property
+    def size(self) -> int:
+        return self.rows * self.cols
+
+    def col_step_deg(self) -> float:
+        return self.extent_deg / self.cols
+
+    def row_step_deg(self) -> float:
+        return self.extent_deg / self.rows
+
+    # x coordinate of every column, centered around the origin.
+    def xs(self) -> np.ndarray:
+        step = self.col_step_deg()
+        return -self.extent_deg / 2.0 + step / 2.0 + np.arange(self.cols) * step
+
+    # y coordinate of every row, row 0 is the top one.
+    def ys(self) -> np.ndarray:
+        step = self.row_step_deg()
+        return self.extent_deg / 2.0 - step / 2.0 - np.arange(self.rows) * step
+
+    def cells(self, cols: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return np.asarray(cols) * self.rows + np.asarray(rows)
+
+    def cols_rows(self, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return np.divmod(np.asarray(cells), self.rows)
+
+    def positions(self) -> np.ndarray:
+        cols, rows = self.cols_rows(np.arange(self.size))
+        return np.stack([self.xs()[cols], self.ys()[rows]], axis=1)
+
+    def center_cell(self) -> int:
+        return int(self.cells(self.cols // 2, self.rows // 2))
+
+
+# Maps every target position along one axis to the source grid.
+# Positions are measured in source steps: a target sits at base + phase where base is
+# the closest source at or before it and 0 <= phase < 1. Targets sharing a phase see
+# the same periodic neighbourhood, shifted by their base.
+class _Axis:
+    src_cnt: int
+    bases: np.ndarray
+    phase_ids: np.ndarray
+    phases: np.ndarray
+    offsets: np.ndarray
+    distances: np.ndarray
+
+    def __init__(self, src_cnt: int, target_cnt: int) -> None:
+        self.src_cnt = src_cnt
+
+        u = np.round((np.arange(target_cnt) + 0.5) * src_cnt / target_cnt - 0.5, 9)
+        self.bases = np.floor(u).astype(np.int64)
+        self.phases, self.phase_ids = np.unique(np.round(u - self.bases, 9), return_inverse=True)
+
+        # Candidate offsets cover exactly one period of the torus, so that no source
+        # is reachable twice from the same target.
+        lows = np.ceil(self.phases - src_cnt / 2.0).astype(np.int64)
+        self.offsets = lows[:, None] + np.arange(src_cnt)[None, :]
+        self.distances = self.offsets - self.phases[:, None]
+
+
+class Stencils:
+    src: Grid
+    target: Grid
+    _x: _Axis
+    _y: _Axis
+    _offsets: Dict[Tuple[int, int], np.ndarray]
+    _displacements: Dict[Tuple[int, int], np.ndarray]
+
+    def __init__(self, src: Grid, target: Grid, x: _Axis, y: _Axis) -> None:
+        self.src = src
+        self.target = target
+        self._x = x
+        self._y = y
+        self._offsets = {}
+        self._displacements = {}
+
+    # Number of sources inside the mask for each target cell.
+    def fan_in(self) -> np.ndarray:
+        px, py = self._target_phase_ids(np.arange(self.target.size))
+        counts = np.zeros((len(self._x.phases), len(self._y.phases)), dtype=np.int64)
+
+        for (ix, iy), offsets in self._offsets.items():
+            counts[ix, iy] = len(offsets)
+
+        return counts[px, py]
+
+    # Sum of weight(displacements) over the sources of each target cell, e.g. its total
+    # incoming weight for a weight profile over the source minus target positions.
+    def fan_in_weights(self, weight: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        px, py = self._target_phase_ids(np.arange(self.target.size))
+        sums = np.zeros((len(self._x.phases), len(self._y.phases)))
+
+        for (ix, iy), displacements in self._displacements.items():
+            sums[ix, iy] = weight(displacements).sum()
+
+        return sums[px, py]
+
+    # Number of targets reached by each source cell.
+    def fan_out(self) -> np.ndarray:
+        _, srcs = self.pairs()
+        return np.bincount(srcs, minlength=self.src.size)
+
+    def sources(self, target_cell: int) -> np.ndarray:
+        _, srcs = self.pairs(np.array([target_cell]))
+        return srcs
+
+    # Source minus target position for every source of the target, in degrees.
+    def displacements(self, target_cell: int) -> np.ndarray:
+        px, py = self._target_phase_ids(np.array([target_cell]))
+        return self._displacements[(int(px[0]), int(py[0]))]
+
+    # All (target cell, source cell) pairs inside the mask, for the given targets or
+    # for the whole target grid.
+    def pairs(self, target_cells: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        if target_cells is None:
+            target_cells = np.arange(self.target.size)
+
+        target_cells = np.asarray(target_cells, dtype=np.int64)
+        cols, rows = self.target.cols_rows(target_cells)
+        px, py = self._x.phase_ids[cols], self._y.phase_ids[rows]
+        tgts, srcs = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+
+        for (ix, iy), offsets in self._offsets.items():
+            selected = (px == ix) & (py == iy)
+
+            if not selected.any() or len(offsets) == 0:
+                continue
+
+            src_cols = (self._x.bases[cols[selected]][:, None] + offsets[None, :, 0]) % self.src.cols
+            src_rows = (self._y.bases[rows[selected]][:, None] + offsets[None, :, 1]) % self.src.rows
+
+            tgts.append(np.repeat(target_cells[selected], len(offsets)))
+            srcs.append(self.src.cells(src_cols, src_rows).ravel())
+
+        return np.concatenate(tgts), np.concatenate(srcs)
+
+    def _target_phase_ids(self, target_cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        cols, rows = self.target.cols_rows(target_cells)
+        return self._x.phase_ids[cols], self._y.phase_ids[rows]
+
+
+# Periodic displacement tables between a source and a target grid over the same extent.
+class GridIndex:
+    src: Grid
+    target: Grid
+    _x: _Axis
+    _y: _Axis
+    _stencils: Dict[Tuple, Stencils]
+
+    def __init__(self, src: Grid, target: Grid) -> None:
+        self.src = src
+        self.target = target
+        self._x = _Axis(src.cols, target.cols)
+        self._y = _Axis(src.rows, target.rows)
+        self._stencils = {}
+
+    def circular(self, radius_deg: float) -> Stencils:
+        key = ("circular", radius_deg)
+
+        if key not in self._stencils:
+            limit = radius_deg * radius_deg + _EPS
+            self._stencils[key] = self._make_stencils(
+                lambda dx, dy: dx[:, None] ** 2 + dy[None, :] ** 2 <= limit)
+
+        return self._stencils[key]
+
+    def rectangular(self, lower_left: List[float], upper_right: List[float]) -> Stencils:
+        key = ("rectangular", tuple(lower_left), tuple(upper_right))
+
+        if key not in self._stencils:
+            def inside(dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+                in_x = (dx >= lower_left[0] - _EPS) & (dx <= upper_right[0] + _EPS)
+                in_y = (dy >= lower_left[1] - _EPS) & (dy <= upper_right[1] + _EPS)
+                return in_x[:, None] & in_y[None, :]
+
+            self._stencils[key] = self._make_stencils(inside)
+
+        return self._stencils[key]
+
+    def _make_stencils(self, inside: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> Stencils:
+        stencils = Stencils(self.src, self.target, self._x, self._y)
+
+        for ix in range(len(self._x.phases)):
+            # Rows grow downwards while y grows upwards.
+            dx = self._x.distances[ix] * self.src.col_step_deg()
+
+            for iy in range(len(self._y.phases)):
+                dy = -self._y.distances[iy] * self.src.row_step_deg()
+                kx, ky = np.nonzero(inside(dx, dy))
+
+                stencils._offsets[(ix, iy)] = np.stack([self._x.offsets[ix][kx], self._y.offsets[iy][ky]], axis=1)
+                stencils._displacements[(ix, iy)] = np.stack([dx[kx], dy[ky]], axis=1)
+
+        return stencils
+
+
+# Indices are shared by every projection between grids of the same sizes.
+@lru_cache(maxsize=None)
+def get_index(src_cnt: int, target_cnt: int, extent_deg: float) -> GridIndex:
+    return GridIndex(Grid(src_cnt, src_cnt, extent_deg), Grid(target_cnt, target_cnt, extent_deg))
@@ -228,32 +228,25 @@ def _cortex_color_preferring_inh_layers(cfg: Config) -> List[Tuple[str, Dict]]:
     ]
 
 
+# A noise generator draws independent noise for every target it is connected to, so one
+# generator per family of layers feeds all of their neurons, see tiger.net.conn.
 def _noise_gen_layers(cfg: Config) -> List[Tuple[str, Dict]]:
-    base_lgn_props = _base_lgn_layer_props(cfg)
-    lgn_noise_layers = [(NOISE_GENERATORS_LGN, _merged_dicts(base_lgn_props, {'elements': mdl.THALAMO_NOISE}))]
-    
-    base_cortex_props = _base_cortex_layer_props(cfg)
-    ps = pop_size_from_cfg(cfg)
-    
-    cortex_exc_noise_layers = [
-        (NOISE_GENERATORS_COLOR_LUMINANCE, _merged_dicts(base_cortex_props, {'elements': mdl.THALAMO_NOISE,
-            'rows': ps.rows_color_luminance_exc,'columns': ps.rows_color_luminance_exc})),
-        (NOISE_GENERATORS_LUMINANCE_PREFERRING, _merged_dicts(base_cortex_props, {'elements': mdl.THALAMO_NOISE,
-            'rows': ps.rows_luminance_preferring_exc,'columns': ps.rows_luminance_preferring_exc})),
-        (NOISE_GENERATORS_COLOR_PREFERRING, _merged_dicts(base_cortex_props, {'elements': mdl.THALAMO_NOISE,
-            'rows': ps.rows_color_preferring_exc,'columns': ps.rows_color_preferring_exc})),
-    ]
-    
-    cortex_inh_noise_layers = [
-        (NOISE_GENERATORS_COLOR_LUMINANCE_INH, _merged_dicts(base_cortex_props, {'elements': mdl.THALAMO_NOISE,
-            'rows': ps.rows_color_luminance_inh,'columns': ps.rows_color_luminance_inh})),
-        (NOISE_GENERATORS_LUMINANCE_PREFERRING_INH, _merged_dicts(base_cortex_props, {'elements': mdl.THALAMO_NOISE,
-            'rows': ps.rows_luminance_preferring_inh,'columns': ps.rows_luminance_preferring_inh})),
-        (NOISE_GENERATORS_COLOR_PREFERRING_INH, _merged_dicts(base_cortex_props, {'elements': mdl.THALAMO_NOISE,
-            'rows': ps.rows_color_preferring_inh,'columns': ps.rows_color_preferring_inh})),
-    ]
+    props = {
+        'rows'     : 1,
+        'columns'  : 1,
+        'extent'   : [cfg.vis_angle_deg, cfg.vis_angle_deg],
+        'elements' : mdl.THALAMO_NOISE
+    }
     
-    return lgn_noise_layers + cortex_exc_noise_layers + cortex_inh_noise_layers
+    return [(name, props.copy()) for name in [
+        NOISE_GENERATORS_LGN,
+        NOISE_GENERATORS_COLOR_LUMINANCE,
+        NOISE_GENERATORS_LUMINANCE_PREFERRING,
+        NOISE_GENERATORS_COLOR_PREFERRING,
+        NOISE_GENERATORS_COLOR_LUMINANCE_INH,
+        NOISE_GENERATORS_LUMINANCE_PREFERRING_INH,
+        NOISE_GENERATORS_COLOR_PREFERRING_INH,
+    ]]
 
 
 def _merged_dicts(a: Dict, b: Dict) -> Dict:
@@ -1,4 +1,9 @@
-from typing import Dict, Tuple, List
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+import tiger.net.cfg as netcfg
 
 
 SPIKE_GENERATOR = "spike_generator"
@@ -14,43 +19,199 @@ THALAMO_NOISE = "thalamo_noise"
 SYN = "syn"
 STATIC_SYNAPSE = "static_synapse"
 
+# Abstract parents, copied in NEST like every other model but never instantiated.
+IAF_CELL = "tiger_iaf_cell"
+LGN_CELL = "tiger_lgn_cell"
+CORTEX_CELL = "tiger_cortex_cell"
+
+
+# Per-neuron values of a parameter, drawn for a whole layer at once. default is the model's
+# value of the parameter, values holds all parameters of the neurons, per neuron for those
+# drawn before.
+class Distribution(ABC):
+    @abstractmethod
+    def sample(self, rng: np.random.Generator, default: float, values: Dict, cnt: int) -> np.ndarray:
+        pass
+
+
+class Normal(Distribution):
+    mean: float
+    std: float
+
+    def __init__(self, mean: float, std: float) -> None:
+        self.mean = mean
+        self.std = std
+
+    def sample(self, rng: np.random.Generator, default: float, values: Dict, cnt: int) -> np.ndarray:
+        return rng.normal(self.mean, self.std, cnt)
+
+
+class Uniform(Distribution):
+    low: float
+    high: float
+
+    def __init__(self, low: float, high: float) -> None:
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: np.random.Generator, default: float, values: Dict, cnt: int) -> np.ndarray:
+        return rng.uniform(self.low, self.high, cnt)
+
+
+# Normal around the model's own value with a standard deviation of std.
+class NormalAround(Distribution):
+    std: float
+
+    def __init__(self, std: float) -> None:
+        self.std = std
+
+    def sample(self, rng: np.random.Generator, default: float, values: Dict, cnt: int) -> np.ndarray:
+        return default + rng.normal(0.0, self.std, cnt)
+
+
+# Uniform between two parameters of every neuron, e.g. from V_reset up to its own V_th.
+class Between(Distribution):
+    low: str
+    high: str
+
+    def __init__(self, low: str, high: str) -> None:
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: np.random.Generator, default: float, values: Dict, cnt: int) -> np.ndarray:
+        return rng.uniform(values[self.low], values[self.high], cnt)
+
+
+# Normal around the model's own value with a standard deviation of cv times that value,
+# keeping the sign of the value.
+class Jitter(Distribution):
+    cv: float
+
+    def __init__(self, cv: float) -> None:
+        self.cv = cv
+
+    def sample(self, rng: np.random.Generator, default: float, values: Dict, cnt: int) -> np.ndarray:
+        values = default * (1.0 + self.cv * rng.standard_normal(cnt))
+        return np.where(np.sign(values) == np.sign(default), values, default)
+
 
 class Model:
     name: str
+    # A NEST model or another model of the registry.
+    parent: str
+    # Parameters set on top of those of the parent.
     params: Dict
-    
-    def __init__(self, name: str, params: Dict) -> None:
+    # Distributions of per-neuron parameters, on top of those of the parent.
+    heterogeneity: Dict[str, Distribution]
+    # Distributions of state variables at the start of the simulation, e.g. V_m.
+    initial_state: Dict[str, Distribution]
+
+    def __init__(self, name: str, parent: str, params: Dict, heterogeneity: Dict[str, Distribution] = None,
+                 initial_state: Dict[str, Distribution] = None) -> None:
         self.name = name
+        self.parent = parent
         self.params = params
+        self.heterogeneity = heterogeneity if heterogeneity is not None else {}
+        self.initial_state = initial_state if initial_state is not None else {}
+
+
+# Models of the network. Every model inherits the parameters and distributions of its parent
+# and overrides some of them; parents are registered before their children, so the models can
+# be copied in NEST in registration order with one CopyModel each.
+class ModelRegistry:
+    _models: Dict[str, Model]
+
+    def __init__(self) -> None:
+        self._models = {}
+
+    def add(self, model: Model) -> None:
+        if model.name in self._models:
+            raise ValueError(f"model {model.name} is already registered")
+
+        self._models[model.name] = model
+
+    def __getitem__(self, name: str) -> Model:
+        return self._models[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._models
+
+    def __iter__(self) -> Iterator[Model]:
+        return iter(self._models.values())
+
+    # NEST model at the root of the inheritance chain.
+    def nest_model(self, name: str) -> str:
+        while name in self._models:
+            name = self._models[name].parent
+
+        return name
+
+    # All parameters of a model, those of its ancestors overridden by its own.
+    def params(self, name: str) -> Dict:
+        params = {}
+
+        for model in self._chain(name):
+            params.update(model.params)
+
+        return params
 
+    def heterogeneity(self, name: str) -> Dict[str, Distribution]:
+        heterogeneity = {}
 
-def get_models() -> List[Tuple[str, str, Dict]]:
-    retinal_ganglion_cell = _retinal_ganglion_cell()
-    lgn_relay_cell = _lgn_relay_cell()
-    lgn_interneuron_cell = _lgn_interneuron_cell()
-    cortex_exc_cell = _cortex_excitatory_cell()
-    cortex_inh_cell = _cortex_inhibitory_cell()
-    thalamo_noise = _thalamo_noise()
-    
-    return [
-        (retinal_ganglion_cell.name, RETINAL_GANGLION_CELL, retinal_ganglion_cell.params),
-        (lgn_relay_cell.name, LGN_RELAY_CELL, lgn_relay_cell.params),
-        (lgn_interneuron_cell.name, LGN_INTERNEURON, lgn_interneuron_cell.params),
-        (cortex_exc_cell.name, CORTEX_EXC_CELL, cortex_exc_cell.params),
-        (cortex_inh_cell.name, CORTEX_INH_CELL, cortex_inh_cell.params),
-        (thalamo_noise.name, THALAMO_NOISE, thalamo_noise.params),
-    ]
-
-
-# Ganglion cells in retinas act as spike generators.
-# Spikes are given as an array.
-def _retinal_ganglion_cell() -> Model:
-    params = {"origin": 0.0, "start": 0.0}
-    return Model(SPIKE_GENERATOR, params)
-
-
-def _lgn_relay_cell() -> Model:
-    params = {
+        for model in self._chain(name):
+            heterogeneity.update(model.heterogeneity)
+
+        return heterogeneity
+
+    def initial_state(self, name: str) -> Dict[str, Distribution]:
+        initial_state = {}
+
+        for model in self._chain(name):
+            initial_state.update(model.initial_state)
+
+        return initial_state
+
+    # Whether neurons of the model are drawn individually rather than all set by CopyModel.
+    def is_randomized(self, name: str) -> bool:
+        return len(self.heterogeneity(name)) > 0 or len(self.initial_state(name)) > 0
+
+    # (parent, name, own parameters) of every model, to be passed to CopyModel in this order.
+    def copy_specs(self) -> List[Tuple[str, str, Dict]]:
+        return [(model.parent, model.name, model.params) for model in self._models.values()]
+
+    # Values of every heterogeneous parameter and randomized state variable for cnt neurons of
+    # the model, drawn in a fixed order so that every rank draws the same values. Parameters
+    # are drawn before the state, which may depend on them.
+    def sample(self, name: str, rng: np.random.Generator, cnt: int) -> Dict[str, np.ndarray]:
+        params = self.params(name)
+        values = dict(params)
+        drawn = {}
+
+        for dists in (self.heterogeneity(name), self.initial_state(name)):
+            for param, dist in sorted(dists.items()):
+                drawn[param] = dist.sample(rng, params.get(param, 0.0), values, cnt)
+                values[param] = drawn[param]
+
+        return drawn
+
+    def _chain(self, name: str) -> List[Model]:
+        chain = []
+
+        while name in self._models:
+            chain.append(self._models[name])
+            name = self._models[name].parent
+
+        return chain[::-1]
+
+
+def get_models(cfg: netcfg.Config) -> ModelRegistry:
+    models = ModelRegistry()
+
+    # Ganglion cells in retinas act as spike generators.
+    # Spikes are given as an array.
+    models.add(Model(RETINAL_GANGLION_CELL, SPIKE_GENERATOR, {"origin": 0.0, "start": 0.0}))
+
+    models.add(Model(IAF_CELL, IAF_COND_ALPHA, {
         "C_m": 100.0,
         "g_L": 10.0,
         "E_L": -60.0,
@@ -58,62 +219,41 @@ def _lgn_relay_cell() -> Model:
         "V_reset": -60.0,
         "t_ref":  2.0,
         "E_ex": 0.0, # AMPA, from Hill-Tononi 2005
-        "E_in": -80.0, # GABA-A of thalamocortical cells, from Hill-Tononi 2005
         "tau_syn_ex": 1.0, # it approximates Hill-Tononi's diff. of exp. response, also Casti 2008
         "tau_syn_in": 3.0 # it approximates Hill-Tononi's diff. of exp. response
-    }
-    return Model(IAF_COND_ALPHA, params)
+    }, heterogeneity=_iaf_heterogeneity(cfg), initial_state=_iaf_initial_state(cfg)))
 
+    models.add(Model(LGN_CELL, IAF_CELL, {"E_in": -80.0})) # GABA-A of thalamocortical cells, from Hill-Tononi 2005
+    models.add(Model(LGN_RELAY_CELL, LGN_CELL, {}))
+    models.add(Model(LGN_INTERNEURON, LGN_CELL, {}))
 
-def _lgn_interneuron_cell() -> Model:
-    params = {
-        "C_m": 100.0,
-        "g_L": 10.0,
-        "E_L": -60.0,
-        "V_th": -55.0,
-        "V_reset": -60.0,
-        "t_ref":  2.0,
-        "E_ex": 0.0,
-        "E_in": -80.0,
-        "tau_syn_ex": 1.0,
-        "tau_syn_in": 3.0
-    }
-    return Model(IAF_COND_ALPHA, params)
+    models.add(Model(CORTEX_CELL, IAF_CELL, {"E_in": -70.0})) # GABA-A of cortical cells, from Hill-Tononi 2005
+    models.add(Model(CORTEX_EXC_CELL, CORTEX_CELL, {}))
+    models.add(Model(CORTEX_INH_CELL, CORTEX_CELL, {}))
 
+    # A Gaussian noise generator
+    models.add(Model(THALAMO_NOISE, NOISE_GENERATOR, {'mean': 0.0, 'std': 1.0}))
 
-def _cortex_excitatory_cell() -> Model:
-    params = {
-        "C_m": 100.0,
-        "g_L": 10.0,
-        "E_L": -60.0,
-        "V_th": -55.0,
-        "V_reset": -60.0,
-        "t_ref":  2.0,
-        "E_ex": 0.0,
-        "E_in": -70.0, # GABA-A of cortical cells, from Hill-Tononi 2005
-        "tau_syn_ex": 1.0,
-        "tau_syn_in": 3.0
-    }
-    return Model(IAF_COND_ALPHA, params)
+    # Synapse model of all projections.
+    models.add(Model(SYN, STATIC_SYNAPSE, {}))
 
+    return models
 
-def _cortex_inhibitory_cell() -> Model:
-    params = {
-        "C_m": 100.0,
-        "g_L": 10.0,
-        "E_L": -60.0,
-        "V_th": -55.0,
-        "V_reset": -60.0,
-        "t_ref":  2.0,
-        "E_ex": 0.0,
-        "E_in": -70.0,
-        "tau_syn_ex": 1.0,
-        "tau_syn_in": 3.0
-    }
-    return Model(IAF_COND_ALPHA, params)
-
-
-# A Gaussian noise generator
-def _thalamo_noise() -> Model:
-    params = {'mean': 0.0, 'std': 1.0}
-    return Model(NOISE_GENERATOR, params)
+
+# Membrane capacitance, leak and threshold spread over the cells of a type, around the values
+# of their model.
+def _iaf_heterogeneity(cfg: netcfg.Config) -> Dict[str, Distribution]:
+    if not cfg.heterogeneous_neurons:
+        return {}
+
+    return {"C_m": Jitter(0.1), "g_L": Jitter(0.1), "V_th": NormalAround(1.0)}
+
+
+# Membrane potentials spread between reset and threshold, the threshold of every cell when
+# it is heterogeneous, so that cells do not all leave rest in step at the start of the
+# simulation and none starts above its threshold.
+def _iaf_initial_state(cfg: netcfg.Config) -> Dict[str, Distribution]:
+    if not cfg.randomize_initial_state:
+        return {}
+
+    return {"V_m": Between("V_reset", "V_th")}
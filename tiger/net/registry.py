@@ -0,0 +1,152 @@
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+import tiger.net.grid as grid
+import tiger.net.model as mdl
+
+
+RETINA = "retina"
+LGN_RELAY = "lgn_relay"
+LGN_INTERNEURON = "lgn_interneuron"
+CORTEX_EXC = "cortex_exc"
+CORTEX_INH = "cortex_inh"
+NOISE = "noise"
+
+_KINDS_BY_MODEL = {
+    mdl.RETINAL_GANGLION_CELL: RETINA,
+    mdl.LGN_RELAY_CELL: LGN_RELAY,
+    mdl.LGN_INTERNEURON: LGN_INTERNEURON,
+    mdl.CORTEX_EXC_CELL: CORTEX_EXC,
+    mdl.CORTEX_INH_CELL: CORTEX_INH,
+    mdl.THALAMO_NOISE: NOISE,
+}
+
+
+# A layer of the network. The NEST ids are only known once the layer has been created.
+# The nodes of a layer form one block of consecutive GIDs in the column-major cell order of
+# its grid, so mapping between grid positions and GIDs is plain arithmetic.
+class Population:
+    name: str
+    model: str
+    kind: str
+    grid: grid.Grid
+    layer_id: Tuple
+    first_gid: int
+
+    def __init__(self, name: str, model: str, g: grid.Grid) -> None:
+        self.name = name
+        self.model = model
+        self.kind = _KINDS_BY_MODEL[model]
+        self.grid = g
+        self.layer_id = None
+        self.first_gid = None
+
+    @property
+    def size(self) -> int:
+        return self.grid.size
+
+    def is_created(self) -> bool:
+        return self.layer_id is not None
+
+    def gid_range(self) -> range:
+        return range(self.first_gid, self.first_gid + self.size)
+
+    def gids(self) -> List[int]:
+        return list(self.gid_range())
+
+    def gids_at(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        return self.first_gid + self.grid.cells(cols, rows)
+
+    def cells_of(self, gids: np.ndarray) -> np.ndarray:
+        return np.asarray(gids) - self.first_gid
+
+    def rows_cols_of(self, gids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        cols, rows = self.grid.cols_rows(self.cells_of(gids))
+        return rows, cols
+
+    def contains(self, gids: np.ndarray) -> np.ndarray:
+        gids = np.asarray(gids)
+        return (gids >= self.first_gid) & (gids < self.first_gid + self.size)
+
+    # Number of events of every neuron laid out as a (row, col) map, e.g. spikes per cell
+    # from the senders of a spike detector.
+    def topographic_counts(self, senders: np.ndarray) -> np.ndarray:
+        counts = np.bincount(self.cells_of(senders), minlength=self.size)
+        return counts.reshape(self.grid.cols, self.grid.rows).T
+
+    def positions(self) -> np.ndarray:
+        return self.grid.positions()
+
+
+class Registry:
+    _pops: Dict[str, Population]
+
+    def __init__(self) -> None:
+        self._pops = {}
+
+    # Populations of the layer specs of tiger.net.layer, in the same order.
+    @staticmethod
+    def from_layers(layers: List[Tuple[str, Dict]]) -> "Registry":
+        registry = Registry()
+
+        for name, props in layers:
+            g = grid.Grid(props['rows'], props['columns'], props['extent'][0])
+            registry.add(Population(name, props['elements'], g))
+
+        return registry
+
+    def add(self, pop: Population) -> None:
+        self._pops[pop.name] = pop
+
+    def bind(self, name: str, layer_id: Tuple, first_gid: int) -> None:
+        self._pops[name].layer_id = layer_id
+        self._pops[name].first_gid = first_gid
+
+    def __getitem__(self, name: str) -> Population:
+        return self._pops[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._pops
+
+    def __iter__(self) -> Iterator[Population]:
+        return iter(self._pops.values())
+
+    def __len__(self) -> int:
+        return len(self._pops)
+
+    def select(self, predicate: Callable[[Population], bool]) -> List[Population]:
+        return [pop for pop in self._pops.values() if predicate(pop)]
+
+    def names(self, predicate: Callable[[Population], bool] = None) -> List[str]:
+        if predicate is None:
+            return list(self._pops.keys())
+
+        return [pop.name for pop in self.select(predicate)]
+
+
+def of_kind(*kinds: str) -> Callable[[Population], bool]:
+    return lambda pop: pop.kind in kinds
+
+
+def is_cortex(pop: Population) -> bool:
+    return pop.kind in (CORTEX_EXC, CORTEX_INH)
+
+
+# Neurons, as opposed to spike and noise generators.
+def is_neuron(pop: Population) -> bool:
+    return pop.kind not in (RETINA, NOISE)
+
+
+# Retina and LGN layers of an ON channel. Cortex layer names also mention channels, e.g.
+# Color_preferring_L_ON_M_OFF, but do not belong to one.
+def is_on_channel(pop: Population) -> bool:
+    return _is_channel_kind(pop) and pop.name.endswith("_ON")
+
+
+def is_off_channel(pop: Population) -> bool:
+    return _is_channel_kind(pop) and pop.name.endswith("_OFF")
+
+
+def _is_channel_kind(pop: Population) -> bool:
+    return pop.kind in (RETINA, LGN_RELAY, LGN_INTERNEURON)
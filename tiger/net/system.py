@@ -7,7 +7,7 @@ import tiger.net.conn as conn
 
 
 def get_network(cfg: cfg.Config) -> Tuple:
-    models = mdl.get_models()
+    models = mdl.get_models(cfg)
     layers = lyr.layers(cfg)
     conns = conn.get_connections(cfg)
     
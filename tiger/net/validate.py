@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from tiger.net.cfg import Config
+import tiger.net.conn as conn
+import tiger.net.layer as lyr
+import tiger.net.registry as reg
+
+
+ERROR = "error"
+WARNING = "warning"
+
+# Fan-ins of one projection are expected to stay within this ratio over its targets.
+MAX_FAN_IN_RATIO = 2.0
+
+
+class Issue:
+    level: str
+    subject: str
+    message: str
+
+    def __init__(self, level: str, subject: str, message: str) -> None:
+        self.level = level
+        self.subject = subject
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"{self.level}: {self.subject}: {self.message}"
+
+
+# Fan-in, fan-out and incoming weight of the targets of one projection.
+class ProjectionStats:
+    src: str
+    target: str
+    synapse_cnt: int
+    fan_in: np.ndarray
+    fan_out: np.ndarray
+    # Total incoming weight of every target cell in nS, negative for inhibitory projections.
+    weight_sums: np.ndarray
+
+    def __init__(self, src: str, target: str, fan_in: np.ndarray, fan_out: np.ndarray,
+                 weight_sums: np.ndarray) -> None:
+        self.src = src
+        self.target = target
+        self.synapse_cnt = int(fan_in.sum())
+        self.fan_in = fan_in
+        self.fan_out = fan_out
+        self.weight_sums = weight_sums
+
+
+class InvalidNetwork(ValueError):
+    def __init__(self, issues: List[Issue]) -> None:
+        super().__init__("invalid network:\n" + "\n".join(f"  {issue}" for issue in issues))
+        self.issues = issues
+
+
+class Report:
+    projections: List[ProjectionStats]
+    # Total excitatory and inhibitory conductance of every cell of every target layer, noise excluded.
+    exc_ns: Dict[str, np.ndarray]
+    inh_ns: Dict[str, np.ndarray]
+    issues: List[Issue]
+
+    def __init__(self) -> None:
+        self.projections = []
+        self.exc_ns = {}
+        self.inh_ns = {}
+        self.issues = []
+
+    def errors(self) -> List[Issue]:
+        return [issue for issue in self.issues if issue.level == ERROR]
+
+    def warnings(self) -> List[Issue]:
+        return [issue for issue in self.issues if issue.level == WARNING]
+
+    def format(self) -> str:
+        lines = []
+
+        for p in self.projections:
+            lines.append(f"{p.src} -> {p.target}: {p.synapse_cnt} synapses, "
+                         f"fan-in {p.fan_in.min()}..{p.fan_in.max()} (mean {p.fan_in.mean():.1f}), "
+                         f"fan-out {p.fan_out.min()}..{p.fan_out.max()}, "
+                         f"weight per target {p.weight_sums.mean():.3f} nS")
+
+        for layer in self.exc_ns:
+            lines.append(f"{layer}: excitatory {self.exc_ns[layer].mean():.3f} nS, "
+                         f"inhibitory {self.inh_ns[layer].mean():.3f} nS per cell")
+
+        lines += [str(issue) for issue in self.issues]
+
+        return "\n".join(lines)
+
+
+# Checks every projection of the network from its spec alone: empty projections and targets
+# without sources, uneven fan-ins, and neuron layers without excitatory input. Nothing is built.
+# conns are the projections of tiger.net.conn.get_connections, computed here when not given.
+def validate(cfg: Config, conns: List = None) -> Report:
+    registry = reg.Registry.from_layers(lyr.layers(cfg))
+    report = Report()
+
+    for pop in registry.select(reg.is_neuron):
+        report.exc_ns[pop.name] = np.zeros(pop.size)
+        report.inh_ns[pop.name] = np.zeros(pop.size)
+
+    if conns is None:
+        conns = conn.get_connections(cfg)
+
+    for src_layer, target_layer, params in conns:
+        subject = f"{src_layer} -> {target_layer}"
+
+        if src_layer not in registry or target_layer not in registry:
+            report.issues.append(Issue(ERROR, subject, "unknown layer"))
+            continue
+
+        src, target = registry[src_layer], registry[target_layer]
+        stats = _projection_stats(src, target, params, cfg.vis_angle_deg)
+        report.projections.append(stats)
+        report.issues += _projection_issues(subject, stats)
+
+        if src.kind == reg.NOISE or target.name not in report.exc_ns:
+            continue
+
+        report.exc_ns[target.name] += np.maximum(stats.weight_sums, 0.0)
+        report.inh_ns[target.name] += np.maximum(-stats.weight_sums, 0.0)
+
+    for layer, exc in report.exc_ns.items():
+        if not np.any(exc > 0.0):
+            report.issues.append(Issue(WARNING, layer, "no excitatory input apart from noise"))
+
+    return report
+
+
+# Prints the errors of the network and the number of warnings, see main for the full report.
+# Errors raise InvalidNetwork with strict validation.
+def check(cfg: Config, conns: List = None) -> Report:
+    report = validate(cfg, conns)
+
+    if cfg.strict_validation and len(report.errors()) > 0:
+        raise InvalidNetwork(report.errors())
+
+    for issue in report.errors():
+        print(issue)
+
+    if len(report.warnings()) > 0:
+        print(f"{len(report.warnings())} warnings, run tiger/net/validate.py for details")
+
+    return report
+
+
+def _projection_stats(src: reg.Population, target: reg.Population, params: Dict,
+                      vis_angle_deg: float) -> ProjectionStats:
+    if not conn.is_spatial(params):
+        weight = float(params['weights'])
+        return ProjectionStats(src.name, target.name, np.full(target.size, src.size), np.full(src.size, target.size),
+                               np.full(target.size, src.size * weight))
+
+    stencils = conn.projection_stencils(params, src.grid.rows, target.grid.rows, vis_angle_deg)
+    kernel = params.get('kernel', 1.0)
+
+    # A target within its own layer does not connect to itself.
+    skips_self = src.name == target.name and not params.get('allow_autapses', True)
+
+    def counted(displacements: np.ndarray) -> np.ndarray:
+        if skips_self:
+            return np.any(displacements != 0.0, axis=1).astype(np.float64)
+
+        return np.ones(len(displacements))
+
+    weight = _weight_profile(params['weights'])
+
+    fan_in = np.rint(stencils.fan_in_weights(counted) * kernel).astype(np.int64)
+    weight_sums = stencils.fan_in_weights(lambda d: counted(d) * weight(d)) * kernel
+    fan_out = stencils.fan_out()
+
+    if skips_self and len(stencils.displacements(0)) > 0 and np.any(np.all(stencils.displacements(0) == 0.0, axis=1)):
+        fan_out = fan_out - 1
+
+    return ProjectionStats(src.name, target.name, fan_in, np.rint(fan_out * kernel).astype(np.int64), weight_sums)
+
+
+def _projection_issues(subject: str, stats: ProjectionStats) -> List[Issue]:
+    if stats.synapse_cnt == 0:
+        return [Issue(ERROR, subject, "projection is empty, its mask contains no source")]
+
+    issues = []
+    empty_cnt = int(np.sum(stats.fan_in == 0))
+
+    if empty_cnt > 0:
+        issues.append(Issue(WARNING, subject, f"{empty_cnt} of {len(stats.fan_in)} targets have no source"))
+    elif stats.fan_in.max() > MAX_FAN_IN_RATIO * stats.fan_in.min():
+        issues.append(Issue(WARNING, subject, f"fan-in varies from {stats.fan_in.min()} to {stats.fan_in.max()}"))
+
+    if np.all(stats.weight_sums == 0.0):
+        issues.append(Issue(ERROR, subject, "all weights are zero"))
+
+    return issues
+
+
+# Weight of a synapse from the displacement of its source, for the weight specs of tiger.net.conn.
+def _weight_profile(spec) -> Callable[[np.ndarray], np.ndarray]:
+    if not isinstance(spec, dict):
+        return lambda d: np.full(len(d), float(spec))
+
+    gaussian = spec['gaussian']
+    p_center = gaussian['p_center']
+    sigma = gaussian.get('sigma', gaussian.get('sigma_deg'))
+
+    return lambda d: p_center * np.exp(-(d ** 2).sum(axis=1) / (2.0 * sigma * sigma))
+
+
+def main():
+    start = time.perf_counter()
+    report = validate(Config())
+    print(report.format())
+    print(f"Validated {len(report.projections)} projections in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import tiger.net.cfg as netcfg
+import tiger.net.estimate as est
+import tiger.net.grid as grid
+import tiger.net.registry as reg
+import tiger.sim.kernel as kernel
+import tiger.sim.seed as sd
+import tiger.sim.sim as sim
+import tiger.sim.spike as sp
+import tiger.sim.stimulus as stim
+
+
+nest = kernel.lazy(kernel.NEST)
+
+BENCH_DIR = "BENCH_DIR"
+
+_RESULT_PREFIX = "BENCH_RESULT "
+
+_STIMULUS = stim.FlashingSquare(size_deg=1.0, onset_ms=10.0, duration_ms=30.0)
+
+# Metrics compared against the previous run, lower is better for all of them.
+_COMPARED_METRICS = [
+    "get_network", "create_layers", "connect_layers", "make_recorders",
+    "real_time_factor", "peak_rss_mb", "synapse_cnt",
+]
+
+# Modules that are imported without starting NEST, timed by the startup mode.
+_STARTUP_MODULES = [
+    "tiger.net.cfg",
+    "tiger.net.validate",
+    "tiger.net.estimate",
+    "tiger.analysis.raster",
+    "tiger.analysis.tuning",
+    "tiger.sim.sim",
+    "tiger.sim.flash",
+    "tiger.cli",
+]
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+import_s = time.perf_counter() - start
+print({prefix!r} + json.dumps({{'module': {module!r}, 'import_s': import_s, 'nest': 'nest' in sys.modules,
+                                'pyplot': 'matplotlib.pyplot' in sys.modules}}))
+"""
+
+
+# Sweeps lgn_cnt x cortex_cnt. Every point runs in a fresh process so that its peak RSS
+# is not hidden by the points before it. With pack, points whose estimated memory fits into
+# the budget together run at the same time; their timings then disturb each other.
+def run_sweep(lgn_cnts: List[int], cortex_cnts: List[int], sim_time_ms: float, thread_cnt: int,
+              pack: bool = False) -> Dict:
+    grid_points = [(lgn_cnt, cortex_cnt) for lgn_cnt in lgn_cnts for cortex_cnt in cortex_cnts]
+
+    if pack:
+        cfgs = [netcfg.Config().with_lgn_cnt(lgn_cnt).with_cortex_cnt(cortex_cnt) for lgn_cnt, cortex_cnt in grid_points]
+        sizes = [est.estimate(cfg, sim_time_ms).total_bytes() for cfg in cfgs]
+        groups = est.pack(sizes, est.budget_bytes(netcfg.Config()))
+    else:
+        groups = [[i] for i in range(len(grid_points))]
+
+    points = []
+
+    for group in groups:
+        procs = [_start_point(*grid_points[i], sim_time_ms, thread_cnt) for i in group]
+
+        for i, proc in zip(group, procs):
+            point = _point_result(proc)
+
+            if point is None:
+                print(f"lgn_cnt={grid_points[i][0]} cortex_cnt={grid_points[i][1]} failed...")
+                continue
+
+            print(_format_point(point))
+            points.append(point)
+
+    return {
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'commit': _git_commit(),
+        'host': socket.gethostname(),
+        'sim_time_ms': sim_time_ms,
+        'thread_cnt': thread_cnt,
+        'points': points,
+    }
+
+
+def _start_point(lgn_cnt: int, cortex_cnt: int, sim_time_ms: float, thread_cnt: int) -> subprocess.Popen:
+    cmd = [sys.executable, os.path.abspath(__file__), "point",
+           "--lgn-cnts", str(lgn_cnt), "--cortex-cnts", str(cortex_cnt),
+           "--sim-time", str(sim_time_ms), "--threads", str(thread_cnt)]
+
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+
+
+def _point_result(proc: subprocess.Popen) -> Dict:
+    stdout, _ = proc.communicate()
+
+    for line in stdout.splitlines():
+        if line.startswith(_RESULT_PREFIX):
+            return json.loads(line[len(_RESULT_PREFIX):])
+
+    return None
+
+
+def measure_point(cfg: netcfg.Config, sim_time_ms: float) -> Dict:
+    runner = sim.NetRunner(sim_time_ms, cfg)
+    runner.build_network()
+    lgn_grid = grid.Grid(cfg.lgn_cnt, cfg.lgn_cnt, cfg.vis_angle_deg)
+    stimulus_rng = runner.seeds.rng(sd.STIMULUS_STREAM)
+    runner.init_spike_generators(sp.gen_spikes(_STIMULUS, lgn_grid, sim_time_ms, cfg.sim_step_ms, stimulus_rng))
+
+    recorded = runner.registry.select(reg.is_neuron)
+    runner.simulate_with_recording(recorded, recorded)
+
+    point = {'lgn_cnt': cfg.lgn_cnt, 'cortex_cnt': cfg.cortex_cnt}
+    point.update(runner.timings)
+    point['real_time_factor'] = runner.timings['simulate'] / (sim_time_ms / 1000.0)
+    # ru_maxrss is in kilobytes on Linux.
+    point['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    point['synapse_cnt'] = nest.GetKernelStatus('num_connections')
+    point['node_cnt'] = nest.GetKernelStatus('network_size')
+    point['estimated_mb'] = runner.estimate.total_bytes() / 1024**2
+    point['estimated_synapse_cnt'] = runner.estimate.synapse_cnt()
+
+    return point
+
+
+# Import time of every startup module in a fresh interpreter, and of NEST itself for comparison.
+def measure_startup() -> List[Dict]:
+    results = []
+
+    for module in _STARTUP_MODULES + [kernel.NEST]:
+        script = _STARTUP_SCRIPT.format(module=module, prefix=_RESULT_PREFIX)
+        proc = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True)
+        result = _point_result(proc)
+
+        if result is None:
+            print(f"{module} failed to import...")
+            continue
+
+        results.append(result)
+
+    return results
+
+
+def save_report(report: Dict) -> Path:
+    bench_dir = _bench_dir()
+    bench_dir.mkdir(parents=True, exist_ok=True)
+
+    path = Path(bench_dir, report['created_at'].replace(":", "") + ".json")
+
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    return path
+
+
+# The most recent report saved before the given one, if any.
+def load_previous_report(path: Path) -> Dict:
+    reports = sorted(p for p in _bench_dir().glob("*.json") if p.name < path.name)
+
+    if len(reports) == 0:
+        return None
+
+    with open(reports[-1], "r") as f:
+        return json.load(f)
+
+
+def compare_reports(previous: Dict, current: Dict) -> List[str]:
+    lines = []
+    previous_points = {(p['lgn_cnt'], p['cortex_cnt']): p for p in previous['points']}
+
+    for point in current['points']:
+        key = (point['lgn_cnt'], point['cortex_cnt'])
+
+        if key not in previous_points:
+            continue
+
+        ratios = []
+
+        for metric in _COMPARED_METRICS:
+            old = previous_points[key].get(metric)
+            new = point.get(metric)
+
+            if old and new is not None:
+                ratios.append(f"{metric} x{new / old:.2f}")
+
+        lines.append(f"lgn_cnt={key[0]} cortex_cnt={key[1]}: " + ", ".join(ratios))
+
+    return lines
+
+
+def _format_point(point: Dict) -> str:
+    return (f"lgn_cnt={point['lgn_cnt']} cortex_cnt={point['cortex_cnt']}: "
+            f"get_network {point['get_network']:.2f} s, create_layers {point['create_layers']:.2f} s, "
+            f"connect_layers {point['connect_layers']:.2f} s, make_recorders {point['make_recorders']:.2f} s, "
+            f"real-time factor {point['real_time_factor']:.2f}, peak RSS {point['peak_rss_mb']:.0f} MB "
+            f"(estimated {point['estimated_mb']:.0f} MB), "
+            f"{point['synapse_cnt']} synapses")
+
+
+def _bench_dir() -> Path:
+    if BENCH_DIR in os.environ:
+        return Path(os.environ[BENCH_DIR])
+
+    return Path(os.getcwd(), "bench")
+
+
+def _git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, universal_newlines=True)
+    return result.stdout.strip()
+
+
+def _int_list(s: str) -> List[int]:
+    return [int(v) for v in s.split(",")]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measures build and simulation scaling of the network.")
+    parser.add_argument("mode", nargs="?", default="sweep", choices=["sweep", "point", "startup"])
+    parser.add_argument("--lgn-cnts", type=_int_list, default=[10, 20, 40])
+    parser.add_argument("--cortex-cnts", type=_int_list, default=[20, 40, 80])
+    parser.add_argument("--sim-time", type=float, default=50.0)
+    parser.add_argument("--threads", type=int, default=netcfg.Config().nest_thread_cnt)
+    parser.add_argument("--pack", action="store_true", help="run points that fit into memory together")
+    args = parser.parse_args(argv)
+
+    if args.mode == "point":
+        cfg = netcfg.Config().with_lgn_cnt(args.lgn_cnts[0]).with_cortex_cnt(args.cortex_cnts[0])
+        cfg = cfg.with_nest_threads(args.threads).with_tuned_topology(False).with_root_seed(0)
+        print(_RESULT_PREFIX + json.dumps(measure_point(cfg, args.sim_time)))
+        return
+
+    if args.mode == "startup":
+        results = measure_startup()
+
+        for result in results:
+            print(f"{result['module']}: {result['import_s']:.2f} s" + (", starts NEST" if result['nest'] else "")
+                  + (", imports pyplot" if result['pyplot'] else ""))
+
+        # Only NEST itself may start NEST.
+        if any(r['nest'] for r in results if r['module'] != kernel.NEST):
+            sys.exit(1)
+
+        return
+
+    report = run_sweep(args.lgn_cnts, args.cortex_cnts, args.sim_time, args.threads, args.pack)
+    path = save_report(report)
+    print(f"Saved to {path}")
+
+    previous = load_previous_report(path)
+
+    if previous is not None:
+        print(f"Compared to {previous['created_at']} ({previous['commit']}):")
+
+        for line in compare_reports(previous, report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import tiger.net.grid as grid
+import tiger.sim.spike as sp
+import tiger.sim.stimulus as stim
+
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+_TIMES_FILE = "times.npy"
+_OFFSETS_FILE = "offsets.npy"
+_META_FILE = "meta.json"
+
+
+# Ganglion cell spike trains on disk, keyed by everything they were generated from.
+# An entry stores the spike times of all cells of all channels as one flat array in ms plus the
+# offset of every cell in it, and is read back memory-mapped: the trains of a hit are views of
+# the file, read from disk only when NEST copies them.
+# Least recently used entries are evicted once the cache grows over max_bytes.
+class SpikeCache:
+    root: Path
+    max_bytes: int
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(params: Dict) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def get_or_generate(self, params: Dict,
+                        generate: Callable[[], List[List[np.ndarray]]]) -> List[List[np.ndarray]]:
+        key = SpikeCache.key(params)
+        spikes = self.get(key)
+
+        if spikes is None:
+            spikes = generate()
+            self.put(key, params, spikes)
+
+        return spikes
+
+    def get(self, key: str) -> List[List[np.ndarray]]:
+        entry = Path(self.root, key)
+
+        if not entry.exists():
+            return None
+
+        # Entries of an older layout are dropped and generated again.
+        if not Path(entry, _TIMES_FILE).exists():
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+
+        # The modification time of an entry is its last use.
+        os.utime(entry)
+
+        times = np.load(Path(entry, _TIMES_FILE), mmap_mode='r')
+        offsets = np.load(Path(entry, _OFFSETS_FILE)).tolist()
+
+        with open(Path(entry, _META_FILE), "r") as f:
+            cell_cnt = json.load(f)['cell_cnt']
+
+        return [[times[offsets[c * cell_cnt + i]:offsets[c * cell_cnt + i + 1]] for i in range(cell_cnt)]
+                for c in range((len(offsets) - 1) // cell_cnt)]
+
+    def put(self, key: str, params: Dict, spikes: List[List[np.ndarray]]) -> None:
+        trains = [train for channel in spikes for train in channel]
+        counts = np.array([len(train) for train in trains], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        times = np.concatenate([np.empty(0)] + trains).astype(np.float64)
+
+        # Entries appear atomically, concurrent writers of the same entry keep the first one.
+        tmp = Path(tempfile.mkdtemp(dir=self.root, prefix=".tmp-"))
+        np.save(Path(tmp, _TIMES_FILE), times)
+        np.save(Path(tmp, _OFFSETS_FILE), offsets)
+
+        with open(Path(tmp, _META_FILE), "w") as f:
+            json.dump({'params': params, 'cell_cnt': len(spikes[0])}, f)
+
+        try:
+            os.rename(tmp, Path(self.root, key))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self._evict()
+
+    def size_bytes(self) -> int:
+        return sum(_entry_bytes(entry) for entry in self._entries())
+
+    def _entries(self) -> List[Path]:
+        return [entry for entry in self.root.iterdir() if entry.is_dir() and not entry.name.startswith(".")]
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        sizes = [_entry_bytes(entry) for entry in entries]
+        total = sum(sizes)
+
+        # The newest entry is kept even when it alone is over the limit.
+        for entry, size in zip(entries[:-1], sizes[:-1]):
+            if total <= self.max_bytes:
+                break
+
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+# Spike trains of the stimulus on the LGN grid, generated with the given seed at most once.
+def cached_spikes(cache: SpikeCache, stimulus: stim.Stimulus, g: grid.Grid, duration_ms: float,
+                  step_ms: float, seed: int) -> List[List[np.ndarray]]:
+    params = {
+        'stimulus': stimulus.params(),
+        'lgn_cnt': g.rows,
+        'vis_angle_deg': g.extent_deg,
+        'duration_ms': duration_ms,
+        'step_ms': step_ms,
+        'seed': seed,
+    }
+
+    def generate() -> List[List[np.ndarray]]:
+        return sp.gen_spikes(stimulus, g, duration_ms, step_ms, np.random.default_rng(seed))
+
+    return cache.get_or_generate(params, generate)
+
+
+def _entry_bytes(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.iterdir())
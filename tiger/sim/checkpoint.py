@@ -0,0 +1,179 @@
+import json
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import tiger.net.cfg as netcfg
+
+
+# State variables of iaf_cond_alpha that NEST lets us read and set again. The refractory
+# counter is internal to the model, a neuron in its refractory period resumes as if it
+# had left it.
+STATE_VARIABLES = ["V_m", "g_ex", "dg_ex", "g_in", "dg_in"]
+
+_LATEST_FILE = "LATEST"
+_META_FILE = "meta.json"
+_STATS_FILE = "stats.pickle"
+
+
+# Neuron states of the local nodes of one rank at one moment, e.g. the settled state after a
+# warm-up that every trial of an experiment starts from.
+class Snapshot:
+    time_ms: float
+    gids: np.ndarray
+    # Values of every state variable, in the order of gids.
+    state: Dict[str, np.ndarray]
+
+    def __init__(self, time_ms: float, gids: np.ndarray, state: Dict[str, np.ndarray]) -> None:
+        self.time_ms = time_ms
+        self.gids = gids
+        self.state = state
+
+    # Snapshots of several ranks are merged into one, for processes with another rank layout.
+    @staticmethod
+    def merged(snapshots: List["Snapshot"]) -> "Snapshot":
+        return Snapshot(snapshots[0].time_ms, np.concatenate([s.gids for s in snapshots]),
+                        {key: np.concatenate([s.state[key] for s in snapshots]) for key in snapshots[0].state})
+
+    # Replaces the file at once, so processes waiting for it never read a partial snapshot.
+    def save(self, path: Path) -> None:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".npz")
+
+        with open(fd, "wb") as f:
+            np.savez(f, time_ms=self.time_ms, gids=self.gids, **self.state)
+
+        Path(tmp).rename(path)
+
+    @staticmethod
+    def load(path: Path) -> "Snapshot":
+        with np.load(path) as arrays:
+            return Snapshot(float(arrays['time_ms']), arrays['gids'], {key: arrays[key] for key in STATE_VARIABLES})
+
+
+# Periodic snapshots of a chunked simulation. Every checkpoint is a directory named after its
+# simulation time with the neuron states of every rank and the running statistics. The LATEST
+# file names the last complete one and is only replaced once all ranks have written theirs,
+# so a run killed while writing resumes from the checkpoint before.
+class Checkpointer:
+    directory: Path
+    interval_ms: float
+    _last_ms: float
+
+    def __init__(self, directory: Path, interval_ms: float) -> None:
+        self.directory = directory
+        self.interval_ms = interval_ms
+        self._last_ms = 0.0
+
+    def is_due(self, time_ms: float) -> bool:
+        return time_ms - self._last_ms >= self.interval_ms - 1e-9
+
+    # Neuron states of the local nodes of one rank.
+    def save_state(self, time_ms: float, rank: int, gids: Dict[str, np.ndarray], state: Dict[str, np.ndarray]) -> None:
+        checkpoint_dir = self._checkpoint_dir(time_ms)
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        arrays = {f"{key}_gids": values for key, values in gids.items()}
+        arrays.update(state)
+
+        fd, tmp = tempfile.mkstemp(dir=checkpoint_dir, prefix=".tmp-", suffix=".npz")
+
+        with open(fd, "wb") as f:
+            np.savez(f, **arrays)
+
+        Path(tmp).rename(Path(checkpoint_dir, f"rank-{rank}.npz"))
+
+    # Written by the root rank after every rank has saved its state, completes the checkpoint.
+    def commit(self, time_ms: float, cfg: netcfg.Config, root_seed: int, stats: object) -> None:
+        checkpoint_dir = self._checkpoint_dir(time_ms)
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(Path(checkpoint_dir, _STATS_FILE), "wb") as f:
+            pickle.dump(stats, f)
+
+        with open(Path(checkpoint_dir, _META_FILE), "w") as f:
+            json.dump({'time_ms': time_ms, 'root_seed': root_seed, 'network': _network_params(cfg)}, f, indent=2)
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+
+        with open(fd, "w") as f:
+            f.write(checkpoint_dir.name)
+
+        previous = self._latest_dir()
+        Path(tmp).rename(Path(self.directory, _LATEST_FILE))
+
+        if previous is not None and previous != checkpoint_dir:
+            shutil.rmtree(previous, ignore_errors=True)
+
+        self._last_ms = time_ms
+
+    # Meta data of the last complete checkpoint, None when there is none.
+    def latest(self) -> Dict:
+        checkpoint_dir = self._latest_dir()
+
+        if checkpoint_dir is None:
+            return None
+
+        with open(Path(checkpoint_dir, _META_FILE), "r") as f:
+            return json.load(f)
+
+    # Root seed to build the network with again, so that connections match the saved states.
+    def root_seed(self) -> int:
+        meta = self.latest()
+        return meta['root_seed'] if meta is not None else None
+
+    # GIDs and values of every state variable of all ranks, and the running statistics.
+    def load(self, cfg: netcfg.Config) -> Tuple[float, Dict[str, np.ndarray], Dict[str, np.ndarray], object]:
+        meta = self.latest()
+
+        if meta['network'] != _network_params(cfg):
+            raise ValueError(f"checkpoint in {self.directory} was taken of another network: {meta['network']}")
+
+        checkpoint_dir = self._checkpoint_dir(meta['time_ms'])
+        gids = {key: [] for key in STATE_VARIABLES}
+        state = {key: [] for key in STATE_VARIABLES}
+
+        for path in sorted(checkpoint_dir.glob("rank-*.npz")):
+            with np.load(path) as arrays:
+                for key in STATE_VARIABLES:
+                    if key in arrays:
+                        gids[key].append(arrays[f"{key}_gids"])
+                        state[key].append(arrays[key])
+
+        gids = {key: np.concatenate(values) for key, values in gids.items() if len(values) > 0}
+        state = {key: np.concatenate(values) for key, values in state.items() if len(values) > 0}
+
+        with open(Path(checkpoint_dir, _STATS_FILE), "rb") as f:
+            stats = pickle.load(f)
+
+        self._last_ms = meta['time_ms']
+
+        return meta['time_ms'], gids, state, stats
+
+    # Drops all checkpoints once the run they belong to has finished.
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._last_ms = 0.0
+
+    def _checkpoint_dir(self, time_ms: float) -> Path:
+        return Path(self.directory, f"t{time_ms:012.3f}")
+
+    def _latest_dir(self) -> Path:
+        latest = Path(self.directory, _LATEST_FILE)
+
+        if not latest.exists():
+            return None
+
+        return Path(self.directory, latest.read_text().strip())
+
+
+def _network_params(cfg: netcfg.Config) -> Dict:
+    return {
+        'lgn_cnt': cfg.lgn_cnt,
+        'cortex_cnt': cfg.cortex_cnt,
+        'vis_angle_deg': cfg.vis_angle_deg,
+        'sim_step_ms': cfg.sim_step_ms,
+    }
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+import tiger.sim.kernel as kernel
+
+
+nest = kernel.lazy(kernel.NEST)
+
+
+# Ranks of a NEST run started with mpirun. NEST spreads the nodes over the ranks on its own,
+# every rank only holds its local nodes and its own share of the recorded events.
+class Ranks:
+    rank: int
+    size: int
+    _comm: Any
+
+    def __init__(self) -> None:
+        self.rank = nest.Rank()
+        self.size = nest.NumProcesses()
+        self._comm = None
+
+        if self.size > 1:
+            self._comm = _mpi_comm()
+
+    def is_root(self) -> bool:
+        return self.rank == 0
+
+    def is_distributed(self) -> bool:
+        return self.size > 1
+
+    def barrier(self) -> None:
+        if self._comm is not None:
+            self._comm.Barrier()
+
+    # Every rank ends up with the value of the root rank.
+    def bcast(self, value: Any) -> Any:
+        if self._comm is None:
+            return value
+
+        return self._comm.bcast(value, root=0)
+
+    # The values of all ranks, in rank order, on every rank.
+    def allgather(self, value: Any) -> List[Any]:
+        if self._comm is None:
+            return [value]
+
+        return self._comm.allgather(value)
+
+    # Merges the events recorded on all ranks into one event dict on the root rank,
+    # sorted by time. Other ranks get an empty dict.
+    def gather_events(self, events: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        if self._comm is None:
+            return events
+
+        parts = self._comm.gather(events, root=0)
+
+        if not self.is_root():
+            return {}
+
+        return merge_events(parts)
+
+
+def merge_events(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    parts = [part for part in parts if len(part) > 0]
+
+    if len(parts) == 0:
+        return {}
+
+    merged = {key: np.concatenate([np.asarray(part[key]) for part in parts]) for key in parts[0]}
+
+    if 'times' in merged:
+        order = np.argsort(merged['times'], kind='stable')
+        merged = {key: values[order] for key, values in merged.items()}
+
+    return merged
+
+
+def _mpi_comm() -> Any:
+    try:
+        from mpi4py import MPI
+    except ImportError:
+        raise RuntimeError("mpi4py is required to gather results of a NEST run with more than one process")
+
+    return MPI.COMM_WORLD
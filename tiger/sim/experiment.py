@@ -0,0 +1,263 @@
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import tiger.analysis.raster as raster
+import tiger.analysis.tuning as tuning
+import tiger.net.cfg as netcfg
+import tiger.net.estimate as est
+import tiger.net.grid as grid
+import tiger.net.registry as reg
+import tiger.sim.cache as cache
+import tiger.sim.checkpoint as ckpt
+import tiger.sim.record as rec
+import tiger.sim.retina as retina
+import tiger.sim.sim as sim
+import tiger.sim.stimulus as stim
+import tiger.sim.store as store
+import tiger.sim.trials as trials
+
+
+FLASH = "flash"
+ORIENTATION = "orientation"
+COLOR = "color"
+RF = "rf"
+MOVIE = "movie"
+
+STIMULUS_SETS = [FLASH, ORIENTATION, COLOR, RF, MOVIE]
+
+# Snapshot of the warm-up of a run, shared by its workers.
+_WARM_UP_FILE = "warm_up.npz"
+_SNAPSHOT_POLL_S = 0.5
+
+# Layer selectors of recorded layers and record policies, besides layer names and kinds.
+_SELECTORS: Dict[str, Callable[[reg.Population], bool]] = {
+    'all': reg.is_neuron,
+    'cortex': reg.is_cortex,
+    'lgn': reg.of_kind(reg.LGN_RELAY, reg.LGN_INTERNEURON),
+}
+
+
+# A trial experiment of a config file: every stimulus of a set is shown trial_cnt times to
+# the network, and the spikes of the recorded layers are stored as rasters of every trial.
+class ExperimentSpec:
+    stimuli: str
+    trial_ms: float
+    trial_cnt: int
+    # Background activity simulated once before the trials, see NetRunner.warm_up.
+    warm_up_ms: float
+    # Spikes before it are left out of the rates, to skip the onset transient.
+    response_start_ms: float
+    bin_ms: float
+    # Selector of the layers whose spikes are recorded.
+    layers: str
+    orientations_deg: List[float]
+    rf_stride: int
+    flash_size_deg: float
+    flash_onset_ms: float
+    flash_duration_ms: float
+    # Frames of shape (frame, height, width, 3) in a .npy file, seen through tiger.sim.retina.
+    movie_path: str
+    movie_frame_ms: float
+    # Linear RGB frames, LMS cone responses otherwise.
+    movie_is_rgb: bool
+
+    def __init__(self) -> None:
+        self.stimuli = ORIENTATION
+        self.trial_ms = 200.0
+        self.trial_cnt = 5
+        self.warm_up_ms = 100.0
+        self.response_start_ms = 50.0
+        self.bin_ms = 10.0
+        self.layers = 'cortex'
+        self.orientations_deg = list(np.arange(0.0, 180.0, 22.5))
+        self.rf_stride = 2
+        self.flash_size_deg = 1.0
+        self.flash_onset_ms = 10.0
+        self.flash_duration_ms = 30.0
+        self.movie_path = None
+        self.movie_frame_ms = 10.0
+        self.movie_is_rgb = False
+
+    # Unknown keys are refused, as for tiger.net.cfg.Config.
+    @staticmethod
+    def from_dict(values: dict) -> "ExperimentSpec":
+        spec = ExperimentSpec()
+        unknown = sorted(set(values) - set(vars(spec)))
+
+        if len(unknown) > 0:
+            raise ValueError(f"unknown experiment settings: {', '.join(unknown)}")
+
+        for key, value in values.items():
+            setattr(spec, key, value)
+
+        if spec.stimuli not in STIMULUS_SETS:
+            raise ValueError(f"unknown stimulus set {spec.stimuli}, expected one of {', '.join(STIMULUS_SETS)}")
+
+        if spec.stimuli == MOVIE and spec.movie_path is None:
+            raise ValueError("the movie stimulus set needs a movie_path")
+
+        return spec
+
+    def to_dict(self) -> dict:
+        return {key: (list(map(float, value)) if key == 'orientations_deg' else value) for key, value in vars(self).items()}
+
+
+def stimulus_set(spec: ExperimentSpec, cfg: netcfg.Config) -> tuning.StimulusSet:
+    if spec.stimuli == ORIENTATION:
+        return tuning.orientation_set(spec.orientations_deg)
+
+    if spec.stimuli == COLOR:
+        return tuning.color_set()
+
+    if spec.stimuli == RF:
+        lgn_grid = grid.Grid(cfg.lgn_cnt, cfg.lgn_cnt, cfg.vis_angle_deg)
+        return tuning.rf_set(lgn_grid, lgn_grid.col_step_deg() * spec.rf_stride, spec.response_start_ms,
+                             spec.trial_ms - spec.response_start_ms, spec.rf_stride)
+
+    if spec.stimuli == MOVIE:
+        return tuning.StimulusSet([retina.NaturalImageSequence.load(spec.movie_path, spec.movie_frame_ms,
+                                                                    spec.movie_is_rgb)], {})
+
+    square = stim.FlashingSquare(spec.flash_size_deg, spec.flash_onset_ms, spec.flash_duration_ms)
+    return tuning.StimulusSet([square], {})
+
+
+# Layers picked by a selector: 'all', 'cortex', 'lgn', a population kind or a layer name.
+def select_layers(selector: str, registry: reg.Registry) -> List[str]:
+    if selector in _SELECTORS:
+        return registry.names(_SELECTORS[selector])
+
+    if selector in registry:
+        return [selector]
+
+    names = registry.names(reg.of_kind(selector))
+
+    if len(names) == 0:
+        raise ValueError(f"no layer matches {selector}")
+
+    return names
+
+
+# Record policies by layer from specs by selector, e.g. {'cortex': 'fraction:0.25'}. Later
+# selectors override earlier ones.
+def record_policies(specs: Dict[str, str], registry: reg.Registry) -> Dict[str, rec.RecordPolicy]:
+    policies = {}
+
+    for selector, spec in specs.items():
+        policy = rec.policy_from_spec(spec)
+
+        for layer in select_layers(selector, registry):
+            policies[layer] = policy
+
+    return policies
+
+
+# Runs the share of worker of worker_cnt of the stimuli, every worker-th stimulus, and stores
+# the rasters of its trials in the run. Workers build the same network from the same root seed
+# and so record the same neurons; the first one stores the samples. Only the first one warms
+# up, the others start their trials from its snapshot, see warm_up.
+def run_trials(cfg: netcfg.Config, spec: ExperimentSpec, record: Dict[str, str], run: store.Run,
+               cache_dir: Path, worker: int = 0, worker_cnt: int = 1) -> Dict[str, float]:
+    stimuli = stimulus_set(spec, cfg).stimuli
+    stimulus_ids = list(range(worker, len(stimuli), worker_cnt))
+
+    runner = sim.NetRunner(spec.trial_ms, cfg)
+    runner.build_network()
+    registry = runner.registry
+
+    if spec.warm_up_ms > 0.0:
+        warm_up(runner, spec.warm_up_ms, Path(run.directory, _WARM_UP_FILE), worker == 0)
+
+    scheduler = trials.TrialScheduler(runner, spec.trial_ms, spec.trial_cnt, cache.SpikeCache(cache_dir))
+    scheduler.response_start_ms = spec.response_start_ms
+    scheduler.bin_ms = spec.bin_ms
+    scheduler.raster_dir = run.raster_dir
+
+    spike_pops = [registry[layer] for layer in select_layers(spec.layers, registry)]
+    scheduler.run([stimuli[i] for i in stimulus_ids], spike_pops, record_policies(record, registry),
+                  on_trial=lambda s, t: print(f"worker {worker}: stimulus {stimulus_ids[s] + 1}/{len(stimuli)}, "
+                                              f"trial {t + 1}"),
+                  stimulus_ids=stimulus_ids)
+
+    if worker == 0 and runner.ranks.is_root():
+        rec.save_samples(runner.samples, run.directory)
+
+    return runner.timings
+
+
+# Makes the warm-up stored at path the start of every trial of the runner. The first worker
+# runs the warm-up and stores its snapshot unless a previous start of the run already did; the
+# others build their networks meanwhile and then wait for it. A run keeps its settings, so a
+# stored snapshot stays valid.
+def warm_up(runner: sim.NetRunner, duration_ms: float, path: Path, is_first: bool) -> None:
+    if is_first and not runner.ranks.bcast(path.exists()):
+        snapshot = runner.warm_up(duration_ms)
+
+        if runner.ranks.is_root():
+            snapshot.save(path)
+
+        return
+
+    while not path.exists():
+        time.sleep(_SNAPSHOT_POLL_S)
+
+    runner.use_snapshot(ckpt.Snapshot.load(path))
+
+
+# Rates of every recorded neuron per stimulus from the stored rasters of a run, and the
+# tuning of its stimulus set, saved per layer to the analysis directory of the run. Nothing
+# is simulated, so stored runs can be analyzed again at any time.
+def analyze(cfg: netcfg.Config, spec: ExperimentSpec, run: store.Run) -> Dict[str, Dict[str, float]]:
+    samples = rec.load_samples(run.directory)
+    stimulus = stimulus_set(spec, cfg)
+    start_bin = int(spec.response_start_ms // spec.bin_ms)
+    run.analysis_dir.mkdir(parents=True, exist_ok=True)
+    summary = {}
+
+    for layer, sample in samples.items():
+        responses = raster.stored_rates(run.raster_dir, layer, len(stimulus), spec.trial_cnt, spec.bin_ms, start_bin)
+        results = {'gids': sample.gids, 'responses': responses}
+        summary[layer] = {'mean_rate_hz': float(responses.mean())}
+
+        if spec.stimuli == ORIENTATION:
+            results['osi'], results['preferred_deg'] = tuning.orientation_selectivity(
+                responses, stimulus.labels['orientation_deg'])
+            summary[layer]['mean_osi'] = float(results['osi'].mean())
+        elif spec.stimuli == COLOR:
+            results['opponency'], results['w_l'], results['w_m'] = tuning.color_opponency(
+                responses, stimulus.labels['contrast_l'], stimulus.labels['contrast_m'])
+            summary[layer]['mean_opponency'] = float(results['opponency'].mean())
+        elif spec.stimuli == RF:
+            maps = tuning.rf_maps(responses, stimulus.labels)
+            results.update({'rf_on': maps['on'], 'rf_off': maps['off'], 'rf_center_deg': maps['center_deg']})
+
+        np.savez(Path(run.analysis_dir, f"{layer}.npz"), **results)
+
+    return summary
+
+
+# Mean rate of every layer for every stimulus of an analyzed run.
+def plot(run: store.Run, path: Path) -> None:
+    # Imported here, plotting is optional and matplotlib takes long to import.
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.add_subplot(1, 1, 1)
+
+    for result in sorted(run.analysis_dir.glob("*.npz")):
+        with np.load(result) as arrays:
+            ax.plot(arrays['responses'].mean(axis=0), label=result.stem)
+
+    ax.set_xlabel("stimulus")
+    ax.set_ylabel("mean rate (Hz)")
+    ax.legend(fontsize="xx-small")
+    fig.savefig(str(path))
+
+
+# Estimated memory of one network of the config for the spec, the unit the workers of a run
+# and the points of a sweep are packed into the memory budget with.
+def estimated_bytes(cfg: netcfg.Config, spec: ExperimentSpec) -> int:
+    return est.estimate(cfg, spec.warm_up_ms + spec.trial_ms).total_bytes()
@@ -1,28 +1,42 @@
 #!/usr/bin/env python3
 
-from typing import List, Tuple
+from typing import Dict, List
+import json
 import shutil
 from pathlib import Path
 import os
 
-import nest
-import matplotlib.pyplot as plt
+import numpy as np
 
+import tiger.analysis.raster as raster
+import tiger.net.cfg as netcfg
 import tiger.sim.sim as sim
+import tiger.sim.cache as cache
+import tiger.sim.checkpoint as ckpt
+import tiger.sim.record as rec
+import tiger.net.grid as grid
 import tiger.net.layer as lyr
-import tiger.sim.spike as sp
+import tiger.net.registry as reg
+import tiger.sim.seed as sd
+import tiger.sim.stimulus as stim
+import tiger.sim.writer as wr
 
 
 DATA_DIR = "DATA_DIR"
+CACHE_SUBDIR = "cache"
+CHECKPOINT_SUBDIR = "checkpoint"
 
 
 class FlashExperiment:
     sim_time: float
     net_runner: sim.NetRunner
+    checkpointer: ckpt.Checkpointer
     trial_cnt: int
     stimulus_id: str
+    stimulus: stim.Stimulus
     plot_start_time: float
     bin_size: float
+    chunk_ms: float
     layers_to_track: List[str]
     topo_layers: List[str]
     pop_layers: List[str]
@@ -33,7 +47,8 @@ class FlashExperiment:
     intracellular_cols: int
     intracellular_starting_row: int
     intracellular_starting_col: int
-    layers_to_record: List[int]
+    layers_to_record: List[reg.Population]
+    record_policies: Dict[str, rec.RecordPolicy]
     potentials: List
     spikes: List
     spike_subfolder: str
@@ -44,10 +59,14 @@ class FlashExperiment:
     
     def __init__(self) -> None:
         self.sim_time = 50.0
-        self.net_runner = sim.NetRunner(self.sim_time)
+        self.checkpointer = ckpt.Checkpointer(Path(os.environ[DATA_DIR], CHECKPOINT_SUBDIR), interval_ms=20.0)
+        # An interrupted run is resumed with the network it was started with.
+        config = netcfg.Config().with_root_seed(self.checkpointer.root_seed())
+        self.net_runner = sim.NetRunner(self.sim_time, config)
         self.trial_cnt = 2
         self.spike_subfolder = "flash"
         self.stimulus_id = "_square_"
+        self.stimulus = stim.FlashingSquare(size_deg=1.0, onset_ms=10.0, duration_ms=30.0)
         self.plot_start_time = 200.0
         
         # cell to analyze
@@ -59,50 +78,12 @@ class FlashExperiment:
         self.cortex_cnt = self.net_runner.config.cortex_cnt
         
         self.bin_size = 10.0
+        self.chunk_ms = 10.0
         
-        self.layers_to_track = [lyr.PARVO_LGN_RELAY_CELL_L_ON, lyr.PARVO_LGN_RELAY_CELL_L_OFF, lyr.PARVO_LGN_RELAY_CELL_M_ON, lyr.PARVO_LGN_RELAY_CELL_M_OFF]
-        self.layers_to_track += [lyr.PARVO_LGN_INTERNEURON_ON, lyr.PARVO_LGN_INTERNEURON_OFF]
-        self.layers_to_track += [
-            lyr.COLOR_LUMINANCE_L_ON_L_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_L_ON_L_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_L_OFF_L_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_L_OFF_L_ON_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_M_ON_M_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_M_ON_M_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_M_OFF_M_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_M_OFF_M_ON_HORIZONTAL,
-        ]
-        self.layers_to_track += [
-            lyr.LUMINANCE_PREFERRING_ON_OFF_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_ON_OFF_HORIZONTAL,
-            lyr.LUMINANCE_PREFERRING_OFF_ON_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_OFF_ON_HORIZONTAL,
-        ]
-        self.layers_to_track += [
-            lyr.COLOR_PREFERRING_L_ON_M_OFF,
-            lyr.COLOR_PREFERRING_M_ON_L_OFF,
-        ]
+        registry = reg.Registry.from_layers(lyr.layers(self.net_runner.config))
         
-        self.layers_to_track += [
-            lyr.COLOR_LUMINANCE_INH_L_ON_L_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_L_ON_L_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_INH_L_OFF_L_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_L_OFF_L_ON_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_INH_M_ON_M_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_M_ON_M_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_INH_M_OFF_M_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_M_OFF_M_ON_HORIZONTAL,
-        ]
-        self.layers_to_track += [
-            lyr.LUMINANCE_PREFERRING_INH_ON_OFF_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_INH_ON_OFF_HORIZONTAL,
-            lyr.LUMINANCE_PREFERRING_INH_OFF_ON_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_INH_OFF_ON_HORIZONTAL,
-        ]
-        self.layers_to_track += [
-            lyr.COLOR_PREFERRING_INH_L_ON_M_OFF,
-            lyr.COLOR_PREFERRING_INH_M_ON_L_OFF,
-        ]
+        self.layers_to_track = registry.names(reg.of_kind(reg.LGN_RELAY, reg.LGN_INTERNEURON))
+        self.layers_to_track += registry.names(reg.is_cortex)
         
         self.topo_layers = [
             lyr.PARVO_LGN_RELAY_CELL_L_ON,
@@ -118,41 +99,7 @@ class FlashExperiment:
             lyr.COLOR_PREFERRING_INH_L_ON_M_OFF,
         ]
         
-        self.pop_layers = [
-            lyr.COLOR_LUMINANCE_L_ON_L_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_L_ON_L_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_L_OFF_L_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_L_OFF_L_ON_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_M_ON_M_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_M_ON_M_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_M_OFF_M_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_M_OFF_M_ON_HORIZONTAL,
-            
-            lyr.LUMINANCE_PREFERRING_ON_OFF_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_ON_OFF_HORIZONTAL,
-            lyr.LUMINANCE_PREFERRING_OFF_ON_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_OFF_ON_HORIZONTAL,
-            
-            lyr.COLOR_PREFERRING_L_ON_M_OFF,
-            lyr.COLOR_PREFERRING_M_ON_L_OFF,
-            
-            lyr.COLOR_LUMINANCE_INH_L_ON_L_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_L_ON_L_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_INH_L_OFF_L_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_L_OFF_L_ON_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_INH_M_ON_M_OFF_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_M_ON_M_OFF_HORIZONTAL,
-            lyr.COLOR_LUMINANCE_INH_M_OFF_M_ON_VERTICAL,
-            lyr.COLOR_LUMINANCE_INH_M_OFF_M_ON_HORIZONTAL,
-            
-            lyr.LUMINANCE_PREFERRING_INH_ON_OFF_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_INH_ON_OFF_HORIZONTAL,
-            lyr.LUMINANCE_PREFERRING_INH_OFF_ON_VERTICAL,
-            lyr.LUMINANCE_PREFERRING_INH_OFF_ON_HORIZONTAL,
-            
-            lyr.COLOR_PREFERRING_INH_L_ON_M_OFF,
-            lyr.COLOR_PREFERRING_INH_M_ON_L_OFF,
-        ]
+        self.pop_layers = registry.names(reg.is_cortex)
         
         self.plot_intracellular = False
         self.plot_PSTH = False
@@ -166,24 +113,38 @@ class FlashExperiment:
         
         self.layers_to_record = []
         
+        # Every layer is recorded in full; a policy records a sample instead, e.g.
+        # rec.RandomFraction(0.25) for the rates of a large cortex layer.
+        self.record_policies = {}
+        
         self.potentials = []
         self.spikes = []
 
         # Retina references
-        self.retina_labels = [
-            lyr.MIDGET_GANGLION_CELLS_L_ON,
-            lyr.MIDGET_GANGLION_CELLS_L_OFF,
-            lyr.MIDGET_GANGLION_CELLS_M_ON,
-            lyr.MIDGET_GANGLION_CELLS_M_OFF,
-        ]
+        self.retina_labels = registry.names(reg.of_kind(reg.RETINA))
         
     def init_dirs(self) -> None:
+        # Ranks of a distributed run share the data directory.
+        if self.net_runner.ranks.is_root():
+            self._make_dirs()
+        
+        self.net_runner.ranks.barrier()
+
+    def _make_dirs(self) -> None:
         data_dir = Path(os.environ[DATA_DIR])
         
+        # Everything but the stimulus cache and the checkpoints of an interrupted run is regenerated.
         if data_dir.exists() and data_dir.is_dir():
-            shutil.rmtree(data_dir)
-        
-        os.mkdir(data_dir)
+            for path in data_dir.iterdir():
+                if path.name in (CACHE_SUBDIR, CHECKPOINT_SUBDIR):
+                    continue
+                
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+        else:
+            os.mkdir(data_dir)
 
         res_dir = Path(data_dir, "res")
         os.mkdir(res_dir)
@@ -199,39 +160,71 @@ class FlashExperiment:
 
     def simulate(self) -> None:
         self.net_runner.build_network()
-        retina_spikes = sp.gen_spikes(self.lgn_cnt, self.retina_labels)
+        cfg = self.net_runner.config
+        lgn_grid = grid.Grid(cfg.lgn_cnt, cfg.lgn_cnt, cfg.vis_angle_deg)
+        spike_cache = cache.SpikeCache(Path(os.environ[DATA_DIR], CACHE_SUBDIR))
+        stimulus_seed = self.net_runner.seeds.seed(sd.STIMULUS_STREAM)
+        retina_spikes = cache.cached_spikes(spike_cache, self.stimulus, lgn_grid, self.sim_time, cfg.sim_step_ms, stimulus_seed)
         self.net_runner.init_spike_generators(retina_spikes)
+        self.net_runner.resume(self.checkpointer)
         
-        self._load_layers_to_record(self.net_runner.layer_ids)
-        multimeters, detectors = self.net_runner.simulate_with_recording(self.layers_to_record,  self.layers_to_record)
+        self._load_layers_to_record(self.net_runner.registry)
+        multimeters, detectors, stats = self.net_runner.simulate_with_stats(
+            self.layers_to_record, self.layers_to_record, self.bin_size, self.chunk_ms, self.record_policies,
+            keep_events=True, checkpointer=self.checkpointer)
         
         data_dir = Path(os.environ[DATA_DIR])
-        
-        for multimeter in multimeters:
-            data = nest.GetStatus(multimeter[0])[0]['events']
+        seed_record = self.net_runner.seed_record()
+        is_root = self.net_runner.ranks.is_root()
+        
+        # Results are written and plotted while the events of the next recorders are gathered.
+        with wr.AsyncWriter() as writer:
+            if is_root:
+                writer.submit(_save_json, Path(data_dir, "res", "seeds.json"), seed_record)
+                writer.submit(rec.save_samples, self.net_runner.samples, Path(data_dir, "res"))
+                writer.submit(stats.save, Path(data_dir, "res", "stats.json"))
             
-            plt.figure(1)
-            print(len(data['times']))
-            plt.plot(data['times'][:5000], data['V_m'][:5000])
-            plt.savefig(str(Path(data_dir, f"{str(multimeter[0][0])}-{str(multimeter[2])}.png")))
-            plt.clf()
-
-    def _load_layers_to_record(self, layer_ids: List[Tuple[str, int, str]]) -> None:
-        self.layers_to_record = []
-        self.layer_sizes = []
-        
-        for layer in self.layers_to_track:
-            found = False
+            for multimeter in multimeters:
+                data = self.net_runner.get_events(multimeter[0])
+                
+                if not is_root:
+                    continue
+                
+                print(len(data['times']))
+                writer.submit(_save_trace, Path(data_dir, f"{str(multimeter[0][0])}-{multimeter[1].name}.png"),
+                              data['times'][:5000], data['V_m'][:5000])
             
-            for layer_id in layer_ids:
-                if layer_id[0] == layer:
-                    self.layers_to_record.append((layer_id[1], layer_id[2]))
-                    self.layer_sizes.append(len(nest.GetNodes(layer_id[1])[0]))
-                    found = True
+            spike_events = {detector[1].name: self.net_runner.get_events(detector[0]) for detector in detectors}
             
-            if not found:
-                print(f"Layer {layer} not found...")
-                self.layers_to_record.append((layer_id[1], layer_id[2]))
+            if is_root:
+                writer.submit(self._save_rasters, spike_events, Path(data_dir, "res", "rasters"))
+        
+        # The checkpoints are only dropped once the results are on disk.
+        if is_root:
+            self.checkpointer.clear()
+
+    def _save_rasters(self, spike_events: Dict[str, Dict], directory: Path) -> None:
+        rasters = raster.layer_rasters(spike_events, self.net_runner.samples, self.bin_size, self.sim_time)
+        raster.save_rasters(rasters, directory, trial=0)
+
+    def _load_layers_to_record(self, registry: reg.Registry) -> None:
+        self.layers_to_record = [registry[layer] for layer in self.layers_to_track]
+        self.layer_sizes = [pop.size for pop in self.layers_to_record]
+
+
+def _save_json(path: Path, data: Dict) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+# Pyplot keeps global state and must not be used off the main thread, a bare figure may.
+def _save_trace(path: Path, times: np.ndarray, v_m: np.ndarray) -> None:
+    # Imported here, results are rarely plotted and matplotlib takes long to import.
+    from matplotlib.figure import Figure
+    
+    fig = Figure()
+    fig.add_subplot(1, 1, 1).plot(times, v_m)
+    fig.savefig(str(path))
 
 
 def main():
@@ -0,0 +1,35 @@
+import importlib
+import sys
+import types
+
+
+NEST = "nest"
+TOPOLOGY = "nest.topology"
+
+
+# A module imported on its first attribute access. Importing NEST starts its kernel and prints
+# its banner, which takes seconds; the simulation modules hold lazy references instead, so that
+# configs, layer and projection specs, analysis and plotting import without it and the kernel
+# only starts once a network is simulated.
+class LazyModule(types.ModuleType):
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def load(self) -> types.ModuleType:
+        if self.__dict__['_module'] is None:
+            self.__dict__['_module'] = importlib.import_module(self.__name__)
+
+        return self.__dict__['_module']
+
+
+def lazy(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+# Whether the NEST kernel has been started in this process.
+def is_started() -> bool:
+    return NEST in sys.modules
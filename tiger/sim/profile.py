@@ -0,0 +1,105 @@
+import json
+import os
+import socket
+from pathlib import Path
+from typing import Dict, List
+
+import tiger.net.cfg as netcfg
+
+
+PROFILE_PATH = "TIGER_PROFILE"
+
+_DEFAULT_PROFILE_PATH = Path(Path.home(), ".tiger", "topology.json")
+
+
+# A measured thread/process split of one network size on one host.
+class Measurement:
+    proc_cnt: int
+    thread_cnt: int
+    build_time_s: float
+    real_time_factor: float
+
+    def __init__(self, proc_cnt: int, thread_cnt: int, build_time_s: float, real_time_factor: float) -> None:
+        self.proc_cnt = proc_cnt
+        self.thread_cnt = thread_cnt
+        self.build_time_s = build_time_s
+        self.real_time_factor = real_time_factor
+
+    # Wall time of one build followed by a simulation of horizon_ms.
+    def cost_s(self, horizon_ms: float) -> float:
+        return self.build_time_s + self.real_time_factor * horizon_ms / 1000.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'proc_cnt': self.proc_cnt,
+            'thread_cnt': self.thread_cnt,
+            'build_time_s': self.build_time_s,
+            'real_time_factor': self.real_time_factor,
+        }
+
+    @staticmethod
+    def from_dict(d: Dict) -> "Measurement":
+        return Measurement(d['proc_cnt'], d['thread_cnt'], d['build_time_s'], d['real_time_factor'])
+
+
+def profile_path() -> Path:
+    if PROFILE_PATH in os.environ:
+        return Path(os.environ[PROFILE_PATH])
+
+    return _DEFAULT_PROFILE_PATH
+
+
+def profile_key(cfg: netcfg.Config) -> str:
+    return f"{socket.gethostname()}/lgn{cfg.lgn_cnt}-cortex{cfg.cortex_cnt}"
+
+
+def load_profile() -> Dict:
+    path = profile_path()
+
+    if not path.exists():
+        return {}
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# Stores the best split overall and the best thread count for every process count, since
+# the process count is fixed by the launcher while the thread count is not.
+def save_measurements(cfg: netcfg.Config, measurements: List[Measurement], horizon_ms: float) -> Measurement:
+    best = min(measurements, key=lambda m: m.cost_s(horizon_ms))
+    threads_by_procs = {}
+
+    for proc_cnt in sorted(set(m.proc_cnt for m in measurements)):
+        same_procs = [m for m in measurements if m.proc_cnt == proc_cnt]
+        threads_by_procs[str(proc_cnt)] = min(same_procs, key=lambda m: m.cost_s(horizon_ms)).thread_cnt
+
+    profile = load_profile()
+    profile[profile_key(cfg)] = {
+        'best': best.to_dict(),
+        'threads_by_procs': threads_by_procs,
+        'horizon_ms': horizon_ms,
+        'measurements': [m.to_dict() for m in measurements],
+    }
+
+    path = profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+    return best
+
+
+# Sets the tuned thread count of this host and network size, if it was measured.
+def apply_profile(cfg: netcfg.Config, proc_cnt: int) -> None:
+    entry = load_profile().get(profile_key(cfg))
+
+    if entry is None:
+        return
+
+    threads_by_procs = entry['threads_by_procs']
+
+    if str(proc_cnt) in threads_by_procs:
+        cfg.nest_thread_cnt = threads_by_procs[str(proc_cnt)]
+    else:
+        cfg.nest_thread_cnt = max(1, entry['best']['thread_cnt'] * entry['best']['proc_cnt'] // proc_cnt)
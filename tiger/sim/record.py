@@ -0,0 +1,136 @@
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+import tiger.net.registry as reg
+
+
+# Chooses which neurons of a layer are connected to its recorders.
+class RecordPolicy(ABC):
+    @abstractmethod
+    def select(self, pop: reg.Population, rng: np.random.Generator) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def params(self) -> Dict:
+        pass
+
+
+class Full(RecordPolicy):
+    def select(self, pop: reg.Population, rng: np.random.Generator) -> np.ndarray:
+        return np.arange(pop.first_gid, pop.first_gid + pop.size)
+
+    def params(self) -> Dict:
+        return {'kind': 'full'}
+
+
+class RandomFraction(RecordPolicy):
+    fraction: float
+
+    def __init__(self, fraction: float) -> None:
+        self.fraction = fraction
+
+    def select(self, pop: reg.Population, rng: np.random.Generator) -> np.ndarray:
+        cnt = max(1, int(round(self.fraction * pop.size)))
+        cells = np.sort(rng.choice(pop.size, size=cnt, replace=False))
+        return pop.first_gid + cells
+
+    def params(self) -> Dict:
+        return {'kind': 'random_fraction', 'fraction': self.fraction}
+
+
+# Every stride-th row and column.
+class SpatialStride(RecordPolicy):
+    stride: int
+
+    def __init__(self, stride: int) -> None:
+        self.stride = stride
+
+    def select(self, pop: reg.Population, rng: np.random.Generator) -> np.ndarray:
+        rows = np.arange(0, pop.grid.rows, self.stride)
+        cols = np.arange(0, pop.grid.cols, self.stride)
+        return np.sort(pop.gids_at(rows[None, :], cols[:, None]).ravel())
+
+    def params(self) -> Dict:
+        return {'kind': 'spatial_stride', 'stride': self.stride}
+
+
+# A square of size x size cells around the center of the layer.
+class CenterPatch(RecordPolicy):
+    size: int
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+    def select(self, pop: reg.Population, rng: np.random.Generator) -> np.ndarray:
+        rows = _centered(pop.grid.rows, self.size)
+        cols = _centered(pop.grid.cols, self.size)
+        return np.sort(pop.gids_at(rows[None, :], cols[:, None]).ravel())
+
+    def params(self) -> Dict:
+        return {'kind': 'center_patch', 'size': self.size}
+
+
+# Recorded neurons of a layer, stored with the results so that rates can be scaled back
+# to the whole layer.
+class Sample:
+    layer: str
+    layer_size: int
+    gids: np.ndarray
+    policy: Dict
+
+    def __init__(self, layer: str, layer_size: int, gids: np.ndarray, policy: Dict) -> None:
+        self.layer = layer
+        self.layer_size = layer_size
+        self.gids = gids
+        self.policy = policy
+
+    def fraction(self) -> float:
+        return len(self.gids) / self.layer_size
+
+
+# Policy of a command line or config file spec: full, fraction:F, stride:N or center:N.
+def policy_from_spec(spec: str) -> RecordPolicy:
+    kind, _, value = spec.partition(":")
+
+    if kind == "full" and value == "":
+        return Full()
+    if kind == "fraction":
+        return RandomFraction(float(value))
+    if kind == "stride":
+        return SpatialStride(int(value))
+    if kind == "center":
+        return CenterPatch(int(value))
+
+    raise ValueError(f"unknown record policy: {spec}")
+
+
+_GIDS_FILE = "samples.npz"
+_SAMPLES_FILE = "samples.json"
+
+
+# Writes the GIDs of every sample to samples.npz and the layer sizes and policies to
+# samples.json in the given directory.
+def save_samples(samples: Dict[str, Sample], directory: Path) -> None:
+    np.savez(Path(directory, _GIDS_FILE), **{name: sample.gids for name, sample in samples.items()})
+
+    meta = {name: {'layer_size': sample.layer_size, 'policy': sample.policy} for name, sample in samples.items()}
+
+    with open(Path(directory, _SAMPLES_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_samples(directory: Path) -> Dict[str, Sample]:
+    with open(Path(directory, _SAMPLES_FILE), "r") as f:
+        meta = json.load(f)
+
+    with np.load(Path(directory, _GIDS_FILE)) as gids:
+        return {name: Sample(name, m['layer_size'], gids[name], m['policy']) for name, m in meta.items()}
+
+
+def _centered(cnt: int, size: int) -> np.ndarray:
+    start = max(0, cnt // 2 - size // 2)
+    return np.arange(start, min(cnt, start + size))
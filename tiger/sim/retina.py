@@ -0,0 +1,208 @@
+import hashlib
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+
+import tiger.net.grid as grid
+import tiger.sim.stimulus as stim
+
+
+# Linear RGB to LMS cone responses (Hunt-Pointer-Estevez, D65 normalized).
+RGB_TO_LMS = np.array([
+    [0.31399022, 0.63951294, 0.04649755],
+    [0.15537241, 0.75789446, 0.08670142],
+    [0.01775239, 0.10944209, 0.87256922],
+])
+
+
+def rgb_to_lms(frames: np.ndarray) -> np.ndarray:
+    return frames @ RGB_TO_LMS.T
+
+
+# Midget ganglion cells of the L and M channels. Every frame of an LMS movie is sampled on
+# the LGN grid, converted to cone contrasts, filtered with a center-surround difference of
+# Gaussians on the torus and with a biphasic temporal filter, and rectified into ON and OFF
+# rates. Movies are processed in batches of frames; the temporal filter state carries over
+# from one batch to the next.
+class Retina:
+    g: grid.Grid
+    frame_ms: float
+    step_ms: float
+    center_sigma_deg: float
+    surround_sigma_deg: float
+    surround_weight: float
+    tau_fast_ms: float
+    tau_slow_ms: float
+    slow_weight: float
+    background_hz: float
+    gain_hz: float
+    _frame_cnt: int
+    _fast_state: np.ndarray
+    _slow_state: np.ndarray
+
+    def __init__(self, g: grid.Grid, frame_ms: float, step_ms: float) -> None:
+        if abs(frame_ms / step_ms - round(frame_ms / step_ms)) > 1e-9:
+            raise ValueError(f"frame duration {frame_ms} ms is not a multiple of the step {step_ms} ms")
+
+        self.g = g
+        self.frame_ms = frame_ms
+        self.step_ms = step_ms
+        self.center_sigma_deg = 0.05
+        self.surround_sigma_deg = 0.25
+        self.surround_weight = 0.9
+        self.tau_fast_ms = 10.0
+        self.tau_slow_ms = 50.0
+        self.slow_weight = 0.5
+        self.background_hz = stim.BACKGROUND_RATE_HZ
+        self.gain_hz = stim.GAIN_HZ
+        self.reset()
+
+    def reset(self) -> None:
+        self._frame_cnt = 0
+        self._fast_state = np.zeros((1, 2, self.g.rows, self.g.cols))
+        self._slow_state = np.zeros((1, 2, self.g.rows, self.g.cols))
+
+    # Rates of shape (channel, time bin, row, col) for a batch of LMS frames of shape
+    # (frame, height, width, 3) covering the whole visual field.
+    def rates(self, frames: np.ndarray) -> np.ndarray:
+        contrasts = _cone_contrasts(_resample(np.asarray(frames, dtype=np.float64), self.g))
+        responses = self._temporal(self._spatial(contrasts))
+
+        bins_per_frame = int(round(self.frame_ms / self.step_ms))
+        responses = np.repeat(responses, bins_per_frame, axis=0)
+
+        r = np.empty((stim.CHANNEL_CNT,) + responses.shape[0:1] + responses.shape[2:])
+        r[stim.L_ON] = self.background_hz + self.gain_hz * np.maximum(responses[:, 0], 0.0)
+        r[stim.L_OFF] = self.background_hz + self.gain_hz * np.maximum(-responses[:, 0], 0.0)
+        r[stim.M_ON] = self.background_hz + self.gain_hz * np.maximum(responses[:, 1], 0.0)
+        r[stim.M_OFF] = self.background_hz + self.gain_hz * np.maximum(-responses[:, 1], 0.0)
+
+        self._frame_cnt += len(frames)
+
+        return r
+
+    # (start time, rates) chunks of a movie given as batches of frames, to be turned into
+    # spikes with spike.gen_spikes_from_rates.
+    def rate_chunks(self, batches: Iterable[np.ndarray]) -> Iterator[Tuple[float, np.ndarray]]:
+        for frames in batches:
+            start_ms = self._frame_cnt * self.frame_ms
+            yield start_ms, self.rates(frames)
+
+    # The center of every cell sees its own cone, the surround sees the mean of both cones.
+    def _spatial(self, contrasts: np.ndarray) -> np.ndarray:
+        center = _gaussian_fft(self.g.rows, self.g.cols, self.g.extent_deg, self.center_sigma_deg)
+        surround = _gaussian_fft(self.g.rows, self.g.cols, self.g.extent_deg, self.surround_sigma_deg)
+
+        spectra = np.fft.rfft2(contrasts, axes=(-2, -1))
+        surround_spectrum = spectra.mean(axis=1, keepdims=True) * surround
+        dog = spectra * center - self.surround_weight * surround_spectrum
+
+        return np.fft.irfft2(dog, s=(self.g.rows, self.g.cols), axes=(-2, -1))
+
+    def _temporal(self, responses: np.ndarray) -> np.ndarray:
+        fast, self._fast_state = _low_pass(responses, self.frame_ms, self.tau_fast_ms, self._fast_state)
+        slow, self._slow_state = _low_pass(responses, self.frame_ms, self.tau_slow_ms, self._slow_state)
+        return fast - self.slow_weight * slow
+
+
+# A sequence of LMS images covering the whole visual field, each shown for frame_ms and
+# repeated after the last one. Its ganglion rates come from the Retina, frame batch by frame
+# batch; cone_contrasts gives the unfiltered input, nearest pixels relative to the mean of
+# every cone channel.
+class NaturalImageSequence(stim.Stimulus):
+    frames: np.ndarray
+    frame_ms: float
+    name: str
+
+    def __init__(self, frames: np.ndarray, frame_ms: float, name: str) -> None:
+        self.frames = np.asarray(frames, dtype=np.float64)
+        self.frame_ms = frame_ms
+        self.name = name
+
+    # Frames of shape (frame, height, width, 3) from a .npy file, linear RGB when rgb is set.
+    @staticmethod
+    def load(path: str, frame_ms: float, rgb: bool = False) -> "NaturalImageSequence":
+        frames = np.load(path)
+        return NaturalImageSequence(rgb_to_lms(frames) if rgb else frames, frame_ms, path)
+
+    def cone_contrasts(self, times_ms: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        frame_cnt, height, width = self.frames.shape[0:3]
+        extent = xs[-1] - xs[0] + (xs[1] - xs[0] if len(xs) > 1 else 1.0)
+
+        # Nearest pixel of every grid position, row 0 of an image is its top.
+        cols = np.clip(((xs - xs[0]) / extent * width).astype(int), 0, width - 1)
+        rows = np.clip(((ys[0] - ys) / extent * height).astype(int), 0, height - 1)
+        frame_ids = (times_ms // self.frame_ms).astype(int) % frame_cnt
+
+        means = self.frames[..., 0:2].mean(axis=(0, 1, 2))
+        pixels = self.frames[frame_ids][:, rows][:, :, cols]
+        contrasts = np.clip((pixels[..., 0:2] - means) / means, -1.0, 1.0)
+
+        return contrasts[..., 0], contrasts[..., 1]
+
+    def rate_chunks(self, g: grid.Grid, duration_ms: float, step_ms: float,
+                    chunk_ms: float) -> Iterator[Tuple[float, np.ndarray]]:
+        retina = Retina(g, self.frame_ms, step_ms)
+        frame_cnt = int(np.ceil(duration_ms / self.frame_ms))
+        batch_size = max(1, int(chunk_ms // self.frame_ms))
+        bin_cnt = int(round(duration_ms / step_ms))
+
+        batches = (self.frames[np.arange(first, min(first + batch_size, frame_cnt)) % len(self.frames)]
+                   for first in range(0, frame_cnt, batch_size))
+
+        # The last frame is cut at duration_ms.
+        for start_ms, rates in retina.rate_chunks(batches):
+            yield start_ms, rates[:, 0:bin_cnt - int(round(start_ms / step_ms))]
+
+    def params(self) -> Dict:
+        return {
+            'kind': 'natural_image_sequence',
+            'name': self.name,
+            'frame_ms': self.frame_ms,
+            'shape': list(self.frames.shape),
+            'sha256': hashlib.sha256(np.ascontiguousarray(self.frames).tobytes()).hexdigest(),
+        }
+
+
+# Frames sampled on the grid: block averages when the frame size is a multiple of the grid
+# size, nearest pixels otherwise. Returns (frame, cone, row, col) for the L and M cones.
+def _resample(frames: np.ndarray, g: grid.Grid) -> np.ndarray:
+    frame_cnt, height, width = frames.shape[0:3]
+    cones = frames[..., 0:2]
+
+    if height % g.rows == 0 and width % g.cols == 0:
+        blocks = cones.reshape(frame_cnt, g.rows, height // g.rows, g.cols, width // g.cols, 2)
+        sampled = blocks.mean(axis=(2, 4))
+    else:
+        rows = ((np.arange(g.rows) + 0.5) * height / g.rows).astype(int)
+        cols = ((np.arange(g.cols) + 0.5) * width / g.cols).astype(int)
+        sampled = cones[:, rows][:, :, cols]
+
+    return sampled.transpose(0, 3, 1, 2)
+
+
+# Contrasts relative to the mean of every cone over the frame.
+def _cone_contrasts(cones: np.ndarray) -> np.ndarray:
+    means = cones.mean(axis=(2, 3), keepdims=True)
+    return (cones - means) / np.where(means > 0.0, means, 1.0)
+
+
+# Exponential low-pass filter along the frames, resumed from the given state.
+def _low_pass(x: np.ndarray, frame_ms: float, tau_ms: float, state: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Imported here, scipy.signal takes long to import and only movies need it.
+    from scipy import signal
+
+    a = np.exp(-frame_ms / tau_ms)
+    return signal.lfilter([1.0 - a], [1.0, -a], x, axis=0, zi=state)
+
+
+# Spectrum of a normalized Gaussian on the toroidal grid, shared by all batches.
+@lru_cache(maxsize=None)
+def _gaussian_fft(rows: int, cols: int, extent_deg: float, sigma_deg: float) -> np.ndarray:
+    dy = np.minimum(np.arange(rows), rows - np.arange(rows)) * extent_deg / rows
+    dx = np.minimum(np.arange(cols), cols - np.arange(cols)) * extent_deg / cols
+
+    kernel = np.exp(-(dy[:, None] ** 2 + dx[None, :] ** 2) / (2.0 * sigma_deg * sigma_deg))
+
+    return np.fft.rfft2(kernel / kernel.sum())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import os
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+import tiger.analysis.raster as raster
+import tiger.analysis.sta as sta
+import tiger.net.grid as grid
+import tiger.net.registry as reg
+import tiger.sim.flash as flash
+import tiger.sim.record as rec
+import tiger.sim.seed as sd
+import tiger.sim.sim as sim
+import tiger.sim.spike as sp
+import tiger.sim.stimulus as stim
+
+
+# Receptive fields of the cortex layers by reverse correlation with sparse noise on the retina.
+# The noise sequence is simulated and correlated chunk by chunk, so its length is only bounded
+# by time.
+class RevCorrExperiment:
+    net_runner: sim.NetRunner
+    noise: stim.NoiseStimulus
+    duration_ms: float
+    chunk_ms: float
+    lag_cnt: int
+    record_policies: Dict[str, rec.RecordPolicy]
+
+    def __init__(self) -> None:
+        self.chunk_ms = 1000.0
+        self.duration_ms = 60000.0
+        self.net_runner = sim.NetRunner(self.chunk_ms)
+        self.noise = stim.SparseNoise(frame_ms=20.0, density=0.05, seed=self.net_runner.seeds.seed(sd.STIMULUS_STREAM))
+        self.lag_cnt = 5
+        self.record_policies = {}
+
+    def run(self) -> None:
+        self.net_runner.build_network()
+        cfg = self.net_runner.config
+        lgn_grid = grid.Grid(cfg.lgn_cnt, cfg.lgn_cnt, cfg.vis_angle_deg)
+        cortex_pops = self.net_runner.registry.select(reg.is_cortex)
+
+        detectors = self.net_runner.make_trial_detectors(cortex_pops, self.chunk_ms, self.record_policies)
+        samples = self.net_runner.samples
+        accumulators = {pop.name: sta.StaAccumulator(len(samples[pop.name].gids), (2, lgn_grid.rows, lgn_grid.cols),
+                                                     self.lag_cnt) for pop in cortex_pops}
+
+        rng = self.net_runner.seeds.rng(sd.TRIAL_NOISE_STREAM)
+        frames_per_chunk = int(round(self.chunk_ms / self.noise.frame_ms))
+
+        for chunk, start_ms in enumerate(np.arange(0.0, self.duration_ms, self.chunk_ms)):
+            rates = stim.rates(self.noise, lgn_grid, start_ms, start_ms + self.chunk_ms, cfg.sim_step_ms)
+            spikes = sp.gen_spikes_from_rates([(0.0, rates)], lgn_grid, cfg.sim_step_ms, rng)
+            origin_ms, events = self.net_runner.run_segment(spikes, self.chunk_ms, detectors)
+
+            if not self.net_runner.ranks.is_root():
+                continue
+
+            frames = self.noise.frames(chunk * frames_per_chunk, frames_per_chunk, lgn_grid.rows, lgn_grid.cols)
+            rasters = raster.layer_rasters(events, samples, self.noise.frame_ms, self.chunk_ms, origin_ms)
+
+            for layer, r in rasters.items():
+                accumulators[layer].add(r, frames)
+
+            print(f"{start_ms + self.chunk_ms:.0f} of {self.duration_ms:.0f} ms")
+
+        if not self.net_runner.ranks.is_root():
+            return
+
+        out_dir = Path(os.environ[flash.DATA_DIR], "res", "revcorr")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        rec.save_samples(samples, out_dir)
+
+        for layer, accumulator in accumulators.items():
+            averages = accumulator.sta()
+            fields = sta.subfields(averages)
+            np.savez(Path(out_dir, f"{layer}.npz"), gids=samples[layer].gids, sta=averages,
+                     spike_cnts=accumulator.spike_cnts[0], peak_lag=fields['peak_lag'], on=fields['on'],
+                     off=fields['off'])
+
+
+def main():
+    RevCorrExperiment().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from typing import Dict, List
+
+import numpy as np
+
+
+# Independent streams derived from the root seed. New streams must be appended,
+# so that the seeds of the existing ones stay the same.
+NEST_STREAM = "nest"
+NEST_GLOBAL_STREAM = "nest_global"
+GLOBAL_STREAM = "global"
+STIMULUS_STREAM = "stimulus"
+TRIAL_NOISE_STREAM = "trial_noise"
+RECORDING_STREAM = "recording"
+INITIAL_STATE_STREAM = "initial_state"
+# Parent of the streams of every trial, not drawn from itself.
+TRIAL_STREAM = "trial"
+
+_STREAMS = [NEST_STREAM, NEST_GLOBAL_STREAM, GLOBAL_STREAM, STIMULUS_STREAM, TRIAL_NOISE_STREAM, RECORDING_STREAM,
+            INITIAL_STATE_STREAM, TRIAL_STREAM]
+
+# NEST expects seeds in [1, 2^31 - 1].
+_MAX_NEST_SEED = 2**31 - 1
+
+
+# Seeds of one run or one trial of a run. Identical root seeds, trials and virtual process
+# counts give identical seeds, and therefore bit-identical spikes. Trials branch off the trial
+# stream of the root, so their seeds never repeat a seed of the root or of another trial.
+class SeedPlan:
+    root_seed: int
+    trial: int
+    _streams: Dict[str, np.random.SeedSequence]
+
+    def __init__(self, root_seed: int, trial: int = None) -> None:
+        self.root_seed = root_seed
+        self.trial = trial
+
+        seq = np.random.SeedSequence(root_seed)
+
+        if trial is not None:
+            seq = _child(_child(seq, _STREAMS.index(TRIAL_STREAM)), trial)
+
+        self._streams = dict(zip(_STREAMS, seq.spawn(len(_STREAMS))))
+
+    @staticmethod
+    def random() -> "SeedPlan":
+        return SeedPlan(int(np.random.SeedSequence().entropy))
+
+    def for_trial(self, trial: int) -> "SeedPlan":
+        return SeedPlan(self.root_seed, trial)
+
+    def rng(self, stream: str) -> np.random.Generator:
+        return np.random.default_rng(self._streams[stream])
+
+    def seed(self, stream: str) -> int:
+        return _nest_seed(self._streams[stream])
+
+    # One seed per NEST virtual process.
+    def nest_seeds(self, virtual_proc_cnt: int) -> List[int]:
+        return [_nest_seed(_child(self._streams[NEST_STREAM], vp)) for vp in range(virtual_proc_cnt)]
+
+    def to_dict(self, virtual_proc_cnt: int) -> Dict:
+        return {
+            'root_seed': self.root_seed,
+            'trial': self.trial,
+            'nest_seeds': self.nest_seeds(virtual_proc_cnt),
+            'seeds': {stream: self.seed(stream) for stream in _STREAMS if stream not in (NEST_STREAM, TRIAL_STREAM)},
+        }
+
+
+# The i-th child of seq, the same one seq.spawn would return, but independent of how many
+# children were spawned before.
+def _child(seq: np.random.SeedSequence, i: int) -> np.random.SeedSequence:
+    return np.random.SeedSequence(seq.entropy, spawn_key=seq.spawn_key + (i,), pool_size=seq.pool_size)
+
+
+def _nest_seed(seq: np.random.SeedSequence) -> int:
+    return int(seq.generate_state(1, dtype=np.uint32)[0] % (_MAX_NEST_SEED - 1)) + 1
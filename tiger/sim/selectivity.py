@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+import tiger.analysis.tuning as tuning
+import tiger.net.grid as grid
+import tiger.net.registry as reg
+import tiger.sim.cache as cache
+import tiger.sim.flash as flash
+import tiger.sim.record as rec
+import tiger.sim.sim as sim
+import tiger.sim.trials as trials
+
+
+# Orientation and color selectivity and receptive fields of the cortex layers, from the mean
+# responses to a set of gratings and flashed squares over several trials.
+class SelectivityExperiment:
+    net_runner: sim.NetRunner
+    trial_ms: float
+    trial_cnt: int
+    orientations_deg: List[float]
+    rf_stride: int
+    record_policies: Dict[str, rec.RecordPolicy]
+    
+    def __init__(self) -> None:
+        self.trial_ms = 200.0
+        self.net_runner = sim.NetRunner(self.trial_ms)
+        self.trial_cnt = 5
+        self.orientations_deg = list(np.arange(0.0, 180.0, 22.5))
+        self.rf_stride = 2
+        self.record_policies = {}
+
+    def run(self) -> None:
+        self.net_runner.build_network()
+        cfg = self.net_runner.config
+        registry = self.net_runner.registry
+        cortex_pops = registry.select(reg.is_cortex)
+        
+        lgn_grid = grid.Grid(cfg.lgn_cnt, cfg.lgn_cnt, cfg.vis_angle_deg)
+        orientation_set = tuning.orientation_set(self.orientations_deg)
+        color_set = tuning.color_set()
+        rf_set = tuning.rf_set(lgn_grid, lgn_grid.col_step_deg() * self.rf_stride, 50.0, 100.0, self.rf_stride)
+        stimuli = orientation_set.stimuli + color_set.stimuli + rf_set.stimuli
+        
+        data_dir = Path(os.environ[flash.DATA_DIR])
+        scheduler = trials.TrialScheduler(self.net_runner, self.trial_ms, self.trial_cnt,
+                                          cache.SpikeCache(Path(data_dir, flash.CACHE_SUBDIR)))
+        scheduler.warm_up_ms = 100.0
+        scheduler.response_start_ms = 50.0
+        
+        responses = scheduler.run(stimuli, cortex_pops, self.record_policies,
+                                  on_trial=lambda s, t: print(f"stimulus {s + 1}/{len(stimuli)}, trial {t + 1}"))
+        
+        if not self.net_runner.ranks.is_root():
+            return
+        
+        out_dir = Path(data_dir, "res", "selectivity")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        rec.save_samples(self.net_runner.samples, out_dir)
+        
+        split = np.cumsum([len(orientation_set), len(color_set)])
+        
+        for layer, r in responses.items():
+            orientation_r, color_r, rf_r = np.split(r, split, axis=1)
+            osi, preferred_deg = tuning.orientation_selectivity(orientation_r, orientation_set.labels['orientation_deg'])
+            opponency, w_l, w_m = tuning.color_opponency(color_r, color_set.labels['contrast_l'],
+                                                         color_set.labels['contrast_m'])
+            maps = tuning.rf_maps(rf_r, rf_set.labels)
+            
+            np.savez(Path(out_dir, f"{layer}.npz"), gids=self.net_runner.samples[layer].gids, responses=r,
+                     osi=osi, preferred_deg=preferred_deg, opponency=opponency, w_l=w_l, w_m=w_m,
+                     rf_on=maps['on'], rf_off=maps['off'], rf_center_deg=maps['center_deg'])
+            
+            print(f"{layer}: mean OSI {osi.mean():.2f}, mean opponency {opponency.mean():.2f}")
+
+
+def main():
+    SelectivityExperiment().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,373 @@
 import time
-from typing import Dict, Iterable, List, Tuple
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
 
 import numpy as np
-import nest.topology as tp
-import nest
 
 import tiger.net.cfg as netcfg
+import tiger.net.conn as netconn
+import tiger.net.estimate as est
+import tiger.net.validate as val
 import tiger.net.system as netsys
 import tiger.net.layer as lyr
+import tiger.net.model as mdl
+import tiger.net.registry as reg
+import tiger.sim.checkpoint as ckpt
+import tiger.sim.dist as dist
+import tiger.sim.kernel as kernel
+import tiger.sim.profile as prof
+import tiger.sim.record as rec
+import tiger.sim.seed as sd
+import tiger.sim.stats as st
 
 
+nest = kernel.lazy(kernel.NEST)
+tp = kernel.lazy(kernel.TOPOLOGY)
+
+_RETINA_LAYERS = [
+    lyr.MIDGET_GANGLION_CELLS_L_ON,
+    lyr.MIDGET_GANGLION_CELLS_L_OFF,
+    lyr.MIDGET_GANGLION_CELLS_M_ON,
+    lyr.MIDGET_GANGLION_CELLS_M_OFF,
+]
+
 _MULTIMETER_NODE = 'multimeter_node'
 _SPIKE_DETECTOR_NODE = 'spike_dector_node'
 
 
 class NetRunner:
     config: netcfg.Config
+    ranks: dist.Ranks
     _sim_time: float
     _times: List[float]
+    seeds: sd.SeedPlan
     _seeds: List[int]
-    _layers_to_gids: Dict[str, int]
-    layer_ids: List[Tuple[str, Tuple, str]]
+    registry: reg.Registry
+    # Recorded neurons of every recorded layer.
+    samples: Dict[str, rec.Sample]
+    # Predicted size of the network, checked against the memory budget before building it.
+    estimate: est.Estimate
+    # Wall time in seconds of every build and simulation phase.
+    timings: Dict[str, float]
+    # Number of events of every recorder already passed on, by recorder GID.
+    _drained: Dict[int, int]
+    # Simulation time and statistics of the checkpoint the run was resumed from.
+    _resumed_ms: float
+    _resumed_stats: st.OnlineStats
+    # Local neurons and the state they start every trial from, restored after every reset of
+    # the network: the randomized initial state or the state at the end of the warm-up.
+    _initial_states: List[Tuple[List[int], List[Dict]]]
     
-    def __init__(self, sim_time: float) -> None:
-        self.config = netcfg.Config()
+    def __init__(self, sim_time: float, config: netcfg.Config = None) -> None:
+        self.config = config if config is not None else netcfg.Config()
+        self.ranks = dist.Ranks()
+        
+        if self.config.use_tuned_topology:
+            prof.apply_profile(self.config, self.ranks.size)
+        
         self._sim_time = sim_time
+        self.timings = {}
+        self.samples = {}
+        self._drained = {}
+        self._resumed_ms = 0.0
+        self._resumed_stats = None
+        self._initial_states = []
         self._set_timings()
         self._set_seeds()
 
     def build_network(self) -> None:
-        self._set_up_nest()
+        # Includes the weight normalization of every projection. The projections are computed
+        # once and shared by the validation, the estimate and the build.
+        with self._timed("get_network"):
+            models, layers, conns = netsys.get_network(self.config)
+        
+        with self._timed("validate"):
+            val.check(self.config, conns)
+        
+        with self._timed("estimate"):
+            self.estimate = est.estimate(self.config, self._sim_time, conns)
+            est.check(self.config, self.estimate)
         
-        models, layers, conns = netsys.get_network(self.config)
+        with self._timed("set_up_nest"):
+            self._set_up_nest()
+        
+        with self._timed("create_models"):
+            self._create_models(models)
+        
+        with self._timed("create_layers"):
+            self.registry = self._create_layers(layers)
+        
+        with self._timed("randomize_neurons"):
+            self._randomize_neurons(models)
+        
+        with self._timed("connect_layers"):
+            self._connect_layers(conns)
         
-        self._create_models(models)
-        self.layer_ids, self._layers_to_gids = self._create_layers(layers)
-        self._connect_layers(conns)
         print("Network built")
 
-    def init_spike_generators(self, retina_spikes: List) -> None:
-        midget_ganglion_cells_l_on_spikes = retina_spikes[0]
-        midget_ganglion_cells_l_off_spikes = retina_spikes[1]
-        midget_ganglion_cells_m_on_spikes = retina_spikes[2]
-        midget_ganglion_cells_m_off_spikes = retina_spikes[3]
+    # Spike trains are given per midget ganglion cell layer, cells in the order of the layer's GIDs.
+    # Spike times are relative to origin_ms.
+    def init_spike_generators(self, retina_spikes: List, origin_ms: float = 0.0) -> None:
+        nodes = []
+        params = []
+        
+        for layer, spikes in zip(_RETINA_LAYERS, retina_spikes):
+            nodes += self.registry[layer].gids()
+            params += [{'spike_times': train, 'spike_weights': [], 'origin': origin_ms} for train in spikes]
+
+        # Only the rank that owns a generator can set its spikes.
+        is_local = nest.GetStatus(nodes, 'local')
+        local_nodes = [node for node, local in zip(nodes, is_local) if local]
+        local_params = [param for param, local in zip(params, is_local) if local]
+        
+        nest.SetStatus(local_nodes, local_params)
+
+    # Restores the last checkpoint, if any, into the freshly built network. To be called after
+    # init_spike_generators with the same spike trains as the interrupted run; the runner has
+    # to be set up with the root seed of the checkpoint. Spikes in flight at the time of the
+    # checkpoint are lost.
+    def resume(self, checkpointer: ckpt.Checkpointer) -> bool:
+        meta = checkpointer.latest()
+        
+        if meta is None:
+            return False
+        
+        if meta['root_seed'] != self.seeds.root_seed:
+            raise ValueError(f"checkpoint was taken with root seed {meta['root_seed']}, not {self.seeds.root_seed}")
+        
+        time_ms, gids, state, stats = checkpointer.load(self.config)
+        
+        for key, values in state.items():
+            is_local = np.asarray(nest.GetStatus(gids[key].tolist(), 'local'), dtype=bool)
+            nest.SetStatus(gids[key][is_local].tolist(), key, values[is_local].tolist())
+        
+        self._shift_spike_generators(time_ms)
+        self._resumed_ms = time_ms
+        self._resumed_stats = stats
+        print(f"Resumed from {time_ms} ms")
+        
+        return True
+
+    # Spike detectors for a series of trials on the same network, see run_trial.
+    def make_trial_detectors(self, spike_pops: List[reg.Population], trial_ms: float,
+                             policies: Dict[str, rec.RecordPolicy] = None) -> List:
+        with self._timed("make_recorders"):
+            self._select_samples(spike_pops, policies if policies is not None else {})
+            self._check_recorders([], spike_pops, trial_ms)
+            return self._make_spike_detectors(spike_pops)
+
+    # Simulates duration_ms of background activity without retina input and makes its final
+    # state the start of every following trial, so that trials do not have to settle from rest.
+    # To be called before the recorders of the trials are made, they would record the warm-up
+    # too. Returns the snapshot of all neurons on every rank, to be passed to use_snapshot of
+    # other processes.
+    def warm_up(self, duration_ms: float) -> ckpt.Snapshot:
+        self.init_spike_generators([[[] for _ in range(self.registry[layer].size)] for layer in _RETINA_LAYERS])
         
-        midget_ganglion_cells_l_on_gid = self._layers_to_gids[lyr.MIDGET_GANGLION_CELLS_L_ON]
-        midget_ganglion_cells_l_off_gid = self._layers_to_gids[lyr.MIDGET_GANGLION_CELLS_L_OFF]
-        midget_ganglion_cells_m_on_gid = self._layers_to_gids[lyr.MIDGET_GANGLION_CELLS_M_ON]
-        midget_ganglion_cells_m_off_gid = self._layers_to_gids[lyr.MIDGET_GANGLION_CELLS_M_OFF]
+        with self._timed("warm_up"):
+            nest.Simulate(duration_ms)
         
-        cell_cnt = 0
+        snapshot = ckpt.Snapshot.merged(self.ranks.allgather(self._snapshot()))
+        self.use_snapshot(snapshot)
         
-        for i in np.arange(self.config.lgn_cnt):
-            for j in np.arange(self.config.lgn_cnt):
-                l_on_cells = tp.GetElement(midget_ganglion_cells_l_on_gid, (i, j))
-                nest.SetStatus([l_on_cells[0]], [{'spike_times':midget_ganglion_cells_l_on_spikes[cell_cnt],'spike_weights':[]}])
+        return snapshot
 
-                l_off_cells = tp.GetElement(midget_ganglion_cells_l_off_gid, (i, j))
-                nest.SetStatus([l_off_cells[0]], [{'spike_times':midget_ganglion_cells_l_off_spikes[cell_cnt],'spike_weights':[]}])
+    # Starts every following trial from a snapshot, e.g. one a pool worker received from the
+    # process that ran the warm-up of the same network, built with the same root seed. Spikes in
+    # flight at the time of the snapshot are lost.
+    def use_snapshot(self, snapshot: ckpt.Snapshot) -> None:
+        is_local = np.asarray(nest.GetStatus(snapshot.gids.tolist(), 'local'), dtype=bool)
+        local_values = [snapshot.state[key][is_local].tolist() for key in ckpt.STATE_VARIABLES]
+        state = [dict(zip(ckpt.STATE_VARIABLES, cell)) for cell in zip(*local_values)]
+        
+        self._initial_states = [(snapshot.gids[is_local].tolist(), state)]
 
-                m_on_cells = tp.GetElement(midget_ganglion_cells_m_on_gid, (i, j))
-                nest.SetStatus([m_on_cells[0]], [{'spike_times':midget_ganglion_cells_m_on_spikes[cell_cnt],'spike_weights':[]}])
+    # Runs one trial on the network built once: the state of the neurons is reset, the retina
+    # spike trains start at the current kernel time and the spikes of the trial are drained
+    # from the detectors. Returns the start of the trial on the kernel clock and the spike
+    # events of every layer, complete on the root rank.
+    def run_trial(self, retina_spikes: List, duration_ms: float, detectors: List) -> Tuple[float, Dict[str, Dict]]:
+        nest.ResetNetwork()
+        
+        for nodes, state in self._initial_states:
+            nest.SetStatus(nodes, state)
+        
+        return self.run_segment(retina_spikes, duration_ms, detectors)
 
-                m_off_cells = tp.GetElement(midget_ganglion_cells_m_off_gid, (i, j))
-                nest.SetStatus([m_off_cells[0]], [{'spike_times':midget_ganglion_cells_m_off_spikes[cell_cnt],'spike_weights':[]}])
-                
-                cell_cnt += 1
+    # Continues the simulation for duration_ms with the retina spike trains of the next segment
+    # of a long stimulus, given relative to the start of the segment, e.g. chunk by chunk of a
+    # noise sequence. Returns the same as run_trial.
+    def run_segment(self, retina_spikes: List, duration_ms: float, detectors: List) -> Tuple[float, Dict[str, Dict]]:
+        origin_ms = nest.GetKernelStatus('time')
+        self.init_spike_generators(retina_spikes, origin_ms)
+        
+        nest.Simulate(duration_ms)
+        
+        return origin_ms, {pop.name: self._drain(detector, keep_events=False) for detector, pop in detectors}
 
-    def simulate_with_recording(self, multimeter_models: List, spike_models: List) -> Tuple[List, List]:
-        recorders = self._make_recorders(multimeter_models)
-        detectors = self._make_spike_detectors(spike_models)
+    # Layers without a policy are recorded in full.
+    def simulate_with_recording(self, multimeter_pops: List[reg.Population], spike_pops: List[reg.Population],
+                                policies: Dict[str, rec.RecordPolicy] = None) -> Tuple[List, List]:
+        with self._timed("make_recorders"):
+            self._select_samples(multimeter_pops + spike_pops, policies if policies is not None else {})
+            self._check_recorders(multimeter_pops, spike_pops, self._sim_time)
+            recorders = self._make_recorders(multimeter_pops)
+            detectors = self._make_spike_detectors(spike_pops)
         
         nest.SetStatus([0], {'print_time': True})
-        nest.Simulate(self._sim_time)
+        
+        with self._timed("simulate"):
+            nest.Simulate(self._sim_time)
         
         return recorders, detectors
 
+    # Simulates in chunks of chunk_ms and feeds the events recorded during every chunk into
+    # running statistics, which are complete on the root rank after every chunk and passed to
+    # on_chunk. Unless keep_events is set the recorders are emptied after every chunk, so only
+    # the statistics remain at the end of the run. With a checkpointer the state of the network
+    # is saved after every chunk that ends a checkpoint interval; a resumed run continues after
+    # the checkpoint and its recorders only hold the events from there on.
+    def simulate_with_stats(self, multimeter_pops: List[reg.Population], spike_pops: List[reg.Population],
+                            bin_ms: float, chunk_ms: float, policies: Dict[str, rec.RecordPolicy] = None,
+                            keep_events: bool = False, on_chunk: Callable[[st.OnlineStats], None] = None,
+                            checkpointer: ckpt.Checkpointer = None) -> Tuple[List, List, st.OnlineStats]:
+        if abs(chunk_ms / bin_ms - round(chunk_ms / bin_ms)) > 1e-9:
+            raise ValueError(f"chunk of {chunk_ms} ms is not a multiple of the {bin_ms} ms bins")
+        
+        with self._timed("make_recorders"):
+            self._select_samples(multimeter_pops + spike_pops, policies if policies is not None else {})
+            self._check_recorders(multimeter_pops, spike_pops, self._sim_time if keep_events else chunk_ms)
+            recorders = self._make_recorders(multimeter_pops)
+            detectors = self._make_spike_detectors(spike_pops)
+        
+        stats = self._resumed_stats
+        
+        if stats is None:
+            stats = st.OnlineStats(self.samples, bin_ms, self._sim_time)
+        
+        # Statistics are relative to the start of this simulation.
+        origin_ms = nest.GetKernelStatus('time') - self._resumed_ms
+        chunk_cnt = int(np.ceil((self._sim_time - self._resumed_ms) / chunk_ms - 1e-9))
+        
+        with self._timed("simulate"):
+            nest.Prepare()
+            
+            try:
+                for chunk in range(chunk_cnt):
+                    start_ms = self._resumed_ms + chunk * chunk_ms
+                    stop_ms = min(start_ms + chunk_ms, self._sim_time)
+                    nest.Run(stop_ms - start_ms)
+                    
+                    for recorder, pop in recorders:
+                        stats.add_potentials(pop.name, self._drain(recorder, keep_events))
+                    
+                    for detector, pop in detectors:
+                        events = self._drain(detector, keep_events)
+                        
+                        if len(events) > 0:
+                            events['times'] = events['times'] - origin_ms
+                        
+                        stats.add_spikes(pop.name, events, start_ms, stop_ms)
+                    
+                    stats.advance(stop_ms)
+                    
+                    if on_chunk is not None and self.ranks.is_root():
+                        on_chunk(stats)
+                    
+                    if checkpointer is not None and checkpointer.is_due(stop_ms) and stop_ms < self._sim_time:
+                        self._checkpoint(checkpointer, stop_ms, stats)
+            finally:
+                nest.Cleanup()
+        
+        return recorders, detectors, stats
+
+    # Events of a recorder from all ranks, only complete on the root rank.
+    def get_events(self, recorder: Tuple) -> Dict:
+        events = nest.GetStatus(recorder, 'events')[0]
+        return self.ranks.gather_events({key: np.asarray(values) for key, values in events.items()})
+
+    # Source cell, target cell and weight of every connection between two layers.
+    def export_connections(self, src_layer: str, target_layer: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        src = self.registry[src_layer]
+        target = self.registry[target_layer]
+        
+        conns = nest.GetConnections(source=src.gids(), target=target.gids())
+        
+        if len(conns) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        
+        sources, targets, weights = (np.asarray(values) for values in
+                                     zip(*nest.GetStatus(conns, ['source', 'target', 'weight'])))
+        
+        return src.cells_of(sources), target.cells_of(targets), weights
+
+    # Saves the state variables of the local neurons; the root rank completes the checkpoint
+    # once every rank is done.
+    def _checkpoint(self, checkpointer: ckpt.Checkpointer, time_ms: float, stats: st.OnlineStats) -> None:
+        snapshot = self._snapshot()
+        checkpointer.save_state(time_ms, self.ranks.rank, {key: snapshot.gids for key in ckpt.STATE_VARIABLES},
+                                snapshot.state)
+        self.ranks.barrier()
+        
+        if self.ranks.is_root():
+            checkpointer.commit(time_ms, self.config, self.seeds.root_seed, stats)
+        
+        self.ranks.barrier()
+
+    # State variables of the local neurons at the current kernel time.
+    def _snapshot(self) -> ckpt.Snapshot:
+        gids = []
+        state = {key: [] for key in ckpt.STATE_VARIABLES}
+        
+        for pop in self.registry.select(reg.is_neuron):
+            nodes = pop.gids()
+            is_local = nest.GetStatus(nodes, 'local')
+            local_nodes = [node for node, local in zip(nodes, is_local) if local]
+            
+            if len(local_nodes) == 0:
+                continue
+            
+            gids += local_nodes
+            
+            for key, values in zip(ckpt.STATE_VARIABLES, zip(*nest.GetStatus(local_nodes, ckpt.STATE_VARIABLES))):
+                state[key] += values
+        
+        return ckpt.Snapshot(nest.GetKernelStatus('time'), np.asarray(gids, dtype=np.int64),
+                             {key: np.asarray(values, dtype=np.float64) for key, values in state.items()})
+
+    # Spike times of the retina generators after a checkpoint, moved to the restarted kernel clock.
+    def _shift_spike_generators(self, time_ms: float) -> None:
+        nodes = [gid for pop in self.registry.select(reg.of_kind(reg.RETINA)) for gid in pop.gid_range()]
+        is_local = nest.GetStatus(nodes, 'local')
+        local_nodes = [node for node, local in zip(nodes, is_local) if local]
+        
+        params = []
+        
+        for train in nest.GetStatus(local_nodes, 'spike_times'):
+            train = np.asarray(train)
+            params.append({'spike_times': train[train > time_ms] - time_ms, 'spike_weights': []})
+        
+        nest.SetStatus(local_nodes, params)
+
+    # Events recorded since the last drain of the recorder, gathered on the root rank.
+    def _drain(self, recorder: Tuple, keep_events: bool) -> Dict:
+        events = {key: np.asarray(values) for key, values in nest.GetStatus(recorder, 'events')[0].items()}
+        
+        if keep_events:
+            drained = self._drained.get(recorder[0], 0)
+            self._drained[recorder[0]] = len(events['senders'])
+            events = {key: values[drained:] for key, values in events.items()}
+        else:
+            nest.SetStatus(recorder, {'n_events': 0})
+        
+        return self.ranks.gather_events(events)
+
+    @contextmanager
+    def _timed(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.timings[phase] = time.perf_counter() - start
+
     def _set_timings(self) -> None:
         times_count = int(self._sim_time / self.config.sim_step_ms)
         self._times = np.zeros(times_count)
@@ -83,9 +375,23 @@ class NetRunner:
         for i in np.arange(0, int(times_count)):
             self._times[i] = i * self.config.sim_step_ms
 
+    # Seeds of this run, to be stored with its results.
+    def seed_record(self) -> Dict:
+        return self.seeds.to_dict(self._virtual_proc_cnt())
+
     def _set_seeds(self) -> None:
-        np.random.seed(int(time.time()))
-        self._seeds = np.arange(self.config.nest_thread_cnt) + int((time.time()*100)%2**32)
+        root_seed = self.config.root_seed
+        
+        if root_seed is None:
+            root_seed = sd.SeedPlan.random().root_seed
+        
+        # Every rank has to use the seeds of the root rank.
+        self.seeds = sd.SeedPlan(self.ranks.bcast(root_seed))
+        np.random.seed(self.seeds.seed(sd.GLOBAL_STREAM))
+        self._seeds = self.seeds.nest_seeds(self._virtual_proc_cnt())
+
+    def _virtual_proc_cnt(self) -> int:
+        return self.config.nest_thread_cnt * self.ranks.size
 
     def _set_up_nest(self) -> None:
         nest.ResetKernel()
@@ -94,36 +400,85 @@ class NetRunner:
         nest_kernel_status = {
             "local_num_threads": self.config.nest_thread_cnt,
             "resolution": self.config.sim_step_ms,
+            "grng_seed": self.seeds.seed(sd.NEST_GLOBAL_STREAM),
             "rng_seeds": list(self._seeds)
         }
         nest.SetKernelStatus(nest_kernel_status)
 
-    def _create_models(self, models: List[Tuple[str, str, Dict]]) -> None:
-        for model in models:
-            nest.CopyModel(model[0], model[1], model[2])
+    # Parents come before their children, so every model is one CopyModel of its parent.
+    def _create_models(self, models: mdl.ModelRegistry) -> None:
+        for parent, name, params in models.copy_specs():
+            nest.CopyModel(parent, name, params)
 
-    def _create_layers(self, layers: List[Tuple[str, Dict]]) -> Tuple[List[Tuple[str, int, str]], Dict[str, Iterable]]:
-        layer_ids = []
-        layers_to_gids = {}
+    def _create_layers(self, layers: List[Tuple[str, Dict]]) -> reg.Registry:
+        registry = reg.Registry.from_layers(layers)
         
         for layer in layers:
+            layer_id = tp.CreateLayer(layer[1])
+            # The nodes of a layer are created right after the layer itself.
+            registry.bind(layer[0], layer_id, layer_id[0] + 1)
             
-            gid = tp.CreateLayer(layer[1])
+        return registry
+  
+    # Draws the heterogeneous parameters and initial state of every neuron layer whose model
+    # has any, with one SetStatus per layer. Values are drawn for the whole layer on every rank
+    # from the same stream, so they do not depend on the number of ranks or threads.
+    def _randomize_neurons(self, models: mdl.ModelRegistry) -> None:
+        rng = self.seeds.rng(sd.INITIAL_STATE_STREAM)
+        
+        for pop in self.registry.select(reg.is_neuron):
+            if not models.is_randomized(pop.model):
+                continue
             
-            # layer, gid, cell_type
-            layer_ids.append((layer[0], gid, layer[1]['elements']))
-            layers_to_gids[layer[0]] = gid
+            values = models.sample(pop.model, rng, pop.size)
+            is_local = np.asarray(nest.GetStatus(pop.gids(), 'local'), dtype=bool)
+            local_nodes = np.asarray(pop.gids())[is_local].tolist()
+            local_values = {param: v[is_local].tolist() for param, v in values.items()}
             
-        return layer_ids, layers_to_gids
-  
+            params = [dict(zip(local_values.keys(), cell)) for cell in zip(*local_values.values())]
+            nest.SetStatus(local_nodes, params)
+            
+            state = models.initial_state(pop.model)
+            
+            if len(state) > 0:
+                self._initial_states.append((local_nodes, [{k: p[k] for k in state} for p in params]))
+
     def _connect_layers(self, conns: List) -> None:
         for conn in conns:
-            src_layer_gids = self._layers_to_gids[conn[0]]
-            target_layer_gids = self._layers_to_gids[conn[1]]
+            if not netconn.is_spatial(conn[2]):
+                self._connect_all_to_all(conn[0], conn[1], conn[2])
+                continue
+            
+            src_layer_gids = self.registry[conn[0]].layer_id
+            target_layer_gids = self.registry[conn[1]].layer_id
             
             tp.ConnectLayers(src_layer_gids, target_layer_gids, conn[2])
 
-    def _make_recorders(self, recorded_models: List) -> List:
+    def _connect_all_to_all(self, src_layer: str, target_layer: str, params: Dict) -> None:
+        syn_spec = {'model': params['synapse_model'], 'weight': params['weights'], 'delay': params['delays']}
+        nest.Connect(self.registry[src_layer].gids(), self.registry[target_layer].gids(), {'rule': 'all_to_all'}, syn_spec)
+
+    # A layer recorded by both a multimeter and a spike detector is sampled once.
+    def _select_samples(self, recorded_pops: List[reg.Population], policies: Dict[str, rec.RecordPolicy]) -> None:
+        rng = self.seeds.rng(sd.RECORDING_STREAM)
+        
+        for pop in recorded_pops:
+            if pop.name in self.samples:
+                continue
+            
+            policy = policies.get(pop.name, rec.Full())
+            self.samples[pop.name] = rec.Sample(pop.name, pop.size, policy.select(pop, rng), policy.params())
+
+    # Recorders hold horizon_ms of events of the sampled neurons at most.
+    def _check_recorders(self, multimeter_pops: List[reg.Population], spike_pops: List[reg.Population],
+                         horizon_ms: float) -> None:
+        multimeter_cnt = sum(len(self.samples[pop.name].gids) for pop in multimeter_pops)
+        detector_cnt = sum(len(self.samples[pop.name].gids) for pop in spike_pops)
+        
+        est.add_recorders(self.estimate, multimeter_cnt, detector_cnt, horizon_ms, self.config.sim_step_ms)
+        est.check(self.config, self.estimate)
+
+    def _make_recorders(self, recorded_pops: List[reg.Population]) -> List:
         recorder_params = {
             'interval'   : self.config.sim_step_ms,
             'record_from': ['V_m'],
@@ -136,34 +491,23 @@ class NetRunner:
         
         recorders = []
         
-        for pop, model in recorded_models:
-            rec = nest.Create('multimeter', params={'interval': self.config.sim_step_ms, 'record_from': ["V_m"]})
-            recorders.append([rec, pop, model])
-            targets = []
-            
-            for node in nest.GetLeaves(pop)[0]:
-                if nest.GetStatus([node], 'model')[0] == model:
-                    targets.append(node)
-
-            nest.Connect(rec, targets)
+        for pop in recorded_pops:
+            recorder = nest.Create('multimeter', params={'interval': self.config.sim_step_ms, 'record_from': ["V_m"]})
+            recorders.append([recorder, pop])
+            nest.Connect(recorder, self.samples[pop.name].gids.tolist())
         
         return recorders
 
-    def _make_spike_detectors(self, recorded_models: List) -> List:
+    def _make_spike_detectors(self, recorded_pops: List[reg.Population]) -> List:
         dector_params = {"withtime": True, "withgid": True, "to_file": False}
         
         nest.CopyModel('spike_detector', _SPIKE_DETECTOR_NODE, dector_params)
         
         detectors = []
         
-        for pop, model in recorded_models:
-            rec = nest.Create(_SPIKE_DETECTOR_NODE)
-            detectors.append([rec, pop, model])
-            
-            targets = []
-            
-            for node in nest.GetLeaves(pop)[0]:
-                if nest.GetStatus([node], 'model')[0] == model:
-                    targets.append(node)
-            
-            nest.Connect(targets, rec)
+        for pop in recorded_pops:
+            detector = nest.Create(_SPIKE_DETECTOR_NODE)
+            detectors.append([detector, pop])
+            nest.Connect(self.samples[pop.name].gids.tolist(), detector)
+        
+        return detectors
@@ -1,8 +1,11 @@
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Tuple
 
 import numpy as np
 
+import tiger.net.grid as grid
+import tiger.sim.stimulus as stim
+
 
 # def load_spikes(count, ids, folder, stim, trial, layer_sizes, path: Path) -> List:
 #     all_spikes = []
@@ -31,19 +34,76 @@ import numpy as np
 
 #     return all_spikes
 
-def gen_spikes(lgn_cnt: int, retina_layers: List[str]) -> List:
-    spikes = []
-    
-    for _ in retina_layers:
-        spikes.append([])
-
-    cnt = 0
-    
-    for _ in np.arange(lgn_cnt):
-        for _ in np.arange(lgn_cnt):
-            for i in range(len(retina_layers)):
-                spikes[i].append([float(cnt + 1)])
-        
-            cnt += 1
-
-    return spikes
+# Inhomogeneous Poisson spike trains of the four midget ganglion cell layers for the stimulus,
+# generated chunk by chunk so that long stimuli never hold their whole rate tensor.
+# Returns the spike times of every cell of every layer, cells in the order of the grid layer.
+def gen_spikes(stimulus: stim.Stimulus, g: grid.Grid, duration_ms: float, step_ms: float,
+               rng: np.random.Generator, chunk_ms: float = 1000.0) -> List[List[np.ndarray]]:
+    return gen_spikes_from_rates(stimulus.rate_chunks(g, duration_ms, step_ms, chunk_ms), g, step_ms, rng)
+
+
+# Same as gen_spikes for any stream of (start time, rate tensor) chunks. Chunks are in time
+# order and their spikes come sorted by unit and time, so they are kept per chunk as bin
+# indices and copied into one array of all trains at the end, without a global sort.
+def gen_spikes_from_rates(rate_chunks: Iterable[Tuple[float, np.ndarray]], g: grid.Grid, step_ms: float,
+                          rng: np.random.Generator) -> List[List[np.ndarray]]:
+    unit_cnt = stim.CHANNEL_CNT * g.size
+    chunks = []
+    counts = np.zeros(unit_cnt, dtype=np.int64)
+
+    for start_ms, rates in rate_chunks:
+        ids, bins = _chunk_spikes(rates, step_ms, rng)
+        chunk_counts = np.bincount(ids, minlength=unit_cnt)
+        chunks.append((start_ms, bins, chunk_counts))
+        counts += chunk_counts
+
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    times = np.empty(offsets[-1])
+    filled = offsets[:-1].copy()
+
+    for start_ms, bins, chunk_counts in chunks:
+        chunk_offsets = np.cumsum(chunk_counts) - chunk_counts
+        dest = np.repeat(filled - chunk_offsets, chunk_counts) + np.arange(len(bins))
+        times[dest] = start_ms + (bins + 1) * step_ms
+        filled += chunk_counts
+
+    trains = np.split(times, offsets[1:-1])
+
+    return [trains[c * g.size:(c + 1) * g.size] for c in range(stim.CHANNEL_CNT)]
+
+
+# Spikes of a (channel, time bin, row, col) rate tensor. Returns the unit (channel * cells + cell)
+# and the time of every spike, sorted by unit and time. Times are moved to the end of their
+# bin, on the simulation grid.
+def rates_to_spikes(rates: np.ndarray, start_ms: float, step_ms: float,
+                    rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    ids, bins = _chunk_spikes(rates, step_ms, rng)
+    return ids, start_ms + (bins + 1) * step_ms
+
+
+# Draws the spike count of every unit from its integrated rate and places the spikes by
+# inverting the cumulative rate over all units and bins, so every draw is a spike, however far
+# most bins are below the peak rate. Returns the unit and the bin of every spike.
+def _chunk_spikes(rates: np.ndarray, step_ms: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    channel_cnt, bin_cnt, row_cnt, col_cnt = rates.shape
+    unit_cnt = channel_cnt * col_cnt * row_cnt
+
+    if rates.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+    # Cumulative rates in Hz of every unit over its bins, then shifted by the units before it.
+    cumulative = np.empty((channel_cnt, col_cnt, row_cnt, bin_cnt))
+    np.cumsum(rates.transpose(0, 3, 2, 1), axis=3, out=cumulative)
+    unit_totals = cumulative[..., -1].reshape(unit_cnt).copy()
+    unit_starts = np.cumsum(unit_totals) - unit_totals
+    cumulative = cumulative.reshape(unit_cnt, bin_cnt)
+    cumulative += unit_starts[:, None]
+
+    counts = rng.poisson(unit_totals * (step_ms / 1000.0))
+    ids = np.repeat(np.arange(unit_cnt), counts)
+
+    # Uniform points on the cumulative rate of their unit, sorted, fall into bins in unit and time order.
+    points = np.sort(unit_starts[ids] + rng.uniform(0.0, 1.0, size=len(ids)) * unit_totals[ids])
+    flat = np.minimum(np.searchsorted(cumulative.reshape(-1), points, side='right'), cumulative.size - 1)
+
+    return flat // bin_cnt, (flat % bin_cnt).astype(np.int32)
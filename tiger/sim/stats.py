@@ -0,0 +1,158 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+import tiger.sim.record as rec
+
+
+# Running statistics of one recorded layer. Spikes are binned into (k * bin_ms, (k + 1) * bin_ms],
+# so a chunk that ends on a bin edge never leaves a bin half counted. Rates are per recorded
+# neuron and therefore hold for the whole layer whatever the sample.
+class LayerStats:
+    sample: rec.Sample
+    bin_ms: float
+    spike_cnt: int
+    # Spikes of every recorded neuron, in the order of the sample's GIDs.
+    neuron_spike_cnts: np.ndarray
+    # Spikes of the layer in every bin.
+    psth_cnts: np.ndarray
+    # Sum over bins of the squared spike count of every recorded neuron.
+    _neuron_sq_cnts: np.ndarray
+    v_cnt: int
+    v_mean: float
+    _v_m2: float
+
+    def __init__(self, sample: rec.Sample, bin_ms: float, bin_cnt: int) -> None:
+        self.sample = sample
+        self.bin_ms = bin_ms
+        self.spike_cnt = 0
+        self.neuron_spike_cnts = np.zeros(len(sample.gids), dtype=np.int64)
+        self.psth_cnts = np.zeros(bin_cnt, dtype=np.int64)
+        self._neuron_sq_cnts = np.zeros(len(sample.gids), dtype=np.int64)
+        self.v_cnt = 0
+        self.v_mean = 0.0
+        self._v_m2 = 0.0
+
+    # Spikes of the chunk (start_ms, stop_ms].
+    def add_spikes(self, senders: np.ndarray, times: np.ndarray, start_ms: float, stop_ms: float) -> None:
+        if len(senders) == 0:
+            return
+
+        neurons = np.searchsorted(self.sample.gids, senders)
+        bins = np.clip(np.ceil(times / self.bin_ms).astype(np.int64) - 1, 0, len(self.psth_cnts) - 1)
+
+        self.spike_cnt += len(senders)
+        self.neuron_spike_cnts += np.bincount(neurons, minlength=len(self.neuron_spike_cnts))
+        self.psth_cnts += np.bincount(bins, minlength=len(self.psth_cnts))
+
+        first_bin = int(start_ms // self.bin_ms)
+        chunk_bin_cnt = int(np.ceil(stop_ms / self.bin_ms)) - first_bin
+        local_bins = np.clip(bins - first_bin, 0, chunk_bin_cnt - 1)
+        cnts = np.bincount(neurons * chunk_bin_cnt + local_bins, minlength=len(self.neuron_spike_cnts) * chunk_bin_cnt)
+        self._neuron_sq_cnts += (cnts.reshape(-1, chunk_bin_cnt) ** 2).sum(axis=1)
+
+    # Merges the potentials of a chunk into the running mean and variance (Chan et al.).
+    def add_potentials(self, v_m: np.ndarray) -> None:
+        if len(v_m) == 0:
+            return
+
+        cnt = len(v_m)
+        mean = float(np.mean(v_m))
+        m2 = float(np.sum((v_m - mean) ** 2))
+
+        total = self.v_cnt + cnt
+        delta = mean - self.v_mean
+        self.v_mean += delta * cnt / total
+        self._v_m2 += m2 + delta * delta * self.v_cnt * cnt / total
+        self.v_cnt = total
+
+    def v_var(self) -> float:
+        return self._v_m2 / self.v_cnt if self.v_cnt > 0 else 0.0
+
+    def mean_rate_hz(self, elapsed_ms: float) -> float:
+        if elapsed_ms <= 0.0:
+            return 0.0
+
+        return self.spike_cnt / len(self.sample.gids) / (elapsed_ms / 1000.0)
+
+    def psth_hz(self, elapsed_ms: float) -> np.ndarray:
+        bin_cnt = int(np.ceil(elapsed_ms / self.bin_ms))
+        return self.psth_cnts[:bin_cnt] / len(self.sample.gids) / (self.bin_ms / 1000.0)
+
+    # Golomb's chi: variance of the population count over the mean variance of the single
+    # neuron counts, 1 for fully synchronous and ~1/sqrt(N) for independent neurons.
+    def synchrony(self, elapsed_ms: float) -> float:
+        bin_cnt = int(np.ceil(elapsed_ms / self.bin_ms))
+
+        if bin_cnt == 0:
+            return 0.0
+
+        pop_means = self.psth_cnts[:bin_cnt] / len(self.sample.gids)
+        pop_var = np.mean(pop_means ** 2) - np.mean(pop_means) ** 2
+
+        neuron_means = self.neuron_spike_cnts / bin_cnt
+        neuron_vars = self._neuron_sq_cnts / bin_cnt - neuron_means ** 2
+        mean_neuron_var = np.mean(neuron_vars)
+
+        if mean_neuron_var <= 0.0:
+            return 0.0
+
+        return float(np.sqrt(max(pop_var, 0.0) / mean_neuron_var))
+
+
+# Statistics of all recorded layers, updated from the events drained after every chunk of
+# NetRunner.simulate_with_stats and readable at any point of the run.
+class OnlineStats:
+    bin_ms: float
+    elapsed_ms: float
+    layers: Dict[str, LayerStats]
+
+    def __init__(self, samples: Dict[str, rec.Sample], bin_ms: float, duration_ms: float) -> None:
+        self.bin_ms = bin_ms
+        self.elapsed_ms = 0.0
+        bin_cnt = max(1, int(np.ceil(duration_ms / bin_ms)))
+        self.layers = {name: LayerStats(sample, bin_ms, bin_cnt) for name, sample in samples.items()}
+
+    def add_spikes(self, layer: str, events: Dict[str, np.ndarray], start_ms: float, stop_ms: float) -> None:
+        if len(events) == 0:
+            return
+
+        self.layers[layer].add_spikes(np.asarray(events['senders']), np.asarray(events['times']), start_ms, stop_ms)
+
+    def add_potentials(self, layer: str, events: Dict[str, np.ndarray]) -> None:
+        if len(events) == 0:
+            return
+
+        self.layers[layer].add_potentials(np.asarray(events['V_m']))
+
+    def advance(self, stop_ms: float) -> None:
+        self.elapsed_ms = stop_ms
+
+    def summary(self) -> Dict:
+        return {
+            'elapsed_ms': self.elapsed_ms,
+            'bin_ms': self.bin_ms,
+            'layers': {name: self._layer_summary(layer) for name, layer in self.layers.items()},
+        }
+
+    def save(self, path: Path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def _layer_summary(self, layer: LayerStats) -> Dict:
+        return {
+            'recorded_cnt': len(layer.sample.gids),
+            'layer_size': layer.sample.layer_size,
+            'spike_cnt': layer.spike_cnt,
+            'mean_rate_hz': layer.mean_rate_hz(self.elapsed_ms),
+            'psth_hz': _to_list(layer.psth_hz(self.elapsed_ms)),
+            'v_m_mean': layer.v_mean,
+            'v_m_var': layer.v_var(),
+            'synchrony': layer.synchrony(self.elapsed_ms),
+        }
+
+
+def _to_list(values: np.ndarray) -> List[float]:
+    return [float(v) for v in values]
@@ -0,0 +1,246 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+import tiger.net.grid as grid
+
+
+# Channels of the rate tensors, in the order of the midget ganglion cell layers.
+L_ON = 0
+L_OFF = 1
+M_ON = 2
+M_OFF = 3
+CHANNEL_CNT = 4
+
+BACKGROUND_RATE_HZ = 5.0
+GAIN_HZ = 100.0
+
+
+# A visual stimulus given as L and M cone contrasts in [-1, 1] over time and space.
+class Stimulus(ABC):
+    @abstractmethod
+    def cone_contrasts(self, times_ms: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        pass
+
+    # Parameters that fully describe the stimulus.
+    @abstractmethod
+    def params(self) -> Dict:
+        pass
+
+    # (start time, rates) chunks of the stimulus over duration_ms, to be turned into spikes
+    # with spike.gen_spikes_from_rates. The ganglion rates follow the cone contrasts directly;
+    # stimuli seen through a retina model override this.
+    def rate_chunks(self, g: grid.Grid, duration_ms: float, step_ms: float,
+                    chunk_ms: float) -> Iterator[Tuple[float, np.ndarray]]:
+        for start_ms in np.arange(0.0, duration_ms, chunk_ms):
+            stop_ms = min(start_ms + chunk_ms, duration_ms)
+            yield start_ms, rates(self, g, start_ms, stop_ms, step_ms)
+
+
+class FlashingSquare(Stimulus):
+    size_deg: float
+    center_deg: Tuple[float, float]
+    onset_ms: float
+    duration_ms: float
+    contrast_l: float
+    contrast_m: float
+
+    def __init__(self, size_deg: float, onset_ms: float, duration_ms: float, contrast_l: float = 1.0,
+                 contrast_m: float = 1.0, center_deg: Tuple[float, float] = (0.0, 0.0)) -> None:
+        self.size_deg = size_deg
+        self.center_deg = center_deg
+        self.onset_ms = onset_ms
+        self.duration_ms = duration_ms
+        self.contrast_l = contrast_l
+        self.contrast_m = contrast_m
+
+    def cone_contrasts(self, times_ms: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        inside = ((np.abs(xs[None, :] - self.center_deg[0]) <= self.size_deg / 2.0) &
+                  (np.abs(ys[:, None] - self.center_deg[1]) <= self.size_deg / 2.0))
+        on = (times_ms >= self.onset_ms) & (times_ms < self.onset_ms + self.duration_ms)
+        shape = on[:, None, None] & inside[None, :, :]
+
+        return self.contrast_l * shape, self.contrast_m * shape
+
+    def params(self) -> Dict:
+        return {
+            'kind': 'flashing_square',
+            'size_deg': self.size_deg,
+            'center_deg': list(self.center_deg),
+            'onset_ms': self.onset_ms,
+            'duration_ms': self.duration_ms,
+            'contrast_l': self.contrast_l,
+            'contrast_m': self.contrast_m,
+        }
+
+
+# A sinusoidal grating drifting orthogonally to its bars. Opposite L and M contrasts
+# give an isoluminant, color-opponent grating.
+class DriftingGrating(Stimulus):
+    orientation_deg: float
+    spatial_freq_cpd: float
+    temporal_freq_hz: float
+    contrast_l: float
+    contrast_m: float
+    phase_rad: float
+
+    def __init__(self, orientation_deg: float, spatial_freq_cpd: float, temporal_freq_hz: float,
+                 contrast_l: float = 1.0, contrast_m: float = 1.0, phase_rad: float = 0.0) -> None:
+        self.orientation_deg = orientation_deg
+        self.spatial_freq_cpd = spatial_freq_cpd
+        self.temporal_freq_hz = temporal_freq_hz
+        self.contrast_l = contrast_l
+        self.contrast_m = contrast_m
+        self.phase_rad = phase_rad
+
+    def cone_contrasts(self, times_ms: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        theta = np.deg2rad(self.orientation_deg)
+        # Distance across the bars, vertical bars for an orientation of 0.
+        across = xs[None, :] * np.cos(theta) + ys[:, None] * np.sin(theta)
+        cycles = self.spatial_freq_cpd * across[None, :, :] - self.temporal_freq_hz * times_ms[:, None, None] / 1000.0
+        wave = np.sin(2.0 * np.pi * cycles + self.phase_rad)
+
+        return self.contrast_l * wave, self.contrast_m * wave
+
+    def params(self) -> Dict:
+        return {
+            'kind': 'drifting_grating',
+            'orientation_deg': self.orientation_deg,
+            'spatial_freq_cpd': self.spatial_freq_cpd,
+            'temporal_freq_hz': self.temporal_freq_hz,
+            'contrast_l': self.contrast_l,
+            'contrast_m': self.contrast_m,
+            'phase_rad': self.phase_rad,
+        }
+
+
+# A disk of opposite L and M contrast, e.g. L increment and M decrement for contrast 1.0.
+class ColorOpponentPatch(Stimulus):
+    radius_deg: float
+    center_deg: Tuple[float, float]
+    onset_ms: float
+    duration_ms: float
+    contrast: float
+
+    def __init__(self, radius_deg: float, onset_ms: float, duration_ms: float, contrast: float = 1.0,
+                 center_deg: Tuple[float, float] = (0.0, 0.0)) -> None:
+        self.radius_deg = radius_deg
+        self.center_deg = center_deg
+        self.onset_ms = onset_ms
+        self.duration_ms = duration_ms
+        self.contrast = contrast
+
+    def cone_contrasts(self, times_ms: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        distances = np.hypot(xs[None, :] - self.center_deg[0], ys[:, None] - self.center_deg[1])
+        on = (times_ms >= self.onset_ms) & (times_ms < self.onset_ms + self.duration_ms)
+        shape = on[:, None, None] & (distances <= self.radius_deg)[None, :, :]
+
+        return self.contrast * shape, -self.contrast * shape
+
+    def params(self) -> Dict:
+        return {
+            'kind': 'color_opponent_patch',
+            'radius_deg': self.radius_deg,
+            'center_deg': list(self.center_deg),
+            'onset_ms': self.onset_ms,
+            'duration_ms': self.duration_ms,
+            'contrast': self.contrast,
+        }
+
+
+# Random frames on the grid the stimulus is sampled on, one pixel per cell, each shown for
+# frame_ms. Frame k only depends on the seed and k, so any stretch of a long sequence can be
+# generated on its own, e.g. again for reverse correlation.
+class NoiseStimulus(Stimulus):
+    frame_ms: float
+    contrast: float
+    # Independent L and M frames, luminance frames with equal L and M contrast otherwise.
+    chromatic: bool
+    seed: int
+
+    def __init__(self, frame_ms: float, contrast: float, chromatic: bool, seed: int) -> None:
+        self.frame_ms = frame_ms
+        self.contrast = contrast
+        self.chromatic = chromatic
+        self.seed = seed
+
+    # L and M contrasts of the frames first_frame, ..., first_frame + frame_cnt - 1, of shape
+    # (frame, cone, row, col).
+    def frames(self, first_frame: int, frame_cnt: int, rows: int, cols: int) -> np.ndarray:
+        frames = np.empty((frame_cnt, 2, rows, cols))
+
+        for i in range(frame_cnt):
+            rng = np.random.default_rng([self.seed, first_frame + i])
+            frame = self._frame(rng, 2 if self.chromatic else 1, rows, cols)
+            frames[i] = self.contrast * frame
+
+        return frames
+
+    def cone_contrasts(self, times_ms: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        frame_ids = (times_ms // self.frame_ms).astype(int)
+        first = int(frame_ids.min(initial=0))
+        frames = self.frames(first, int(frame_ids.max(initial=0)) - first + 1, len(ys), len(xs))[frame_ids - first]
+
+        return frames[:, 0], frames[:, 1]
+
+    @abstractmethod
+    def _frame(self, rng: np.random.Generator, cone_cnt: int, rows: int, cols: int) -> np.ndarray:
+        pass
+
+    def _params(self, kind: str) -> Dict:
+        return {
+            'kind': kind,
+            'frame_ms': self.frame_ms,
+            'contrast': self.contrast,
+            'chromatic': self.chromatic,
+            'seed': self.seed,
+        }
+
+
+# Binary white noise, every pixel either +contrast or -contrast.
+class WhiteNoise(NoiseStimulus):
+    def __init__(self, frame_ms: float, contrast: float = 1.0, chromatic: bool = False, seed: int = 0) -> None:
+        super().__init__(frame_ms, contrast, chromatic, seed)
+
+    def _frame(self, rng: np.random.Generator, cone_cnt: int, rows: int, cols: int) -> np.ndarray:
+        return np.broadcast_to(rng.choice([-1.0, 1.0], size=(cone_cnt, rows, cols)), (2, rows, cols))
+
+    def params(self) -> Dict:
+        return self._params('white_noise')
+
+
+# Sparse noise, a fraction density of the pixels light or dark, the others at the background.
+class SparseNoise(NoiseStimulus):
+    density: float
+
+    def __init__(self, frame_ms: float, density: float = 0.05, contrast: float = 1.0, chromatic: bool = False,
+                 seed: int = 0) -> None:
+        super().__init__(frame_ms, contrast, chromatic, seed)
+        self.density = density
+
+    def _frame(self, rng: np.random.Generator, cone_cnt: int, rows: int, cols: int) -> np.ndarray:
+        shown = rng.uniform(size=(cone_cnt, rows, cols)) < self.density
+        signs = rng.choice([-1.0, 1.0], size=(cone_cnt, rows, cols))
+        return np.broadcast_to(shown * signs, (2, rows, cols))
+
+    def params(self) -> Dict:
+        params = self._params('sparse_noise')
+        params['density'] = self.density
+        return params
+
+
+# Firing rates in Hz of the four ganglion cell channels, of shape (channel, time bin, row, col),
+# for the time bins starting at start_ms.
+def rates(stimulus: Stimulus, g: grid.Grid, start_ms: float, stop_ms: float, step_ms: float,
+          background_hz: float = BACKGROUND_RATE_HZ, gain_hz: float = GAIN_HZ) -> np.ndarray:
+    times_ms = np.arange(start_ms, stop_ms, step_ms)
+    contrast_l, contrast_m = stimulus.cone_contrasts(times_ms, g.xs(), g.ys())
+
+    r = np.empty((CHANNEL_CNT, len(times_ms), g.rows, g.cols))
+    r[L_ON] = background_hz + gain_hz * np.maximum(contrast_l, 0.0)
+    r[L_OFF] = background_hz + gain_hz * np.maximum(-contrast_l, 0.0)
+    r[M_ON] = background_hz + gain_hz * np.maximum(contrast_m, 0.0)
+    r[M_OFF] = background_hz + gain_hz * np.maximum(-contrast_m, 0.0)
+
+    return r
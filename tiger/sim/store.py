@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+
+STORE_DIR = "TIGER_STORE"
+
+_META_FILE = "run.json"
+_RASTER_SUBDIR = "rasters"
+_ANALYSIS_SUBDIR = "analysis"
+
+
+# Results of the runs of the command line tool, one directory per run. A run holds its
+# run.json with the settings it was started with and the stages it has completed, the recorded
+# samples (tiger.sim.record), the rasters of every trial (tiger.analysis.raster) and the output
+# of the analysis, so every stage can be repeated on its own from what the ones before stored.
+class ResultStore:
+    root: Path
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    # The store of $TIGER_STORE, ./results when unset.
+    @staticmethod
+    def default() -> "ResultStore":
+        return ResultStore(Path(os.environ.get(STORE_DIR, Path(os.getcwd(), "results"))))
+
+    def run(self, name: str) -> "Run":
+        return Run(Path(self.root, name))
+
+    def names(self) -> List[str]:
+        if not self.root.exists():
+            return []
+
+        return sorted(p.name for p in self.root.iterdir() if Path(p, _META_FILE).exists())
+
+
+class Run:
+    directory: Path
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    @property
+    def name(self) -> str:
+        return self.directory.name
+
+    @property
+    def raster_dir(self) -> Path:
+        return Path(self.directory, _RASTER_SUBDIR)
+
+    @property
+    def analysis_dir(self) -> Path:
+        return Path(self.directory, _ANALYSIS_SUBDIR)
+
+    def exists(self) -> bool:
+        return Path(self.directory, _META_FILE).exists()
+
+    def load_meta(self) -> Dict:
+        with open(Path(self.directory, _META_FILE), "r") as f:
+            return json.load(f)
+
+    # Replaces run.json at once, a run killed while writing keeps the previous one.
+    def save_meta(self, meta: Dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+
+        with open(fd, "w") as f:
+            json.dump(meta, f, indent=2)
+
+        Path(tmp).rename(Path(self.directory, _META_FILE))
+
+    # Records a completed stage with its results, e.g. timings.
+    def mark_done(self, stage: str, info: Dict = None) -> None:
+        meta = self.load_meta()
+        meta.setdefault('stages', {})[stage] = info if info is not None else {}
+        self.save_meta(meta)
+
+    def is_done(self, stage: str) -> bool:
+        return self.exists() and stage in self.load_meta().get('stages', {})
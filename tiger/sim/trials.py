@@ -0,0 +1,105 @@
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import tiger.analysis.raster as raster
+import tiger.net.grid as grid
+import tiger.net.registry as reg
+import tiger.sim.cache as cache
+import tiger.sim.record as rec
+import tiger.sim.seed as sd
+import tiger.sim.sim as sim
+import tiger.sim.spike as sp
+import tiger.sim.stimulus as stim
+import tiger.sim.writer as wr
+
+
+# Runs every stimulus of a set for trial_cnt trials on a network built once and collects the
+# spike counts of every recorded neuron per stimulus. Trial t of every stimulus uses the
+# stimulus seed of trial t, so that stimuli are compared on the same retinal noise.
+class TrialScheduler:
+    runner: sim.NetRunner
+    trial_ms: float
+    trial_cnt: int
+    # Spikes after response_start_ms of a trial are counted, to skip the onset transient.
+    response_start_ms: float
+    spike_cache: cache.SpikeCache
+    # Rasters of every trial are saved here when set.
+    raster_dir: Path
+    bin_ms: float
+    # Background activity simulated once before the first trial, whose final state every trial
+    # starts from, see NetRunner.warm_up. No warm-up when 0.
+    warm_up_ms: float
+
+    def __init__(self, runner: sim.NetRunner, trial_ms: float, trial_cnt: int,
+                 spike_cache: cache.SpikeCache = None) -> None:
+        self.runner = runner
+        self.trial_ms = trial_ms
+        self.trial_cnt = trial_cnt
+        self.response_start_ms = 0.0
+        self.spike_cache = spike_cache
+        self.raster_dir = None
+        self.bin_ms = 10.0
+        self.warm_up_ms = 0.0
+
+    # Mean rate in Hz of every recorded neuron of every layer for every stimulus, as
+    # (neuron, stimulus) matrices on the root rank. Stimuli are numbered by stimulus_ids when
+    # they are part of a larger set, e.g. the share of one worker; raster files are named
+    # after trial stimulus_id * trial_cnt + trial.
+    def run(self, stimuli: List[stim.Stimulus], spike_pops: List[reg.Population],
+            policies: Dict[str, rec.RecordPolicy] = None,
+            on_trial: Callable[[int, int], None] = None, stimulus_ids: List[int] = None) -> Dict[str, np.ndarray]:
+        if stimulus_ids is None:
+            stimulus_ids = list(range(len(stimuli)))
+
+        if self.warm_up_ms > 0.0:
+            self.runner.warm_up(self.warm_up_ms)
+
+        detectors = self.runner.make_trial_detectors(spike_pops, self.trial_ms, policies)
+        samples = self.runner.samples
+
+        counts = {pop.name: np.zeros((len(samples[pop.name].gids), len(stimuli)), dtype=np.int64) for pop in spike_pops}
+
+        # Rasters are binned and written while the next trial runs.
+        with wr.AsyncWriter() as writer:
+            for s, stimulus in enumerate(stimuli):
+                for trial in range(self.trial_cnt):
+                    origin_ms, events = self.runner.run_trial(self._spikes(stimulus, trial), self.trial_ms, detectors)
+
+                    if self.runner.ranks.is_root():
+                        self._count(counts, s, origin_ms, events)
+
+                        if self.raster_dir is not None:
+                            writer.submit(self._save_rasters, stimulus_ids[s] * self.trial_cnt + trial, origin_ms, events)
+
+                        if on_trial is not None:
+                            on_trial(s, trial)
+
+        window_s = (self.trial_ms - self.response_start_ms) / 1000.0
+
+        return {layer: c / (self.trial_cnt * window_s) for layer, c in counts.items()}
+
+    def _spikes(self, stimulus: stim.Stimulus, trial: int) -> List[List[np.ndarray]]:
+        cfg = self.runner.config
+        lgn_grid = grid.Grid(cfg.lgn_cnt, cfg.lgn_cnt, cfg.vis_angle_deg)
+        seeds = self.runner.seeds.for_trial(trial)
+
+        if self.spike_cache is not None:
+            return cache.cached_spikes(self.spike_cache, stimulus, lgn_grid, self.trial_ms, cfg.sim_step_ms,
+                                       seeds.seed(sd.STIMULUS_STREAM))
+
+        return sp.gen_spikes(stimulus, lgn_grid, self.trial_ms, cfg.sim_step_ms, seeds.rng(sd.STIMULUS_STREAM))
+
+    def _count(self, counts: Dict[str, np.ndarray], stimulus: int, origin_ms: float, events: Dict[str, Dict]) -> None:
+        for layer, layer_events in events.items():
+            if len(layer_events) == 0:
+                continue
+
+            in_window = layer_events['times'] - origin_ms > self.response_start_ms
+            neurons = np.searchsorted(self.runner.samples[layer].gids, layer_events['senders'][in_window])
+            counts[layer][:, stimulus] += np.bincount(neurons, minlength=counts[layer].shape[0])
+
+    def _save_rasters(self, trial: int, origin_ms: float, events: Dict[str, Dict]) -> None:
+        rasters = raster.layer_rasters(events, self.runner.samples, self.bin_ms, self.trial_ms, origin_ms)
+        raster.save_rasters(rasters, self.raster_dir, trial)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import List
+
+import tiger.net.cfg as netcfg
+import tiger.sim.profile as prof
+import tiger.sim.kernel as kernel
+import tiger.sim.sim as sim
+
+
+nest = kernel.lazy(kernel.NEST)
+
+_RESULT_PREFIX = "TUNE_RESULT "
+
+
+# Benchmarks short simulations of the network for several process/thread splits
+# and stores the best one in the local topology profile.
+def tune(cfg: netcfg.Config, sim_time_ms: float, horizon_ms: float) -> prof.Measurement:
+    measurements = []
+
+    for proc_cnt, thread_cnt in _candidate_splits():
+        measurement = _run_probe(cfg, proc_cnt, thread_cnt, sim_time_ms)
+
+        if measurement is None:
+            print(f"Probe with {proc_cnt} processes x {thread_cnt} threads failed...")
+            continue
+
+        print(f"{proc_cnt} processes x {thread_cnt} threads: build {measurement.build_time_s:.2f} s, "
+              f"real-time factor {measurement.real_time_factor:.2f}")
+        measurements.append(measurement)
+
+    if len(measurements) == 0:
+        raise RuntimeError("no topology probe succeeded")
+
+    return prof.save_measurements(cfg, measurements, horizon_ms)
+
+
+def _candidate_splits() -> List:
+    cpu_cnt = os.cpu_count() or 1
+    proc_cnts = [1, 2, 4] if shutil.which("mpirun") is not None else [1]
+
+    thread_cnts = []
+    thread_cnt = 1
+
+    while thread_cnt < cpu_cnt:
+        thread_cnts.append(thread_cnt)
+        thread_cnt *= 2
+
+    thread_cnts.append(cpu_cnt)
+
+    return [(p, t) for p in proc_cnts for t in thread_cnts if p * t <= cpu_cnt]
+
+
+# Every probe runs in a fresh process, since the process count of NEST is fixed at startup.
+def _run_probe(cfg: netcfg.Config, proc_cnt: int, thread_cnt: int, sim_time_ms: float) -> prof.Measurement:
+    cmd = [sys.executable, os.path.abspath(__file__), "probe",
+           "--lgn-cnt", str(cfg.lgn_cnt), "--cortex-cnt", str(cfg.cortex_cnt),
+           "--threads", str(thread_cnt), "--sim-time", str(sim_time_ms)]
+
+    if proc_cnt > 1:
+        cmd = ["mpirun", "-np", str(proc_cnt)] + cmd
+
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+
+    for line in result.stdout.splitlines():
+        if line.startswith(_RESULT_PREFIX):
+            measurement = prof.Measurement.from_dict(json.loads(line[len(_RESULT_PREFIX):]))
+            measurement.proc_cnt = proc_cnt
+            return measurement
+
+    return None
+
+
+def probe(cfg: netcfg.Config, sim_time_ms: float) -> None:
+    runner = sim.NetRunner(sim_time_ms, cfg)
+
+    start = time.perf_counter()
+    runner.build_network()
+    runner.ranks.barrier()
+    build_time_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nest.Simulate(sim_time_ms)
+    runner.ranks.barrier()
+    real_time_factor = (time.perf_counter() - start) / (sim_time_ms / 1000.0)
+
+    if runner.ranks.is_root():
+        measurement = prof.Measurement(runner.ranks.size, cfg.nest_thread_cnt, build_time_s, real_time_factor)
+        print(_RESULT_PREFIX + json.dumps(measurement.to_dict()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finds the fastest NEST process/thread split for this host.")
+    parser.add_argument("mode", nargs="?", default="tune", choices=["tune", "probe"])
+    parser.add_argument("--lgn-cnt", type=int, default=netcfg.Config().lgn_cnt)
+    parser.add_argument("--cortex-cnt", type=int, default=netcfg.Config().cortex_cnt)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--sim-time", type=float, default=20.0, help="simulated ms per probe")
+    parser.add_argument("--horizon", type=float, default=1000.0, help="simulated ms the choice is optimized for")
+    args = parser.parse_args()
+
+    cfg = netcfg.Config().with_lgn_cnt(args.lgn_cnt).with_cortex_cnt(args.cortex_cnt).with_tuned_topology(False)
+
+    if args.mode == "probe":
+        probe(cfg.with_nest_threads(args.threads), args.sim_time)
+        return
+
+    best = tune(cfg, args.sim_time, args.horizon)
+    print(f"Best: {best.proc_cnt} processes x {best.thread_cnt} threads, saved to {prof.profile_path()}")
+
+
+if __name__ == "__main__":
+    main()
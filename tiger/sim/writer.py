@@ -0,0 +1,73 @@
+import queue
+import threading
+from typing import Callable, List
+
+
+# Runs result writes on a background thread in the order they were submitted, so compression
+# and file I/O overlap with the next chunk or trial being simulated. Submitting blocks while
+# max_pending writes are waiting, which holds the simulation back when the disk cannot keep up
+# instead of letting drained events pile up in memory. Once a write has failed the following
+# ones are skipped and every submit, flush and close raises its error.
+class AsyncWriter:
+    max_pending: int
+    _queue: queue.Queue
+    _thread: threading.Thread
+    _errors: List[BaseException]
+
+    def __init__(self, max_pending: int = 8) -> None:
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._errors = []
+        self._thread = threading.Thread(target=self._run, name="tiger-writer", daemon=True)
+        self._thread.start()
+
+    # Arguments are passed on as they are, they must not be changed by the caller afterwards.
+    def submit(self, write: Callable, *args, **kwargs) -> None:
+        self._raise_error()
+        self._queue.put((write, args, kwargs))
+
+    # Waits for every submitted write to finish.
+    def flush(self) -> None:
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        self._stop()
+        self._raise_error()
+
+    def __enter__(self) -> "AsyncWriter":
+        return self
+
+    # An error of the block is not masked by one of the writes.
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._stop()
+
+    def _stop(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+
+            if job is None:
+                self._queue.task_done()
+                return
+
+            write, args, kwargs = job
+
+            try:
+                if len(self._errors) == 0:
+                    write(*args, **kwargs)
+            except BaseException as e:
+                self._errors.append(e)
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        if len(self._errors) > 0:
+            raise RuntimeError("writing results failed") from self._errors[0]